@@ -1,26 +1,47 @@
 from django.contrib import admin
-from .models import Event, TicketType, Reservation, Payment
+from .models import DailySales, Event, TicketType, TicketStockShard, Reservation, Payment
 
 
 class TicketTypeInline(admin.TabularInline):
     model = TicketType
     extra = 0
+    # Same as TicketTypeAdmin: only rebalance_stock_shards may change it.
+    readonly_fields = ("shard_count",)
 
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ("title", "organizer", "start_date", "end_date")
-    list_filter = ("start_date",)
+    list_display = ("title", "organizer", "start_date", "end_date", "waiting_room_enabled")
+    list_filter = ("start_date", "waiting_room_enabled")
     search_fields = ("title", "location", "organizer__username")
     inlines = [TicketTypeInline]
 
 
+class TicketStockShardInline(admin.TabularInline):
+    model = TicketStockShard
+    extra = 0
+    can_delete = False
+    readonly_fields = ("index", "capacity", "available_quantity")
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(TicketType)
 class TicketTypeAdmin(admin.ModelAdmin):
-    list_display = ("name", "event", "price", "available_quantity", "total_quantity")
+    list_display = (
+        "name", "event", "price", "available_quantity", "total_quantity",
+        "admission_rate", "shard_count",
+    )
     list_filter = ("event",)
     search_fields = ("name", "event__title")
 
+    # Shards are created/resized only by `manage.py rebalance_stock_shards`,
+    # which moves the stock between counters; flipping the count here
+    # would leave the stock stranded.
+    readonly_fields = ("shard_count",)
+    inlines = [TicketStockShardInline]
+
 
 @admin.register(Reservation)
 class ReservationAdmin(admin.ModelAdmin):
@@ -47,6 +68,7 @@ class PaymentAdmin(admin.ModelAdmin):
         "stripe_payment_intent",
         "stripe_client_secret",
         "created_at",
+        "completed_at",
     )
 
     def has_add_permission(self, request):
@@ -54,3 +76,15 @@ class PaymentAdmin(admin.ModelAdmin):
 
     def has_delete_permission(self, request, obj=None):
         return request.user.is_superuser
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    # Maintained by events/sales.py; fix it with backfill_daily_sales, not by hand.
+    list_display = ("day", "event", "ticket_type", "tickets", "revenue", "checked_in")
+    list_filter = ("event",)
+    date_hierarchy = "day"
+    readonly_fields = ("event", "ticket_type", "day", "tickets", "revenue", "checked_in")
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,244 @@
+"""
+Offline check-in for door devices.
+
+Before doors open a device downloads the event's manifest
+(/events/<id>/checkin/manifest/): every confirmed ticket code plus a
+Bloom filter of them, so a scanner can reject a forged or mistyped code
+with a few hash probes before looking anything up. The manifest is a
+django.core.signing token (zlib-compressed JSON, HMAC-signed with the
+site's key), so read_manifest() can tell a genuine one from a doctored
+copy.
+
+Devices scan against their copy while offline and later upload the scans
+in one batch (/events/<id>/checkin/sync/). merge_scans() applies them
+with one locked read and one UPDATE per chunk; when a ticket was scanned
+more than once (two gates, or a gate and ticket_checkin), the earliest
+used_at wins.
+
+Online gate scanners buffer a few dozen scans and post them together
+(/events/<id>/checkin/batch/). check_in_codes() admits them all with one
+guarded UPDATE (confirmed and not yet used), so two gates racing on the
+same ticket can't both admit it, then reads back every code's state to
+report what happened to it. Codes failing their HMAC check
+(events/ticket_codes.py) are answered "unknown" without a lookup.
+
+Bloom filter layout, for device implementations: `bits` is base64 of an
+m-bit array, bit i at byte i // 8, mask 1 << (i % 8). For a code, take
+SHA-256 of its UTF-8 bytes; h1 and h2 are the first two big-endian
+64-bit words; the k probe positions are (h1 + i * h2) mod m, i = 0..k-1.
+"""
+import base64
+import hashlib
+import math
+from datetime import timedelta
+
+from django.core import signing
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import live, sales, ticket_codes
+from .models import Reservation
+
+MANIFEST_SALT = "events.checkin-manifest"
+MANIFEST_VERSION = 1
+BLOOM_FALSE_POSITIVE_RATE = 0.001
+MERGE_CHUNK_SIZE = 500
+# Device clocks drift; a scan "from the future" is clamped to now.
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+class BloomFilter:
+    def __init__(self, size, hashes, bits=None):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, count, false_positive_rate=BLOOM_FALSE_POSITIVE_RATE):
+        count = max(count, 1)
+        size = max(64, math.ceil(-count * math.log(false_positive_rate) / math.log(2) ** 2))
+        hashes = max(1, round(size / count * math.log(2)))
+        return cls(size, hashes)
+
+    def _positions(self, value):
+        digest = hashlib.sha256(value.encode()).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big")
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, value):
+        return all(self.bits[position // 8] & (1 << (position % 8)) for position in self._positions(value))
+
+    def to_dict(self):
+        return {"m": self.size, "k": self.hashes, "bits": base64.b64encode(bytes(self.bits)).decode()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["m"], data["k"], bytearray(base64.b64decode(data["bits"])))
+
+
+def build_manifest(event):
+    """The signed manifest for `event`: a compact string, ready to download."""
+    tickets = list(
+        Reservation.objects.filter(ticket_type__event=event, confirmed=True)
+        .order_by("pk")
+        .values_list("ticket_code", "quantity", "ticket_type__name", "used_at")
+        .iterator(chunk_size=2000)
+    )
+    bloom = BloomFilter.for_capacity(len(tickets))
+    for code, *_ in tickets:
+        bloom.add(code)
+
+    payload = {
+        "v": MANIFEST_VERSION,
+        "event": event.pk,
+        "generated_at": timezone.now().isoformat(),
+        # [code, quantity, ticket type, used_at or null]
+        "tickets": [
+            [code, quantity, ticket_type, used_at.isoformat() if used_at else None]
+            for code, quantity, ticket_type, used_at in tickets
+        ],
+        "bloom": bloom.to_dict(),
+    }
+    return signing.dumps(payload, salt=MANIFEST_SALT, compress=True)
+
+
+def read_manifest(token):
+    """The manifest's payload; raises signing.BadSignature if it was altered."""
+    return signing.loads(token, salt=MANIFEST_SALT)
+
+
+def _earliest_scans(scans, now):
+    """{code: earliest used_at} from the uploaded scans; malformed entries are skipped."""
+    earliest = {}
+    for scan in scans:
+        if not isinstance(scan, dict) or not isinstance(scan.get("code"), str):
+            continue
+        used_at = parse_datetime(str(scan.get("used_at") or ""))
+        if used_at is None:
+            continue
+        if timezone.is_naive(used_at):
+            used_at = timezone.make_aware(used_at)
+        if used_at > now + MAX_CLOCK_SKEW:
+            used_at = now
+        code = ticket_codes.normalize(scan["code"])
+        if code not in earliest or used_at < earliest[code]:
+            earliest[code] = used_at
+    return earliest
+
+
+CHECKIN_OK = "ok"
+CHECKIN_ALREADY_USED = "already_used"
+CHECKIN_UNPAID = "unpaid"
+CHECKIN_UNKNOWN = "unknown"
+
+
+def check_in_codes(event, codes):
+    """
+    Checks in every confirmed, unused ticket of `event` among `codes`, now.
+    Returns one {"code", "status"} per distinct code, in the order given;
+    already used tickets also carry their "used_at".
+    """
+    now = timezone.now()
+    codes = list(dict.fromkeys(ticket_codes.normalize(code) for code in codes))
+    query = ticket_codes.lookup(codes)
+    if query is None:
+        # Nothing but forged or mistyped codes: no need to ask the database.
+        return [{"code": code, "status": CHECKIN_UNKNOWN} for code in codes]
+    tickets = Reservation.objects.filter(query, ticket_type__event=event)
+
+    with transaction.atomic():
+        admitted = tickets.filter(confirmed=True, is_used=False).update(is_used=True, used_at=now)
+        found = {
+            reservation.ticket_code: reservation
+            for reservation in tickets.select_related("ticket_type")
+        }
+        # Rows this UPDATE admitted carry its exact timestamp (and stay
+        # locked by it until commit).
+        new = [r for r in found.values() if r.is_used and r.used_at == now] if admitted else []
+        if new:
+            sales.record_checkins(new)
+            live.publish_checkins(new)
+
+    new_codes = {r.ticket_code for r in new}
+    results = []
+    for code in codes:
+        reservation = found.get(code)
+        if reservation is None:
+            results.append({"code": code, "status": CHECKIN_UNKNOWN})
+        elif code in new_codes:
+            results.append({"code": code, "status": CHECKIN_OK})
+        elif not reservation.confirmed:
+            results.append({"code": code, "status": CHECKIN_UNPAID})
+        else:
+            results.append({"code": code, "status": CHECKIN_ALREADY_USED, "used_at": reservation.used_at})
+    return results
+
+
+def merge_scans(event, scans):
+    """
+    Applies offline scans (dicts with `code` and ISO `used_at`) to `event`.
+    Returns {"checked_in", "moved_earlier", "already_checked_in",
+    "unknown": [codes]}.
+    """
+    now = timezone.now()
+    earliest = _earliest_scans(scans, now)
+    result = {"checked_in": 0, "moved_earlier": 0, "already_checked_in": 0, "unknown": []}
+    codes = list(earliest)
+
+    for start in range(0, len(codes), MERGE_CHUNK_SIZE):
+        chunk = codes[start:start + MERGE_CHUNK_SIZE]
+        query = ticket_codes.lookup(chunk)
+        if query is None:
+            result["unknown"].extend(chunk)
+            continue
+        with transaction.atomic():
+            # One lock per chunk, not per ticket; held only for this UPDATE.
+            reservations = {
+                reservation.ticket_code: reservation
+                for reservation in Reservation.objects.select_for_update(of=("self",))
+                .select_related("ticket_type")
+                .filter(query, ticket_type__event=event, confirmed=True)
+            }
+
+            new, moved = [], []
+            for code in chunk:
+                reservation = reservations.get(code)
+                if reservation is None:
+                    result["unknown"].append(code)
+                elif not reservation.is_used:
+                    new.append((reservation, None))
+                elif reservation.used_at is None or earliest[code] < reservation.used_at:
+                    moved.append((reservation, reservation.used_at))
+                else:
+                    result["already_checked_in"] += 1
+
+            changed = new + moved
+            if not changed:
+                continue
+
+            Reservation.objects.filter(pk__in=[r.pk for r, _ in changed]).update(
+                is_used=True,
+                used_at=Case(
+                    *[When(pk=r.pk, then=Value(earliest[r.ticket_code])) for r, _ in changed],
+                    output_field=DateTimeField(),
+                ),
+            )
+            for reservation, previous in changed:
+                reservation.is_used = True
+                reservation.used_at = earliest[reservation.ticket_code]
+                if previous is not None:
+                    sales.move_checkin(reservation, previous)
+
+            sales.record_checkins([r for r, _ in new])
+            live.publish_checkins([r for r, _ in new])
+            result["checked_in"] += len(new)
+            result["moved_earlier"] += len(moved)
+
+    return result
@@ -0,0 +1,33 @@
+import heapq
+
+
+class ExpiryScheduler:
+    """
+    Min-heap of (expires_at, reservation_id) for unconfirmed holds that
+    lapse soon, so the expiry daemon can sleep until exactly the next one
+    is due instead of polling. The heap is only a hint: releasing still
+    re-checks `confirmed` and `expires_at` in the database, so stale
+    entries (a hold that got paid or cancelled) are harmless.
+    """
+
+    def __init__(self):
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+    def reset(self, entries):
+        """Replaces the schedule with `entries` ((expires_at, id) pairs) from a DB resync."""
+        self._heap = list(entries)
+        heapq.heapify(self._heap)
+
+    def next_due(self):
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now, limit):
+        """Removes and returns up to `limit` reservation ids that expired before `now`."""
+        due = []
+        while self._heap and len(due) < limit and self._heap[0][0] < now:
+            _, reservation_id = heapq.heappop(self._heap)
+            due.append(reservation_id)
+        return due
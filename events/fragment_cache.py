@@ -0,0 +1,72 @@
+"""
+Cache for rendered event markup (cards, the static parts of the detail
+page), used through the {% event_fragment %} template tag.
+
+Keys include the event's cache_version, which the signals in
+events/signals.py bump on every Event save and TicketType save/delete.
+A write never invalidates anything explicitly: the next render simply
+looks under a new key, and the old entry ages out of the cache.
+
+Fragments must not contain stock counts or anything time-dependent
+(is_past, countdowns): stock moves without a save() signal, and time
+moves without any write at all.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _cache():
+    return caches[settings.FRAGMENT_CACHE_ALIAS]
+
+
+def fragment_key(event, name, vary_on=()):
+    vary = hashlib.md5(":".join(str(value) for value in vary_on).encode()).hexdigest()
+    return f"event-fragment:{name}:{event.pk}:{event.cache_version}:{vary}"
+
+
+def _count(outcome):
+    with _lock:
+        _stats[outcome] += 1
+
+
+def get_or_render(event, name, vary_on, render):
+    cache = _cache()
+    key = fragment_key(event, name, vary_on)
+
+    html = cache.get(key)
+    if html is not None:
+        _count("hits")
+        return html
+
+    _count("misses")
+    html = render()
+    cache.set(key, html, settings.FRAGMENT_CACHE_TIMEOUT)
+    return html
+
+
+def stats():
+    """This process's hit/miss counters (each worker has its own cache)."""
+    with _lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    lookups = hits + misses
+    cache = _cache()
+    # LocMemCache keeps its entries in `_cache`; other backends can't say cheaply.
+    entries = getattr(cache, "_cache", None)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+        "entries": len(entries) if entries is not None else None,
+        "max_entries": getattr(cache, "_max_entries", None),
+    }
+
+
+def reset_stats():
+    with _lock:
+        _stats.update(hits=0, misses=0)
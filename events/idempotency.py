@@ -0,0 +1,137 @@
+"""
+Idempotency keys for endpoints that take stock or talk to Stripe.
+
+A client that may retry a request sends an `Idempotency-Key` header (any
+string up to 64 characters, e.g. a UUID generated per checkout attempt).
+The first request with a given key runs normally and its response is
+stored for settings.IDEMPOTENCY_KEY_TTL_SECONDS; a retry with the same
+key gets that stored response back (marked `Idempotent-Replayed: true`)
+without the view running again. Requests without the header are not
+affected.
+
+- A retry that arrives while the first request is still running gets 409.
+- Reusing a key for a different request (other body / path) gets 422.
+- 5xx responses and exceptions aren't stored, so the client can retry.
+"""
+import functools
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.http.request import RawPostDataException
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+HEADER = "HTTP_IDEMPOTENCY_KEY"
+MAX_KEY_LENGTH = 64
+
+
+def _request_hash(request):
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b"\0")
+    digest.update(request.get_full_path().encode())
+    digest.update(b"\0")
+    try:
+        digest.update(request.body)
+    except RawPostDataException:
+        # Multipart body already consumed (e.g. by the CSRF check).
+        digest.update(repr(sorted(request.POST.lists())).encode())
+    return digest.hexdigest()
+
+
+def _claim(user, scope, key, request_hash, now):
+    """
+    Inserts a pending row for (user, scope, key). Returns None if this
+    request now owns the key, or the existing row otherwise.
+    """
+    expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+    lookup = {"user": user, "scope": scope, "key": key}
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(request_hash=request_hash, expires_at=expires_at, **lookup)
+            return None
+    except IntegrityError:
+        pass
+
+    existing = IdempotencyKey.objects.filter(**lookup).first()
+    if existing is None or existing.expires_at <= now:
+        # Expired (or purged in between): drop it and claim the key afresh.
+        IdempotencyKey.objects.filter(**lookup, expires_at__lte=now).delete()
+        return _claim(user, scope, key, request_hash, now)
+    return existing
+
+
+def _replay(record):
+    response = HttpResponse(
+        bytes(record.body),
+        status=record.status_code,
+        content_type=record.content_type or None,
+    )
+    if record.location:
+        response["Location"] = record.location
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(scope):
+    """View decorator; `scope` names the endpoint so keys don't collide across views."""
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.META.get(HEADER, "").strip()
+            if not key or not request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return JsonResponse(
+                    {"error": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters."},
+                    status=400,
+                )
+
+            request_hash = _request_hash(request)
+            lookup = {"user": request.user, "scope": scope, "key": key}
+            existing = _claim(request.user, scope, key, request_hash, timezone.now())
+
+            if existing is not None:
+                if existing.request_hash != request_hash:
+                    return JsonResponse(
+                        {"error": "This Idempotency-Key was already used for a different request."},
+                        status=422,
+                    )
+                if existing.status_code is None:
+                    return JsonResponse(
+                        {"error": "A request with this Idempotency-Key is still in progress."},
+                        status=409,
+                    )
+                return _replay(existing)
+
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                IdempotencyKey.objects.filter(**lookup).delete()
+                raise
+
+            if response.status_code >= 500 or response.streaming:
+                IdempotencyKey.objects.filter(**lookup).delete()
+                return response
+
+            IdempotencyKey.objects.filter(**lookup).update(
+                status_code=response.status_code,
+                content_type=response.get("Content-Type", ""),
+                location=response.get("Location", ""),
+                body=response.content,
+            )
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def purge_expired(now=None):
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
@@ -0,0 +1,486 @@
+import logging
+import random
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+
+from .models import Event, Order, Reservation, TicketStockShard, TicketType
+
+logger = logging.getLogger(__name__)
+
+# "locking" takes a row lock on the TicketType (SELECT ... FOR UPDATE) and
+# does a read-modify-write; "conditional" folds the stock check into a
+# single guarded UPDATE and branches on the affected row count.
+ENGINE_LOCKING = "locking"
+ENGINE_CONDITIONAL = "conditional"
+ENGINES = (ENGINE_LOCKING, ENGINE_CONDITIONAL)
+
+
+def get_engine(engine=None):
+    engine = engine or getattr(settings, "RESERVATION_ENGINE", ENGINE_LOCKING)
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown reservation engine: {engine!r}")
+    return engine
+
+
+def reserve_stock(ticket_type, quantity, engine=None):
+    """
+    Takes `quantity` tickets out of `ticket_type`'s stock. Must be called
+    inside transaction.atomic(), so the decrement is rolled back if the
+    caller fails to create the reservation afterwards.
+
+    Raises ValidationError when there isn't enough stock left.
+    """
+    if quantity <= 0:
+        raise ValueError("Quantity must be greater than 0.")
+
+    try:
+        _take_stock(ticket_type, quantity, engine)
+    except ValidationError:
+        # Lazy expiry: before refusing the buyer, put back whatever this
+        # ticket type's lapsed holds are still sitting on, then try once
+        # more — all inside the caller's transaction.
+        if not settings.RESERVATION_LAZY_EXPIRY or not reclaim_expired_holds(ticket_type):
+            raise
+        _take_stock(ticket_type, quantity, engine)
+
+
+def _take_stock(ticket_type, quantity, engine):
+    if ticket_type.shard_count:
+        _reserve_from_shards(ticket_type, quantity)
+        Event.refresh_summary_on_commit([ticket_type.event_id])
+        return
+
+    if get_engine(engine) == ENGINE_CONDITIONAL:
+        if not ticket_type.reserve_if_available(quantity):
+            raise ValidationError("Not enough tickets available.")
+        return
+
+    # select_for_update() locks this row for the duration of the
+    # transaction, so two concurrent requests for the same last ticket
+    # can't both pass the stock check before either commits.
+    locked = TicketType.objects.select_for_update().get(pk=ticket_type.pk)
+    locked.reserve(quantity)
+    ticket_type.available_quantity = locked.available_quantity
+
+
+def release_stock(ticket_type, quantity):
+    """Returns `quantity` tickets to stock. Must be called inside transaction.atomic()."""
+    if quantity <= 0:
+        return
+
+    if ticket_type.shard_count:
+        _release_to_shards(ticket_type, quantity)
+        Event.refresh_summary_on_commit([ticket_type.event_id])
+        return
+
+    locked = TicketType.objects.select_for_update().get(pk=ticket_type.pk)
+    locked.release(quantity)
+    ticket_type.available_quantity = locked.available_quantity
+
+
+def reserve_cart(user, items, engine=None):
+    """
+    Reserves several ticket types (possibly from different events) as one
+    all-or-nothing order. `items` is a list of (ticket_type, quantity)
+    pairs; must be called inside transaction.atomic().
+
+    Stock is always taken in ascending ticket type pk order, so two carts
+    touching the same ticket types acquire their row locks in the same
+    order and can't deadlock each other. Raises ValidationError naming the
+    first ticket type that's short.
+    """
+    merged = {}
+    for ticket_type, quantity in items:
+        if quantity <= 0:
+            raise ValueError("Quantity must be greater than 0.")
+        _, total = merged.get(ticket_type.pk, (ticket_type, 0))
+        merged[ticket_type.pk] = (ticket_type, total + quantity)
+
+    ordered = [merged[pk] for pk in sorted(merged)]
+
+    locked = {}
+    if get_engine(engine) == ENGINE_LOCKING:
+        # One statement, ORDER BY pk: every lock the cart needs, taken up front.
+        locked = {
+            tt.pk: tt
+            for tt in TicketType.objects.select_for_update().filter(pk__in=merged).order_by("pk")
+        }
+
+    for ticket_type, quantity in ordered:
+        try:
+            held = locked.get(ticket_type.pk)
+            if held and not held.shard_count and held.has_stock(quantity):
+                held.reserve(quantity)
+            else:
+                # Sharded, conditional engine, or short on stock (which
+                # may still succeed after lazy expiry).
+                reserve_stock(ticket_type, quantity, engine=engine)
+        except ValidationError:
+            raise ValidationError(f"Not enough tickets available for {ticket_type.name}.")
+
+    order = Order.objects.create(user=user)
+    reservations = [
+        Reservation.objects.create(
+            user=user,
+            ticket_type=ticket_type,
+            quantity=quantity,
+            confirmed=False,
+            order=order,
+        )
+        for ticket_type, quantity in ordered
+    ]
+    return order, reservations
+
+
+def reclaim_expired_holds(ticket_type, now=None):
+    """
+    Releases the expired, unconfirmed holds of one ticket type inline (the
+    sweeper may not have got to them yet). Returns how many were reclaimed.
+    """
+    return release_expired_reservations(now=now, ticket_type_id=ticket_type.pk)
+
+
+def release_expired_reservations(now=None, chunk_size=1000, ids=None, ticket_type_id=None):
+    """
+    Set-based counterpart to releasing expired holds one by one. Works in
+    chunks of `chunk_size` reservations, each in its own short
+    transaction: lock the chunk (skipping rows someone else holds, e.g. a
+    payment being confirmed right now), return its stock with one
+    aggregated UPDATE per ticket type, then delete the chunk.
+
+    `ids` / `ticket_type_id` narrow the sweep (reservations are still only
+    released if unconfirmed and expired). Returns how many were released.
+    """
+    now = now or timezone.now()
+    expired = Reservation.objects.filter(confirmed=False, expires_at__lt=now)
+    if ids is not None:
+        expired = expired.filter(pk__in=ids)
+    if ticket_type_id is not None:
+        expired = expired.filter(ticket_type_id=ticket_type_id)
+
+    released = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(
+                expired.select_for_update(skip_locked=True)
+                .order_by("expires_at", "pk")
+                .values_list("pk", "ticket_type_id", "quantity")[:chunk_size]
+            )
+            if not chunk:
+                break
+
+            totals = defaultdict(int)
+            for _, ticket_type_id, quantity in chunk:
+                totals[ticket_type_id] += quantity
+
+            sharded = {
+                tt.pk: tt
+                for tt in TicketType.objects.filter(pk__in=totals, shard_count__gt=0)
+            }
+
+            # Ascending pk order, same as carts, so the two never deadlock.
+            for ticket_type_id in sorted(totals):
+                if ticket_type_id in sharded:
+                    release_stock(sharded[ticket_type_id], totals[ticket_type_id])
+                    continue
+                # Same clamp as TicketType.release(), done in SQL.
+                TicketType.objects.filter(pk=ticket_type_id).update(
+                    available_quantity=Least(
+                        F("available_quantity") + totals[ticket_type_id],
+                        F("total_quantity"),
+                    )
+                )
+
+            # Lazy expiry runs this inside a buyer's transaction, so the
+            # event rows are left alone until commit.
+            Event.refresh_summary_on_commit(
+                TicketType.objects.filter(pk__in=list(totals)).values_list("event_id", flat=True)
+            )
+
+            Reservation.objects.filter(
+                pk__in=[pk for pk, _, _ in chunk], confirmed=False
+            ).delete()
+
+        released += len(chunk)
+        if len(chunk) < chunk_size:
+            break
+
+    return released
+
+
+# ------------------------------------
+# Reconciliation
+# ------------------------------------
+# Every Reservation row (paid or not, until it's cancelled or swept) holds
+# its quantity, so a ticket type's stock should always be
+# total_quantity - SUM(reservation quantities).
+
+StockDrift = namedtuple("StockDrift", "ticket_type_id name total held actual expected")
+
+
+def _held_by_ticket_type(ticket_type_ids=None):
+    held = Reservation.objects.all()
+    if ticket_type_ids is not None:
+        held = held.filter(ticket_type_id__in=ticket_type_ids)
+    return (
+        held.values("ticket_type_id")
+        .annotate(held=Sum("quantity"))
+        .order_by("ticket_type_id")
+        .values_list("ticket_type_id", "held")
+    )
+
+
+def find_stock_drift(chunk_size=2000):
+    """
+    Yields a StockDrift for every ticket type whose stock (base counter
+    plus shards) doesn't match its reservations. Both sides are streamed
+    in ticket type pk order and merged, so memory stays flat no matter
+    how many reservations there are: one grouped aggregate over
+    Reservation, one pass over TicketType.
+
+    Read without locks, so in-flight reservations can show up as
+    transient drift; repair_stock() re-checks under locks.
+    """
+    stock = (
+        TicketType.objects.annotate(
+            shard_stock=Coalesce(Sum("shards__available_quantity"), 0)
+        )
+        .order_by("pk")
+        .values_list("pk", "name", "total_quantity", "available_quantity", "shard_stock")
+    )
+    held_rows = _held_by_ticket_type().iterator(chunk_size=chunk_size)
+    next_held = next(held_rows, None)
+
+    for pk, name, total, available, shard_stock in stock.iterator(chunk_size=chunk_size):
+        # The two streams aren't read in one snapshot: a ticket type
+        # deleted in between can still have held rows, which match no
+        # stock row and are skipped.
+        while next_held is not None and next_held[0] < pk:
+            next_held = next(held_rows, None)
+        held = 0
+        if next_held is not None and next_held[0] == pk:
+            held = next_held[1]
+            next_held = next(held_rows, None)
+
+        actual = available + shard_stock
+        expected = max(total - held, 0)
+        if actual != expected:
+            yield StockDrift(pk, name, total, held, actual, expected)
+
+
+def repair_stock(ticket_type_ids):
+    """
+    Resets the stock of `ticket_type_ids` to total - held, recomputed
+    with the ticket type rows locked (in pk order, like carts) so nothing
+    can reserve or release them in between. Sharded ticket types are
+    folded and re-spread through rebalance_shards(). Must be called inside
+    transaction.atomic(). Returns the StockDrift rows actually repaired.
+    """
+    locked = list(
+        TicketType.objects.select_for_update()
+        .filter(pk__in=ticket_type_ids)
+        .order_by("pk")
+    )
+    held = dict(_held_by_ticket_type([tt.pk for tt in locked]))
+
+    repaired, to_update = [], []
+    for ticket_type in locked:
+        shards = TicketStockShard.objects.select_for_update().filter(ticket_type=ticket_type)
+        shard_stock = sum(shards.values_list("available_quantity", flat=True))
+        actual = ticket_type.available_quantity + shard_stock
+        expected = max(ticket_type.total_quantity - held.get(ticket_type.pk, 0), 0)
+        if actual == expected:
+            continue
+
+        repaired.append(StockDrift(
+            ticket_type.pk, ticket_type.name, ticket_type.total_quantity,
+            held.get(ticket_type.pk, 0), actual, expected,
+        ))
+        if ticket_type.shard_count:
+            # Put everything on the base counter, then let rebalance
+            # spread it back out.
+            shards.update(available_quantity=0)
+            TicketType.objects.filter(pk=ticket_type.pk).update(available_quantity=expected)
+            rebalance_shards(ticket_type.pk)
+        else:
+            ticket_type.available_quantity = expected
+            to_update.append(ticket_type)
+
+    TicketType.objects.bulk_update(to_update, ["available_quantity"])
+    Event.refresh_summary({tt.event_id for tt in locked})
+    return repaired
+
+
+# ------------------------------------
+# Sharded stock
+# ------------------------------------
+# A sharded ticket type's stock is the base counter (TicketType.
+# available_quantity, normally 0 once sharded) plus its shard rows. Buyers
+# start at a random shard so concurrent reservations land on different
+# rows instead of all queueing on one.
+
+def _shard_order(ticket_type):
+    start = random.randrange(ticket_type.shard_count)
+    return [(start + offset) % ticket_type.shard_count for offset in range(ticket_type.shard_count)]
+
+
+def _reserve_from_shards(ticket_type, quantity):
+    shards = TicketStockShard.objects.filter(ticket_type_id=ticket_type.pk)
+
+    for index in _shard_order(ticket_type):
+        taken = shards.filter(index=index, available_quantity__gte=quantity).update(
+            available_quantity=F("available_quantity") - quantity
+        )
+        if taken:
+            return
+
+    # Leftovers that were never spread out (or folded back) into shards.
+    if ticket_type.reserve_if_available(quantity):
+        return
+
+    # No single counter can cover the order on its own, but together they
+    # might (e.g. 4 tickets with 2 left in each of two shards). Lock every
+    # counter in a fixed order and take greedily.
+    locked_type = TicketType.objects.select_for_update().get(pk=ticket_type.pk)
+    locked_shards = list(shards.select_for_update().order_by("index"))
+
+    if locked_type.available_quantity + sum(s.available_quantity for s in locked_shards) < quantity:
+        raise ValidationError("Not enough tickets available.")
+
+    remaining = quantity
+    for shard in locked_shards:
+        take = min(remaining, shard.available_quantity)
+        if take:
+            shard.available_quantity -= take
+            shard.save(update_fields=["available_quantity"])
+            remaining -= take
+        if not remaining:
+            return
+
+    locked_type.reserve(remaining)
+
+
+def _release_to_shards(ticket_type, quantity):
+    shards = TicketStockShard.objects.filter(ticket_type_id=ticket_type.pk)
+
+    # Only put tickets back into a shard that has room for them, so no
+    # shard ever goes above its capacity (and the sum never above total).
+    for index in _shard_order(ticket_type):
+        returned = shards.filter(
+            index=index,
+            available_quantity__lte=F("capacity") - quantity,
+        ).update(available_quantity=F("available_quantity") + quantity)
+        if returned:
+            return
+
+    # Same lock order as _reserve_from_shards(): ticket type, then shards.
+    locked_type = TicketType.objects.select_for_update().get(pk=ticket_type.pk)
+    locked_shards = list(shards.select_for_update().order_by("index"))
+
+    remaining = quantity
+    for shard in locked_shards:
+        give = min(remaining, shard.capacity - shard.available_quantity)
+        if give:
+            shard.available_quantity += give
+            shard.save(update_fields=["available_quantity"])
+            remaining -= give
+        if not remaining:
+            return
+
+    # The rest goes back on the base counter, which _reserve_from_shards()
+    # also takes from (and the only counter there is if shard_count was
+    # set without rebalancing), as long as the total still fits.
+    room = (
+        locked_type.total_quantity
+        - locked_type.available_quantity
+        - sum(shard.available_quantity for shard in locked_shards)
+    )
+    give = max(min(remaining, room), 0)
+    if give:
+        locked_type.available_quantity += give
+        locked_type.save(update_fields=["available_quantity"])
+        remaining -= give
+    if not remaining:
+        return
+
+    # Same behaviour as TicketType.release(): never return more than the
+    # ticket type can hold, but make the drift visible.
+    logger.warning(
+        "Dropped %d ticket(s) released to full shards of ticket type %s.",
+        remaining, ticket_type.pk,
+    )
+
+
+def _split_evenly(amount, parts):
+    base, extra = divmod(amount, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def rebalance_shards(ticket_type_id, shard_count=None):
+    """
+    Recombines a ticket type's stock and spreads it evenly across
+    `shard_count` shards (default: keep the current count). Passing 0
+    folds everything back into the single TicketType counter.
+
+    The recombined stock is clamped to total_quantity, so this is also
+    the repair step if the counters ever drift.
+    """
+    with transaction.atomic():
+        ticket_type = TicketType.objects.select_for_update().get(pk=ticket_type_id)
+        shards = list(
+            TicketStockShard.objects.select_for_update()
+            .filter(ticket_type=ticket_type)
+            .order_by("index")
+        )
+
+        if shard_count is None:
+            shard_count = ticket_type.shard_count
+        if shard_count < 0:
+            raise ValueError("Shard count cannot be negative.")
+        if shard_count > ticket_type.total_quantity:
+            raise ValueError("Cannot have more shards than tickets.")
+
+        stock = ticket_type.available_quantity + sum(s.available_quantity for s in shards)
+        stock = min(stock, ticket_type.total_quantity)
+
+        # Shards are rewritten in place rather than deleted and recreated,
+        # so reservations blocked on a shard row lock retry against the
+        # same row once this commits.
+        existing = {shard.index: shard for shard in shards}
+        TicketStockShard.objects.filter(
+            ticket_type=ticket_type, index__gte=shard_count
+        ).delete()
+
+        if shard_count:
+            # Splitting stock and capacity the same way guarantees every
+            # shard's stock <= its capacity, because stock <= total.
+            capacities = _split_evenly(ticket_type.total_quantity, shard_count)
+            stocks = _split_evenly(stock, shard_count)
+            to_update, to_create = [], []
+            for index in range(shard_count):
+                shard = existing.get(index) or TicketStockShard(ticket_type=ticket_type, index=index)
+                shard.capacity = capacities[index]
+                shard.available_quantity = stocks[index]
+                (to_update if shard.pk else to_create).append(shard)
+
+            # Lower stock before capacity can't be done per row with
+            # bulk_update, so zero the stock first to keep the capacity
+            # CheckConstraint satisfied at every statement.
+            TicketStockShard.objects.filter(pk__in=[s.pk for s in to_update]).update(available_quantity=0)
+            TicketStockShard.objects.bulk_update(to_update, ["capacity", "available_quantity"])
+            TicketStockShard.objects.bulk_create(to_create)
+            ticket_type.available_quantity = 0
+        else:
+            ticket_type.available_quantity = stock
+
+        ticket_type.shard_count = shard_count
+        ticket_type.save(update_fields=["available_quantity", "shard_count"])
+        Event.refresh_summary([ticket_type.event_id])
+
+    return ticket_type
@@ -0,0 +1,130 @@
+"""
+Live sales / check-in counters for ticket_management, over Server-Sent
+Events.
+
+Sales (_confirm_payment) and check-ins (ticket_checkin, merged offline
+scans) append EventChange rows in the same transaction. An organizer's
+browser keeps one EventSource open on /events/<id>/tickets/live/; the
+feed there:
+
+1. sends a `snapshot` of the counters (the same numbers as EventStats),
+2. then polls for new EventChange rows every LIVE_FEED_POLL_SECONDS (one
+   indexed query) and sends each as a `change` delta, plus an `available`
+   event whenever the event's remaining stock has moved,
+3. and closes after LIVE_FEED_MAX_SECONDS. EventSource reconnects by
+   itself and gets a fresh snapshot, which also corrects any change that
+   committed out of id order while the stream was open.
+
+The view is async, so it needs the ASGI entry point
+(ticket_platform/asgi.py): an open stream then holds no worker thread.
+"""
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Event, EventChange
+from .stats import EventStats
+
+
+def publish_sale(reservations):
+    """Records `reservations` (just paid for, ticket_type loaded) as sales."""
+    EventChange.objects.bulk_create([
+        EventChange(
+            event_id=reservation.ticket_type.event_id,
+            ticket_type_id=reservation.ticket_type_id,
+            kind=EventChange.KIND_SALE,
+            quantity=reservation.quantity,
+            amount=reservation.ticket_type.price * reservation.quantity,
+        )
+        for reservation in reservations
+    ])
+
+
+def publish_checkins(reservations):
+    EventChange.objects.bulk_create([
+        EventChange(
+            event_id=reservation.ticket_type.event_id,
+            ticket_type_id=reservation.ticket_type_id,
+            kind=EventChange.KIND_CHECKIN,
+            quantity=reservation.quantity,
+        )
+        for reservation in reservations
+    ])
+
+
+def publish_checkin(reservation):
+    publish_checkins([reservation])
+
+
+def purge(now=None):
+    cutoff = (now or timezone.now()) - timedelta(hours=settings.LIVE_FEED_RETENTION_HOURS)
+    deleted, _ = EventChange.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def snapshot(event):
+    stats = EventStats.for_event(event)
+    return {
+        "revenue": stats.revenue,
+        "capacity": stats.capacity,
+        "available": stats.available,
+        "confirmed": stats.confirmed,
+        "checked_in": stats.checked_in,
+    }
+
+
+async def _available(event):
+    # The event's summary column: one row, no aggregate.
+    return await Event.objects.filter(pk=event.pk).values_list("available_total", flat=True).afirst()
+
+
+def _message(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def stream(event):
+    """The SSE body for `event`: an async iterator of text chunks."""
+    changes = EventChange.objects.filter(event=event).order_by("id")
+    # Read the last id before the snapshot: a change landing in between
+    # may be counted twice, but never missed.
+    last_id = await changes.values_list("id", flat=True).alast() or 0
+    data = await sync_to_async(snapshot)(event)
+    available = data["available"] = await _available(event)
+
+    yield f"retry: {settings.LIVE_FEED_RETRY_MS}\n\n"
+    yield _message("snapshot", data)
+
+    deadline = time.monotonic() + settings.LIVE_FEED_MAX_SECONDS
+    next_heartbeat = time.monotonic() + settings.LIVE_FEED_HEARTBEAT_SECONDS
+    while True:
+        batch = [
+            change async for change in changes.filter(id__gt=last_id).values(
+                "id", "kind", "ticket_type_id", "quantity", "amount"
+            )[:settings.LIVE_FEED_BATCH_SIZE]
+        ]
+        for change in batch:
+            last_id = change.pop("id")
+            yield _message("change", change)
+
+        heartbeat = time.monotonic() >= next_heartbeat
+        if batch or heartbeat:
+            # Stock also moves on holds and expiries, which aren't in the
+            # feed; re-read it when there's a reason to talk anyway.
+            current = await _available(event)
+            if current != available:
+                available = current
+                yield _message("available", {"available": available})
+            elif heartbeat:
+                yield ": keepalive\n\n"
+            if heartbeat:
+                next_heartbeat = time.monotonic() + settings.LIVE_FEED_HEARTBEAT_SECONDS
+
+        if time.monotonic() >= deadline:
+            return
+        await asyncio.sleep(settings.LIVE_FEED_POLL_SECONDS)
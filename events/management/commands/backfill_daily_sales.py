@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from events import sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the DailySales rollup from completed payments and "
+        "check-ins, for every event or just the ones given with --event. "
+        "Run it once after deploying the rollup, or to repair it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--event",
+            type=int,
+            action="append",
+            dest="event_ids",
+            help="Only rebuild this event (can be repeated).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows inserted per INSERT (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        written = sales.rebuild(options["event_ids"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily sales row(s)."))
@@ -0,0 +1,143 @@
+import statistics
+import threading
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from events.inventory import ENGINES, reserve_stock
+from events.models import Event, Reservation, TicketType
+
+
+class Command(BaseCommand):
+    help = (
+        "Contention benchmark for the reservation engines: N threads hammer "
+        "one ticket type at the same time (like an on-sale) and we report "
+        "throughput, latency and whether stock stayed consistent. Creates "
+        "its own throwaway event and deletes it afterwards. Only meaningful "
+        "on PostgreSQL — SQLite serializes all writers on a file lock."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--engine",
+            choices=ENGINES,
+            action="append",
+            help="Engine(s) to benchmark. Defaults to all of them.",
+        )
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--attempts", type=int, default=50, help="Reservations tried per thread.")
+        parser.add_argument("--stock", type=int, default=200, help="Tickets on sale in each run.")
+        parser.add_argument("--quantity", type=int, default=1, help="Tickets per reservation.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        suffix = uuid.uuid4().hex[:8]
+        organizer = User.objects.create_user(
+            username=f"bench_org_{suffix}", is_organizer=True, is_participant=False
+        )
+        buyer = User.objects.create_user(username=f"bench_buyer_{suffix}")
+
+        try:
+            for engine in options["engine"] or ENGINES:
+                self._run(engine, organizer, buyer, options)
+        finally:
+            # Cascades to the events, ticket types and reservations created above.
+            organizer.delete()
+            buyer.delete()
+
+    def _run(self, engine, organizer, buyer, options):
+        event = Event.objects.create(
+            organizer=organizer,
+            title=f"Benchmark ({engine})",
+            description="Throwaway event created by benchmark_reservations.",
+            location="-",
+            start_date=timezone.now() + timedelta(days=1),
+            end_date=timezone.now() + timedelta(days=2),
+        )
+        ticket_type = TicketType.objects.create(
+            event=event,
+            name="Benchmark",
+            price=Decimal("1.00"),
+            total_quantity=options["stock"],
+            available_quantity=options["stock"],
+        )
+
+        quantity = options["quantity"]
+        barrier = threading.Barrier(options["threads"])
+        lock = threading.Lock()
+        latencies = []
+        counts = {"ok": 0, "sold_out": 0, "errors": 0}
+
+        def worker():
+            local_latencies = []
+            local_counts = {"ok": 0, "sold_out": 0, "errors": 0}
+            try:
+                barrier.wait()
+                for _ in range(options["attempts"]):
+                    started = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            reserve_stock(ticket_type, quantity, engine=engine)
+                            Reservation.objects.create(
+                                user=buyer, ticket_type=ticket_type, quantity=quantity
+                            )
+                        local_counts["ok"] += 1
+                    except ValidationError:
+                        local_counts["sold_out"] += 1
+                    except DatabaseError:
+                        local_counts["errors"] += 1
+                    local_latencies.append(time.perf_counter() - started)
+            finally:
+                # Each thread gets its own DB connection; don't leak them.
+                connection.close()
+                with lock:
+                    latencies.extend(local_latencies)
+                    for key, value in local_counts.items():
+                        counts[key] += value
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        ticket_type.refresh_from_db()
+        reserved = sum(
+            Reservation.objects.filter(ticket_type=ticket_type).values_list("quantity", flat=True)
+        )
+        consistent = ticket_type.available_quantity + reserved == ticket_type.total_quantity
+
+        attempts = len(latencies)
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+
+        self.stdout.write(f"[{engine}] {options['threads']} thread(s) x {options['attempts']} attempt(s)")
+        self.stdout.write(
+            f"  reserved={counts['ok']} sold_out={counts['sold_out']} errors={counts['errors']} "
+            f"in {elapsed:.2f}s ({attempts / elapsed if elapsed else 0:.0f} attempts/s)"
+        )
+        if latencies:
+            self.stdout.write(
+                f"  latency p50={statistics.median(latencies) * 1000:.1f}ms "
+                f"p95={p95 * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms"
+            )
+
+        if consistent:
+            self.stdout.write(self.style.SUCCESS(
+                f"  stock consistent: {ticket_type.available_quantity} left + {reserved} reserved "
+                f"= {ticket_type.total_quantity}"
+            ))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f"  stock DRIFTED: {ticket_type.available_quantity} left + {reserved} reserved "
+                f"!= {ticket_type.total_quantity}"
+            ))
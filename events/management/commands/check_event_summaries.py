@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = (
+        "Checks the summary columns stored on each event (min_price, "
+        "available_total, capacity_total) against its ticket types and "
+        "reports any that are out of date. Use --repair to recompute them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Recompute the summary columns of every event that is out of date.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Events recomputed per UPDATE (default: 500).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows fetched per round trip while scanning (default: 2000).",
+        )
+
+    def handle(self, *args, **options):
+        # In SUMMARY_FIELDS order, so the stored and computed halves of
+        # each row line up column for column.
+        expressions = Event.summary_expressions()
+        expected = {f"expected_{name}": expressions[name] for name in Event.SUMMARY_FIELDS}
+        rows = (
+            Event.objects.annotate(**expected)
+            .order_by("pk")
+            .values_list("pk", "title", *Event.SUMMARY_FIELDS, *expected)
+        )
+
+        found = repaired = 0
+        batch = []
+        width = len(Event.SUMMARY_FIELDS)
+
+        for pk, title, *values in rows.iterator(chunk_size=options["chunk_size"]):
+            stored, computed = values[:width], values[width:]
+            if stored == computed:
+                continue
+
+            found += 1
+            changes = ", ".join(
+                f"{name} {old} → {new}"
+                for name, old, new in zip(Event.SUMMARY_FIELDS, stored, computed)
+                if old != new
+            )
+            self.stdout.write(f"Event {pk} ({title}): {changes}")
+
+            if options["repair"]:
+                batch.append(pk)
+                if len(batch) >= options["batch_size"]:
+                    repaired += Event.refresh_summary(batch)
+                    batch = []
+
+        if options["repair"] and batch:
+            repaired += Event.refresh_summary(batch)
+
+        if not found:
+            self.stdout.write(self.style.SUCCESS("All event summaries are up to date."))
+        elif options["repair"]:
+            self.stdout.write(self.style.SUCCESS(f"Recomputed {repaired} event summary(ies)."))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"{found} event summary(ies) out of date. Run with --repair to fix them."
+            ))
@@ -1,9 +1,15 @@
 import logging
+import signal
+import threading
+import time
+from datetime import timedelta
 
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db import close_old_connections, transaction
 from django.utils import timezone
 
+from events.expiry import ExpiryScheduler
+from events.inventory import release_expired_reservations, release_stock
 from events.models import Reservation
 
 logger = logging.getLogger(__name__)
@@ -13,10 +19,69 @@ class Command(BaseCommand):
     help = (
         "Releases stock held by unconfirmed reservations whose hold "
         "window has expired, then deletes them. Intended to run "
-        "periodically (cron / Windows Task Scheduler / Celery beat)."
+        "periodically (cron / Windows Task Scheduler / Celery beat). "
+        "Use --bulk after a large on-sale: it releases holds in chunks "
+        "with one stock UPDATE per ticket type instead of one "
+        "transaction per reservation. Use --daemon to keep running and "
+        "release each hold the moment it lapses."
     )
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            help="Set-based release: group expired holds by ticket type and delete them in chunks.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Reservations per transaction in --bulk mode (default: 1000).",
+        )
+        parser.add_argument(
+            "--daemon",
+            action="store_true",
+            help="Keep running: sleep until the next hold lapses and release it right away.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Max holds released per wake-up in --daemon mode (default: 100).",
+        )
+        parser.add_argument(
+            "--resync-seconds",
+            type=float,
+            default=30,
+            help="How often --daemon reloads upcoming expiries from the DB (default: 30).",
+        )
+        parser.add_argument(
+            "--run-for",
+            type=float,
+            help="Stop --daemon after this many seconds (default: run until SIGTERM/Ctrl+C).",
+        )
+
     def handle(self, *args, **options):
+        if options["daemon"]:
+            self._run_daemon(options)
+            return
+
+        started = time.perf_counter()
+
+        if options["bulk"]:
+            released = release_expired_reservations(chunk_size=options["chunk_size"])
+        else:
+            released = self._release_one_by_one()
+
+        elapsed = time.perf_counter() - started
+        if released:
+            logger.info("Released %d expired reservation(s) in %.2fs.", released, elapsed)
+        self.stdout.write(self.style.SUCCESS(
+            f"Released {released} expired reservation(s) in {elapsed:.2f}s"
+            f" ({released / elapsed if elapsed else 0:.0f}/s)."
+        ))
+
+    def _release_one_by_one(self):
         expired = Reservation.objects.filter(
             confirmed=False,
             expires_at__lt=timezone.now(),
@@ -25,13 +90,60 @@ class Command(BaseCommand):
         released = 0
         for reservation in expired:
             with transaction.atomic():
-                ticket_type = type(reservation.ticket_type).objects.select_for_update().get(
-                    pk=reservation.ticket_type_id
-                )
-                ticket_type.release(reservation.quantity)
+                release_stock(reservation.ticket_type, reservation.quantity)
                 reservation.delete()
             released += 1
+        return released
 
-        if released:
-            logger.info("Released %d expired reservation(s).", released)
-        self.stdout.write(self.style.SUCCESS(f"Released {released} expired reservation(s)."))
+    def _run_daemon(self, options):
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                signal.signal(signum, lambda *_: stop.set())
+            except ValueError:
+                pass  # not the main thread (e.g. under a test runner)
+
+        resync_every = options["resync_seconds"]
+        # Load a bit more than one resync interval ahead, so holds created
+        # just before a resync are already scheduled by the time they lapse.
+        horizon = timedelta(seconds=resync_every * 2)
+        deadline = time.monotonic() + options["run_for"] if options["run_for"] else None
+
+        scheduler = ExpiryScheduler()
+        next_resync = 0.0
+        total = 0
+
+        self.stdout.write(f"Expiry daemon started (resync every {resync_every:g}s).")
+
+        while not stop.is_set() and (deadline is None or time.monotonic() < deadline):
+            # Long-running process: drop connections the DB may have closed.
+            close_old_connections()
+
+            if time.monotonic() >= next_resync:
+                upcoming = Reservation.objects.filter(
+                    confirmed=False,
+                    expires_at__lt=timezone.now() + horizon,
+                ).values_list("expires_at", "pk")
+                scheduler.reset(upcoming)
+                next_resync = time.monotonic() + resync_every
+
+            due = scheduler.pop_due(timezone.now(), options["batch_size"])
+            if due:
+                released = release_expired_reservations(ids=due, chunk_size=options["batch_size"])
+                if released:
+                    total += released
+                    logger.info("Released %d expired reservation(s).", released)
+                continue
+
+            wake_in = next_resync - time.monotonic()
+            next_due = scheduler.next_due()
+            if next_due is not None:
+                wake_in = min(wake_in, (next_due - timezone.now()).total_seconds())
+            if deadline is not None:
+                wake_in = min(wake_in, deadline - time.monotonic())
+            # Expiry times are exclusive ("expires_at < now"), so wake just after.
+            stop.wait(max(wake_in, 0) + 0.01)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Expiry daemon stopped. Released {total} expired reservation(s)."
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from events.models import Reservation
+from events.ticket_codes import LEGACY_PATTERN
+
+
+class Command(BaseCommand):
+    help = (
+        "Lists the events that haven't ended yet and still have tickets "
+        "with an unsigned (pre-HMAC) code. Once there are none, "
+        "TICKET_CODE_ACCEPT_LEGACY can be turned off."
+    )
+
+    def handle(self, *args, **options):
+        rows = (
+            Reservation.objects.filter(
+                ticket_code__regex=LEGACY_PATTERN,
+                confirmed=True,
+                ticket_type__event__end_date__gte=timezone.now(),
+            )
+            .values_list("ticket_type__event", "ticket_type__event__title")
+            .annotate(tickets=Count("pk"))
+            .order_by("ticket_type__event")
+        )
+
+        found = 0
+        for event_id, title, tickets in rows:
+            found += 1
+            self.stdout.write(f"Event {event_id} ({title}): {tickets} legacy ticket code(s)")
+
+        if found:
+            self.stdout.write(self.style.WARNING(
+                f"{found} upcoming event(s) still need TICKET_CODE_ACCEPT_LEGACY=True."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                "No upcoming event has legacy ticket codes; TICKET_CODE_ACCEPT_LEGACY can be turned off."
+            ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from events import idempotency, live, waiting_room
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes short-lived bookkeeping rows that are no longer needed: "
+        "waiting-room queue tokens whose admission window has passed, "
+        "idempotency keys past their TTL and live-feed changes older than "
+        "LIVE_FEED_RETENTION_HOURS. Intended to run periodically, "
+        "next to expire_reservations."
+    )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+
+        tokens = waiting_room.get_store().purge(now - waiting_room.admission_window())
+        keys = idempotency.purge_expired(now)
+        changes = live.purge(now)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {tokens} waiting-room token(s), {keys} idempotency key(s) "
+            f"and {changes} live-feed change(s)."
+        ))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from events.inventory import rebalance_shards
+from events.models import TicketType
+
+
+class Command(BaseCommand):
+    help = (
+        "Spreads a ticket type's stock evenly across N sub-counters (shards) "
+        "so flash-sale reservations don't all queue on one row, or folds "
+        "it back into a single counter with --shards 0. Without --shards, "
+        "re-evens the stock of every already-sharded ticket type (safe to "
+        "run periodically during an on-sale)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ticket-type",
+            type=int,
+            action="append",
+            dest="ticket_types",
+            help="Ticket type id to (re)shard. Can be given more than once.",
+        )
+        parser.add_argument(
+            "--shards",
+            type=int,
+            help="Number of shards to split the stock into (0 = unsharded).",
+        )
+
+    def handle(self, *args, **options):
+        ticket_type_ids = options["ticket_types"]
+        shard_count = options["shards"]
+
+        if shard_count is not None and not ticket_type_ids:
+            raise CommandError("--shards needs at least one --ticket-type.")
+
+        if not ticket_type_ids:
+            ticket_type_ids = list(
+                TicketType.objects.filter(shard_count__gt=0).values_list("id", flat=True)
+            )
+
+        for ticket_type_id in ticket_type_ids:
+            try:
+                ticket_type = rebalance_shards(ticket_type_id, shard_count)
+            except TicketType.DoesNotExist:
+                raise CommandError(f"Ticket type {ticket_type_id} does not exist.")
+            except ValueError as exc:
+                raise CommandError(f"Ticket type {ticket_type_id}: {exc}")
+
+            self.stdout.write(
+                f"Ticket type {ticket_type.pk} ({ticket_type.name}): "
+                f"{ticket_type.available_stock} ticket(s) across {ticket_type.shard_count} shard(s)."
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebalanced {len(ticket_type_ids)} ticket type(s)."))
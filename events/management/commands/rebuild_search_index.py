@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from events import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the SQLite full-text search table (events_event_fts) from "
+        "the events table, e.g. after loading data with raw SQL. Nothing to "
+        "do on PostgreSQL, where search_vector is a generated column."
+    )
+
+    def handle(self, *args, **options):
+        engine = search.backend()
+        if engine == "tsvector":
+            self.stdout.write("PostgreSQL keeps search_vector up to date by itself; nothing to rebuild.")
+            return
+        if engine is None:
+            self.stdout.write(self.style.WARNING(
+                "No full-text index on this database (run migrate); search uses icontains."
+            ))
+            return
+
+        indexed = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} event(s)."))
@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from events.inventory import find_stock_drift, repair_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Checks every ticket type's stock against its reservations "
+        "(expected available = total - reserved) and reports any drift, "
+        "e.g. from a silently clamped release or a manual admin edit. "
+        "Use --repair to reset drifted counters in batches, and add "
+        "--dry-run to see exactly what --repair would change."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Reset drifted ticket types to the stock their reservations imply.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="With --repair: re-check under locks and report, but roll back.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Ticket types repaired per transaction (default: 500).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows fetched per round trip while scanning (default: 2000).",
+        )
+
+    def handle(self, *args, **options):
+        repair = options["repair"]
+        dry_run = options["dry_run"]
+
+        found = repaired = 0
+        batch = []
+
+        for drift in find_stock_drift(chunk_size=options["chunk_size"]):
+            found += 1
+            self.stdout.write(self._describe(drift))
+            if repair:
+                batch.append(drift.ticket_type_id)
+                if len(batch) >= options["batch_size"]:
+                    repaired += self._repair(batch, dry_run)
+                    batch = []
+
+        if repair and batch:
+            repaired += self._repair(batch, dry_run)
+
+        if not found:
+            self.stdout.write(self.style.SUCCESS("All ticket types are consistent."))
+        elif not repair:
+            self.stdout.write(self.style.WARNING(
+                f"{found} ticket type(s) drifted. Run with --repair to fix them."
+            ))
+        elif dry_run:
+            self.stdout.write(self.style.WARNING(
+                f"Dry run: would repair {repaired} of {found} drifted ticket type(s)."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Repaired {repaired} of {found} drifted ticket type(s)."
+            ))
+
+    def _repair(self, ticket_type_ids, dry_run):
+        with transaction.atomic():
+            repaired = repair_stock(ticket_type_ids)
+            if dry_run:
+                transaction.set_rollback(True)
+        # Anything scanned as drifted but fine under the lock was an
+        # in-flight reservation, not drift.
+        return len(repaired)
+
+    @staticmethod
+    def _describe(drift):
+        line = (
+            f"Ticket type {drift.ticket_type_id} ({drift.name}): "
+            f"{drift.actual} available, expected {drift.expected} "
+            f"({drift.total} total - {drift.held} reserved)"
+        )
+        if drift.held > drift.total:
+            line += f" — oversold by {drift.held - drift.total}"
+        return line
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-18 06:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0009_reservation_is_used_reservation_used_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tickettype',
+            name='shard_count',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Split the stock across this many sub-counters to spread write contention during flash sales (0 = a single counter). Change it with the rebalance_stock_shards command.'),
+        ),
+        migrations.CreateModel(
+            name='TicketStockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('capacity', models.PositiveIntegerField()),
+                ('available_quantity', models.PositiveIntegerField()),
+                ('ticket_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='events.tickettype')),
+            ],
+            options={
+                'verbose_name': 'Ticket stock shard',
+                'verbose_name_plural': 'Ticket stock shards',
+                'ordering': ['ticket_type', 'index'],
+                'constraints': [models.UniqueConstraint(fields=('ticket_type', 'index'), name='ticket_stock_shard_unique_index'), models.CheckConstraint(condition=models.Q(('available_quantity__gte', 0)), name='ticket_stock_shard_available_non_negative'), models.CheckConstraint(condition=models.Q(('available_quantity__lte', models.F('capacity'))), name='ticket_stock_shard_available_not_exceed_capacity')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0.2 on 2026-10-18 06:38
+
+import django.core.validators
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_ticket_stock_shards'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='waiting_room_enabled',
+            field=models.BooleanField(default=False, help_text="Queue buyers in a virtual waiting room and admit them to checkout at each ticket type's admission rate (for high-demand on-sales)."),
+        ),
+        migrations.AddField(
+            model_name='tickettype',
+            name='admission_rate',
+            field=models.PositiveIntegerField(blank=True, help_text="Buyers admitted per minute while the event's waiting room is on (blank = the WAITING_ROOM_ADMISSION_RATE setting).", null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.CreateModel(
+            name='AdmissionQueue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tail_at', models.DateTimeField()),
+                ('ticket_type', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='admission_queue', to='events.tickettype')),
+            ],
+            options={
+                'verbose_name': 'Admission queue',
+                'verbose_name_plural': 'Admission queues',
+            },
+        ),
+        migrations.CreateModel(
+            name='QueueToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('admit_at', models.DateTimeField()),
+                ('used_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('ticket_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queue_tokens', to='events.tickettype')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queue_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Queue token',
+                'verbose_name_plural': 'Queue tokens',
+                'ordering': ['admit_at'],
+                'indexes': [models.Index(fields=['ticket_type', 'admit_at'], name='queue_token_position_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-18 06:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0012_cart_orders'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['confirmed', 'expires_at'], name='reservation_expiry_idx'),
+        ),
+    ]
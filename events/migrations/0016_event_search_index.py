@@ -0,0 +1,79 @@
+from django.db import migrations
+
+# Full-text index over Event title / location / description. See
+# events/search.py for the queries.
+#
+# SQLite: an FTS5 table with its own copy of the text (rowid = event id),
+# kept in sync by the post_save / post_delete handlers in events/signals.py.
+# Triggers would be dropped every time Django's SQLite schema editor
+# rebuilds events_event for a later migration.
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE events_event_fts USING fts5(
+        title, location, description,
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO events_event_fts(rowid, title, location, description)
+    SELECT id, title, location, description FROM events_event
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS events_event_fts",
+]
+
+# PostgreSQL: a generated tsvector column with a GIN index, so the
+# database keeps it in sync on every write path. 'simple' (no stemming)
+# because titles and descriptions mix Romanian and English.
+# Weights: title A, location B, description C.
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE events_event ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(location, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX events_event_search_idx ON events_event USING GIN (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS events_event_search_idx",
+    "ALTER TABLE events_event DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _run(schema_editor, SQLITE_FORWARD)
+    elif vendor == "postgresql":
+        _run(schema_editor, POSTGRES_FORWARD)
+    # Other backends: events.search falls back to icontains.
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _run(schema_editor, SQLITE_BACKWARD)
+    elif vendor == "postgresql":
+        _run(schema_editor, POSTGRES_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0015_event_listing_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
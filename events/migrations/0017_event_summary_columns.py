@@ -0,0 +1,56 @@
+# Generated by Django 6.0.2 on 2026-10-18 06:55
+
+from django.db import migrations, models
+from django.db.models import Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_summaries(apps, schema_editor):
+    # Same expressions as Event.summary_expressions(), on the historical models.
+    Event = apps.get_model("events", "Event")
+    TicketType = apps.get_model("events", "TicketType")
+    TicketStockShard = apps.get_model("events", "TicketStockShard")
+
+    ticket_types = TicketType.objects.filter(event=OuterRef("pk")).order_by().values("event")
+    shards = (
+        TicketStockShard.objects.filter(ticket_type__event=OuterRef("pk"))
+        .order_by().values("ticket_type__event")
+    )
+
+    def total(queryset, aggregate):
+        return Subquery(queryset.annotate(value=aggregate).values("value"))
+
+    Event.objects.update(
+        min_price=total(ticket_types, Min("price")),
+        capacity_total=Coalesce(total(ticket_types, Sum("total_quantity")), 0),
+        available_total=(
+            Coalesce(total(ticket_types, Sum("available_quantity")), 0)
+            + Coalesce(total(shards, Sum("available_quantity")), 0)
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0016_event_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='available_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='capacity_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='min_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=8, null=True),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
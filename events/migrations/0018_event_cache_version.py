@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0017_event_summary_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-18 07:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0019_reservation_table_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('tickets', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('checked_in', models.PositiveIntegerField(default=0)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='events.event')),
+                ('ticket_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='events.tickettype')),
+            ],
+            options={
+                'verbose_name': 'Daily sales',
+                'verbose_name_plural': 'Daily sales',
+                'ordering': ['day'],
+                'indexes': [models.Index(fields=['event', 'day'], name='daily_sales_event_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ticket_type', 'day'), name='unique_daily_sales_per_ticket_type_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-18 07:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0020_daily_sales'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['organizer', 'start_date', 'id'], name='event_organizer_start_idx'),
+        ),
+    ]
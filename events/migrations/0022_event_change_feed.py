@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-18 07:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0021_event_organizer_start_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('sale', 'Sale'), ('checkin', 'Check-in')], max_length=10)),
+                ('quantity', models.PositiveIntegerField()),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='events.event')),
+                ('ticket_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='events.tickettype')),
+            ],
+            options={
+                'verbose_name': 'Event change',
+                'verbose_name_plural': 'Event changes',
+                'indexes': [models.Index(fields=['event', 'id'], name='event_change_feed_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0022_event_change_feed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reservation',
+            name='ticket_code',
+            field=models.CharField(blank=True, editable=False, max_length=40, null=True, unique=True),
+        ),
+    ]
@@ -3,11 +3,14 @@ from datetime import timedelta
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 import uuid
 
+from .ticket_codes import make_code
+
 RESERVATION_HOLD_MINUTES = 15
 
 
@@ -25,6 +28,61 @@ hex_color_validator = RegexValidator(
 )
 
 
+class EventQuerySet(models.QuerySet):
+
+    def with_expired_holds(self, now=None):
+        """
+        Annotates `expired_held`: the event's tickets held by unconfirmed
+        reservations whose hold has lapsed but that haven't been swept
+        yet (the event-wide TicketType.objects.with_expired_holds()).
+        Event.available_tickets and tickets_sold count them as available.
+        """
+        expired = (
+            Reservation.objects
+            .filter(ticket_type__event=OuterRef("pk"), confirmed=False, expires_at__lt=now or timezone.now())
+            .order_by()
+            .values("ticket_type__event")
+            .annotate(total=Sum("quantity"))
+            .values("total")
+        )
+        return self.annotate(expired_held=Coalesce(Subquery(expired), 0))
+
+    def with_stats(self):
+        """
+        Annotates each event with `sold` (tickets no longer on sale, as
+        Event.tickets_sold), `capacity`, `revenue` (confirmed reservations)
+        and `checked_in`, in the same query: sold/capacity come from the
+        summary columns and the rest from correlated subqueries, so there's
+        no join fan-out and no per-event query.
+        """
+        per_event = (
+            Reservation.objects.filter(ticket_type__event=OuterRef("pk"), confirmed=True)
+            .order_by().values("ticket_type__event")
+        )
+
+        def total(aggregate, output_field):
+            return Coalesce(
+                Subquery(per_event.annotate(value=aggregate).values("value"), output_field=output_field),
+                0,
+                output_field=output_field,
+            )
+
+        money = models.DecimalField(max_digits=12, decimal_places=2)
+        return self.annotate(
+            capacity=models.F("capacity_total"),
+            sold=models.F("capacity_total") - models.F("available_total"),
+            revenue=total(
+                Sum(models.ExpressionWrapper(
+                    models.F("quantity") * models.F("ticket_type__price"), output_field=money,
+                )),
+                money,
+            ),
+            checked_in=total(
+                Sum("quantity", filter=models.Q(is_used=True)), models.IntegerField()
+            ),
+        )
+
+
 class Event(models.Model):
     organizer = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -64,6 +122,35 @@ class Event(models.Model):
         help_text="Promotional message displayed on the event page.",
     )
 
+    waiting_room_enabled = models.BooleanField(
+        default=False,
+        help_text=(
+            "Queue buyers in a virtual waiting room and admit them to checkout "
+            "at each ticket type's admission rate (for high-demand on-sales)."
+        ),
+    )
+
+    # Summary of the ticket types, stored so listings never have to load
+    # them. Only written by refresh_summary(): directly when ticket types
+    # change, and right after commit when stock moves (see
+    # refresh_summary_on_commit()).
+    min_price = models.DecimalField(
+        max_digits=8, decimal_places=2, null=True, blank=True, editable=False
+    )
+    available_total = models.PositiveIntegerField(default=0, editable=False)
+    capacity_total = models.PositiveIntegerField(default=0, editable=False)
+
+    SUMMARY_FIELDS = ("min_price", "available_total", "capacity_total")
+
+    # Bumped on every write that changes how the event renders; part of
+    # every cached fragment's key (see events/fragment_cache.py).
+    cache_version = models.PositiveIntegerField(default=1, editable=False)
+
+    # Columns only ever written by targeted UPDATEs, never by save().
+    UPDATE_ONLY_FIELDS = SUMMARY_FIELDS + ("cache_version",)
+
+    objects = EventQuerySet.as_manager()
+
     class Meta:
         ordering = ["start_date"]
         verbose_name = "Event"
@@ -74,10 +161,27 @@ class Event(models.Model):
                 name="event_end_after_start",
             ),
         ]
+        indexes = [
+            # events_list pages by (start_date, id) and hides ended events.
+            models.Index(fields=["start_date", "id"], name="event_listing_keyset_idx"),
+            models.Index(fields=["end_date"], name="event_end_date_idx"),
+            # my_events: an organizer's upcoming / started events, paged by (start_date, id).
+            models.Index(fields=["organizer", "start_date", "id"], name="event_organizer_start_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # A full save of an event loaded earlier (edit_event, the admin)
+        # must not write back a stale copy of the summary columns.
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.UPDATE_ONLY_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def clean(self):
         if self.start_date and self.end_date and self.end_date < self.start_date:
             raise ValidationError("End date cannot be before start date.")
@@ -93,16 +197,17 @@ class Event(models.Model):
 
     @property
     def available_tickets(self):
-        return sum(t.available_quantity for t in self.ticket_types.all())
+        # Lapsed holds, when loaded through with_expired_holds(); the
+        # summary column only gets them back once they're swept.
+        return min(self.available_total + getattr(self, "expired_held", 0), self.capacity_total)
 
     @property
     def total_capacity(self):
-        return sum(t.total_quantity for t in self.ticket_types.all())
+        return self.capacity_total
 
     @property
     def starting_price(self):
-        prices = [t.price for t in self.ticket_types.all()]
-        return min(prices) if prices else None
+        return self.min_price
 
     @property
     def confirmed_attendees(self):
@@ -112,25 +217,116 @@ class Event(models.Model):
 
     @property
     def tickets_sold(self):
-        return self.ticket_types.aggregate(
-            sold=Sum(models.F("total_quantity") - models.F("available_quantity"))
-        )["sold"] or 0
+        return self.total_capacity - self.available_tickets
 
     @property
     def total_revenue(self):
-        return sum(
-            res.total_price
-            for res in Reservation.objects.filter(
-                ticket_type__event=self,
-                confirmed=True,
-            )
+        # Summed in SQL; the organizer dashboard gets this (and the rest of
+        # its numbers) from events.stats.EventStats instead.
+        return Reservation.objects.filter(
+            ticket_type__event=self,
+            confirmed=True,
+        ).aggregate(
+            total=Sum(models.F("quantity") * models.F("ticket_type__price"))
+        )["total"] or 0
+
+    @classmethod
+    def summary_expressions(cls):
+        """The summary columns, computed from the ticket types (and their shards) in SQL."""
+        ticket_types = TicketType.objects.filter(event=OuterRef("pk")).order_by().values("event")
+        shards = (
+            TicketStockShard.objects.filter(ticket_type__event=OuterRef("pk"))
+            .order_by().values("ticket_type__event")
         )
 
+        def total(queryset, aggregate):
+            return Subquery(queryset.annotate(value=aggregate).values("value"))
+
+        return {
+            "min_price": total(ticket_types, Min("price")),
+            "capacity_total": Coalesce(total(ticket_types, Sum("total_quantity")), 0),
+            "available_total": (
+                Coalesce(total(ticket_types, Sum("available_quantity")), 0)
+                + Coalesce(total(shards, Sum("available_quantity")), 0)
+            ),
+        }
+
+    @classmethod
+    def refresh_summary(cls, event_ids):
+        """Recomputes the summary columns of `event_ids` with one UPDATE."""
+        return cls.objects.filter(pk__in=event_ids).update(**cls.summary_expressions())
+
+    @classmethod
+    def bump_cache_version(cls, event_id):
+        cls.objects.filter(pk=event_id).update(cache_version=models.F("cache_version") + 1)
+
+    @classmethod
+    def refresh_summary_locked(cls, event_ids):
+        """
+        refresh_summary() for use outside the transaction that moved the
+        stock: takes the event row locks first, so the UPDATE that follows
+        reads the stock committed by whoever held them before.
+        """
+        with transaction.atomic():
+            locked = list(
+                cls.objects.select_for_update().filter(pk__in=event_ids)
+                .order_by("pk").values_list("pk", flat=True)
+            )
+            return cls.refresh_summary(locked)
+
+    @classmethod
+    def refresh_summary_on_commit(cls, event_ids):
+        # Stock changes never touch the event row inside the buyer's
+        # transaction: holding its lock until commit would queue buyers of
+        # every ticket type of the event behind one row again, and a cart
+        # spanning two events could take the two event locks in the
+        # opposite order of another cart and deadlock. The summary is
+        # recomputed from the committed stock instead.
+        #
+        # Every event touched by a transaction is refreshed once, by the
+        # first of its callbacks to run; the others find nothing left.
+        #
+        # A single UPDATE ... SET = (subquery) isn't enough after commit:
+        # under READ COMMITTED, one that waited on another refresh's row
+        # lock still writes the totals of the snapshot it started with,
+        # which may predate the stock the other refresh committed.
+        connection = transaction.get_connection()
+        pending = connection.__dict__.setdefault("_pending_event_summaries", set())
+        pending.update(event_ids)
+
+        def refresh():
+            event_ids = sorted(pending)
+            pending.clear()
+            if event_ids:
+                cls.refresh_summary_locked(event_ids)
+
+        transaction.on_commit(refresh)
+
 
 # ====================================
 # 🎫 MODEL: TicketType
 # ====================================
 
+class TicketTypeQuerySet(models.QuerySet):
+
+    def with_expired_holds(self, now=None):
+        """
+        Annotates `expired_held`: tickets held by unconfirmed reservations
+        whose hold has lapsed but that haven't been swept yet. Used by the
+        display paths when lazy expiry is on, since a buyer would get those
+        tickets back inline anyway.
+        """
+        expired = (
+            Reservation.objects
+            .filter(ticket_type=models.OuterRef("pk"), confirmed=False, expires_at__lt=now or timezone.now())
+            .order_by()
+            .values("ticket_type")
+            .annotate(total=Sum("quantity"))
+            .values("total")
+        )
+        return self.annotate(expired_held=Coalesce(models.Subquery(expired), 0))
+
+
 class TicketType(models.Model):
 
     event = models.ForeignKey(
@@ -150,6 +346,27 @@ class TicketType(models.Model):
     total_quantity = models.PositiveIntegerField()
     available_quantity = models.PositiveIntegerField()
 
+    admission_rate = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(1)],
+        help_text=(
+            "Buyers admitted per minute while the event's waiting room is on "
+            "(blank = the WAITING_ROOM_ADMISSION_RATE setting)."
+        ),
+    )
+
+    shard_count = models.PositiveSmallIntegerField(
+        default=0,
+        help_text=(
+            "Split the stock across this many sub-counters to spread write "
+            "contention during flash sales (0 = a single counter). Change it "
+            "with the rebalance_stock_shards command."
+        ),
+    )
+
+    objects = TicketTypeQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Ticket type"
         verbose_name_plural = "Ticket types"
@@ -179,8 +396,18 @@ class TicketType(models.Model):
                 "Available tickets cannot exceed total tickets."
             )
 
+    @property
+    def available_stock(self):
+        # For sharded ticket types the stock lives in the shard rows; the
+        # base counter only holds whatever hasn't been spread out yet.
+        stock = self.available_quantity
+        if self.shard_count:
+            stock += sum(shard.available_quantity for shard in self.shards.all())
+        # Lapsed holds, when loaded through with_expired_holds().
+        return min(stock + getattr(self, "expired_held", 0), self.total_quantity)
+
     def has_stock(self, quantity: int) -> bool:
-        return quantity > 0 and self.available_quantity >= quantity
+        return quantity > 0 and self.available_stock >= quantity
 
     def reserve(self, quantity: int):
 
@@ -191,8 +418,28 @@ class TicketType(models.Model):
             raise ValidationError("Not enough tickets available.")
 
         self.available_quantity -= quantity
+        # The post_save signal refreshes the event summary after commit.
         self.save(update_fields=["available_quantity"])
 
+    def reserve_if_available(self, quantity: int) -> bool:
+        # Lock-free counterpart to reserve(): the stock check and the
+        # decrement run as one guarded UPDATE, so concurrent buyers never
+        # queue on a row lock held across Python code. The CheckConstraints
+        # above still reject anything that would push the counter below 0.
+        if quantity <= 0:
+            raise ValueError("Quantity must be greater than 0.")
+
+        updated = TicketType.objects.filter(
+            pk=self.pk,
+            available_quantity__gte=quantity,
+        ).update(available_quantity=models.F("available_quantity") - quantity)
+        if updated:
+            Event.refresh_summary_on_commit([self.event_id])
+
+        # The in-memory available_quantity is left as loaded on purpose:
+        # re-reading it would cost the extra query this path exists to avoid.
+        return bool(updated)
+
     def release(self, quantity: int):
 
         if quantity <= 0:
@@ -203,9 +450,154 @@ class TicketType(models.Model):
             self.available_quantity + quantity
         )
 
+        # The post_save signal refreshes the event summary after commit.
         self.save(update_fields=["available_quantity"])
 
 
+# ====================================
+# 🧩 MODEL: TicketStockShard
+# ====================================
+
+class TicketStockShard(models.Model):
+    """
+    One sub-counter of a sharded ticket type's stock. Each shard owns a
+    fixed slice (`capacity`) of the ticket type's total_quantity, so the
+    shards can never add up to more than the total even though they're
+    updated independently.
+    """
+
+    ticket_type = models.ForeignKey(
+        TicketType,
+        on_delete=models.CASCADE,
+        related_name="shards",
+    )
+
+    index = models.PositiveSmallIntegerField()
+    capacity = models.PositiveIntegerField()
+    available_quantity = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = "Ticket stock shard"
+        verbose_name_plural = "Ticket stock shards"
+        ordering = ["ticket_type", "index"]
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ticket_type", "index"],
+                name="ticket_stock_shard_unique_index",
+            ),
+            models.CheckConstraint(
+                condition=models.Q(available_quantity__gte=0),
+                name="ticket_stock_shard_available_non_negative",
+            ),
+            models.CheckConstraint(
+                condition=models.Q(available_quantity__lte=models.F("capacity")),
+                name="ticket_stock_shard_available_not_exceed_capacity",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.ticket_type} [shard {self.index}]"
+
+
+# ====================================
+# 🚦 MODELS: Waiting room
+# ====================================
+
+class AdmissionQueue(models.Model):
+    """
+    Per-ticket-type admission schedule for the database-backed waiting
+    room. `tail_at` is when the most recently queued buyer gets in; the
+    row is locked only for the instant it takes to hand out a new slot.
+    """
+
+    ticket_type = models.OneToOneField(
+        TicketType,
+        on_delete=models.CASCADE,
+        related_name="admission_queue",
+    )
+
+    tail_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Admission queue"
+        verbose_name_plural = "Admission queues"
+
+    def __str__(self):
+        return f"Queue for {self.ticket_type}"
+
+
+class QueueToken(models.Model):
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+
+    ticket_type = models.ForeignKey(
+        TicketType,
+        on_delete=models.CASCADE,
+        related_name="queue_tokens",
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="queue_tokens",
+    )
+
+    admit_at = models.DateTimeField()
+    used_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Queue token"
+        verbose_name_plural = "Queue tokens"
+        ordering = ["admit_at"]
+        indexes = [
+            # Position lookups count the tokens queued ahead of this one.
+            models.Index(fields=["ticket_type", "admit_at"], name="queue_token_position_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} → {self.ticket_type} @ {self.admit_at:%H:%M:%S}"
+
+
+# ====================================
+# 🛒 MODEL: Order
+# ====================================
+
+class Order(models.Model):
+    """
+    Groups the reservations made together in one cart checkout (possibly
+    across several events), so they're paid with a single Payment. That
+    Payment hangs off the order's lead (first) reservation.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="orders",
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Order"
+        verbose_name_plural = "Orders"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Order {self.id} - {self.user.username}"
+
+    @property
+    def lead_reservation(self):
+        return self.reservations.order_by("pk").first()
+
+    @property
+    def total_price(self):
+        return sum(
+            res.total_price
+            for res in self.reservations.select_related("ticket_type")
+        )
+
+
 # ====================================
 # 📦 MODEL: Reservation
 # ====================================
@@ -225,6 +617,14 @@ class Reservation(models.Model):
 
     quantity = models.PositiveIntegerField(default=1)
 
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="reservations",
+    )
+
     confirmed = models.BooleanField(default=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -235,7 +635,7 @@ class Reservation(models.Model):
     )
 
     ticket_code = models.CharField(
-        max_length=20,
+        max_length=40,
         unique=True,
         editable=False,
         blank=True,
@@ -253,6 +653,13 @@ class Reservation(models.Model):
         verbose_name = "Reservation"
         verbose_name_plural = "Reservations"
         ordering = ["-created_at"]
+        indexes = [
+            # expire_reservations: WHERE confirmed = false AND expires_at < now
+            models.Index(fields=["confirmed", "expires_at"], name="reservation_expiry_idx"),
+            # ticket_management pages an event's reservations newest first:
+            # WHERE ticket_type_id IN (...) AND id < :cursor ORDER BY id DESC
+            models.Index(fields=["ticket_type", "id"], name="reservation_type_id_idx"),
+        ]
 
         constraints = [
             models.CheckConstraint(
@@ -262,11 +669,18 @@ class Reservation(models.Model):
         ]
 
     def save(self, *args, **kwargs):
+        if self.ticket_code or self.pk is not None:
+            if not self.ticket_code:
+                self.ticket_code = make_code(self.ticket_type.event_id, self.pk)
+            super().save(*args, **kwargs)
+            return
 
-        if not self.ticket_code:
-            self.ticket_code = f"ET-{uuid.uuid4().hex[:10].upper()}"
-
-        super().save(*args, **kwargs)
+        # The code signs the primary key, which only exists once the row
+        # is inserted: insert without a code, then fill it in.
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+            self.ticket_code = make_code(self.ticket_type.event_id, self.pk)
+            Reservation.objects.filter(pk=self.pk).update(ticket_code=self.ticket_code)
 
     def __str__(self):
         return f"{self.user.username} - {self.ticket_type.name}"
@@ -279,6 +693,19 @@ class Reservation(models.Model):
     def total_price(self):
         return self.ticket_type.price * self.quantity
 
+    @property
+    def amount_due(self):
+        # Cart reservations are paid together, through the order's lead.
+        if self.order_id:
+            return self.order.total_price
+        return self.total_price
+
+    @property
+    def payment_items(self):
+        if self.order_id:
+            return list(self.order.reservations.select_related("ticket_type", "ticket_type__event").order_by("pk"))
+        return [self]
+
     @property
     def is_expired(self):
         return not self.confirmed and timezone.now() > self.expires_at
@@ -293,6 +720,8 @@ class Reservation(models.Model):
 # ====================================
 
 class Payment(models.Model):
+    # For a cart order, `reservation` is the order's lead reservation and
+    # `amount` covers every reservation in the order.
 
     STATUS_PENDING = "pending"
     STATUS_COMPLETED = "completed"
@@ -333,6 +762,9 @@ class Payment(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # When the payment was confirmed; the day it counts towards in DailySales.
+    completed_at = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         verbose_name = "Payment"
         verbose_name_plural = "Payments"
@@ -350,4 +782,127 @@ class Payment(models.Model):
 
     @property
     def is_successful(self):
-        return self.status == self.STATUS_COMPLETED
\ No newline at end of file
+        return self.status == self.STATUS_COMPLETED
+
+# ====================================
+# 📈 MODEL: DailySales
+# ====================================
+
+class DailySales(models.Model):
+    """
+    Per ticket type and day: tickets sold and their revenue (by the day
+    their payment completed) and tickets checked in (by the day they were
+    scanned). Kept up to date by events/sales.py as payments complete and
+    tickets are checked in, so sales-over-time reads a few pre-aggregated
+    rows instead of every reservation; `manage.py backfill_daily_sales`
+    rebuilds it from scratch.
+    """
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="daily_sales")
+    ticket_type = models.ForeignKey(TicketType, on_delete=models.CASCADE, related_name="daily_sales")
+    day = models.DateField()
+
+    tickets = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    checked_in = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Daily sales"
+        verbose_name_plural = "Daily sales"
+        ordering = ["day"]
+        indexes = [
+            models.Index(fields=["event", "day"], name="daily_sales_event_day_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ticket_type", "day"],
+                name="unique_daily_sales_per_ticket_type_day",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.ticket_type} - {self.day}"
+
+
+# ====================================
+# 📡 MODEL: EventChange
+# ====================================
+
+class EventChange(models.Model):
+    """
+    One row per sale or check-in: the change feed behind the live counters
+    on ticket_management (events/live.py). Short-lived; purge_stale_records
+    deletes rows older than LIVE_FEED_RETENTION_HOURS.
+    """
+
+    KIND_SALE = "sale"
+    KIND_CHECKIN = "checkin"
+
+    KIND_CHOICES = [
+        (KIND_SALE, "Sale"),
+        (KIND_CHECKIN, "Check-in"),
+    ]
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="changes")
+    ticket_type = models.ForeignKey(TicketType, on_delete=models.CASCADE, related_name="changes")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    quantity = models.PositiveIntegerField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Event change"
+        verbose_name_plural = "Event changes"
+        indexes = [
+            # The feed polls WHERE event_id = :event AND id > :last ORDER BY id.
+            models.Index(fields=["event", "id"], name="event_change_feed_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} x{self.quantity} - {self.event_id}"
+
+
+# ====================================
+# 🔁 MODEL: IdempotencyKey
+# ====================================
+
+class IdempotencyKey(models.Model):
+    """
+    The stored outcome of a request sent with an `Idempotency-Key` header,
+    so a client retrying it (flaky mobile network, double tap) gets the
+    first response back instead of a second hold or a second Stripe call.
+    `status_code` stays empty while the first request is still running.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="idempotency_keys",
+    )
+
+    # Which endpoint the key was used on; keys are only unique per user and scope.
+    scope = models.CharField(max_length=32)
+    key = models.CharField(max_length=64)
+    # SHA-256 of method, path and body: a reused key must mean the same request.
+    request_hash = models.CharField(max_length=64)
+
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    location = models.CharField(max_length=500, blank=True)
+    body = models.BinaryField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Idempotency key"
+        verbose_name_plural = "Idempotency keys"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "scope", "key"],
+                name="unique_idempotency_key_per_user_scope",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key} ({self.user})"
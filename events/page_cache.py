@@ -0,0 +1,107 @@
+"""
+Whole-page cache for logged-out visitors of event_detail.
+
+A visitor qualifies when the request carries neither a session cookie nor
+a messages cookie. That check needs no session load and no database, and
+those two cookies are the only things that make an anonymous render
+differ. The cached page can trail stock and attendee numbers; the page's
+JavaScript refreshes them from the (micro-cached) availability endpoint.
+
+Entries live in a per-process cache for EVENT_PAGE_CACHE_SECONDS. On a
+local miss the page comes from the shared cache through
+events.single_flight, so when a hot page expires one request renders it
+and the rest (in every worker) wait for it or get the previous copy.
+Writes to the event or its ticket types drop the shared copy and this
+process's copy right away (events/signals.py); other workers catch up
+when theirs expires.
+"""
+import functools
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from . import single_flight
+
+
+def _cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def page_key(event_id):
+    return f"event-page:{event_id}"
+
+
+def is_cacheable(request):
+    return (
+        request.method in ("GET", "HEAD")
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and CookieStorage.cookie_name not in request.COOKIES
+    )
+
+
+def _storable(request, response):
+    # A page carrying a CSRF token or setting cookies is specific to
+    # the visitor it was rendered for.
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+    )
+
+
+def cache_anonymous_page(view):
+    """Decorator for a view taking the event `pk`."""
+
+    @functools.wraps(view)
+    def wrapper(request, pk, *args, **kwargs):
+        if not is_cacheable(request):
+            return view(request, pk, *args, **kwargs)
+
+        cache = _cache()
+        key = page_key(pk)
+        content = cache.get(key)
+        rendered = None
+
+        if content is None:
+            def render():
+                nonlocal rendered
+                rendered = view(request, pk, *args, **kwargs)
+                return rendered.content if _storable(request, rendered) else None
+
+            content = single_flight.get_or_compute(key, render, settings.EVENT_PAGE_CACHE_SECONDS)
+            if content is not None:
+                cache.set(key, content, settings.EVENT_PAGE_CACHE_SECONDS)
+
+        if rendered is not None:
+            response = rendered
+        else:
+            response = HttpResponse(content)
+            response["X-Page-Cache"] = "hit"
+
+        # Logged-in visitors get a different page from the same URL.
+        patch_vary_headers(response, ("Cookie",))
+        return response
+
+    return wrapper
+
+
+def invalidate(event_id):
+    key = page_key(event_id)
+    _cache().delete(key)
+    single_flight.invalidate(key)
+
+
+# The first page of events_list (no search, date filter or cursor) is what
+# most visitors land on; views.events_list keeps it in the shared cache
+# through single_flight, and the same writes that drop event pages drop it.
+
+def listing_key(show_all):
+    return f"events-list:first-page:{'all' if show_all else 'upcoming'}"
+
+
+def invalidate_listing():
+    single_flight.invalidate(listing_key(False), listing_key(True))
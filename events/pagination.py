@@ -0,0 +1,116 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of OFFSET (which makes the database walk and discard every row
+before the page), each page starts strictly after the last row of the
+previous one: WHERE (start_date, id) > (:last_start, :last_id). With an
+index on the ordering columns every page costs the same, however deep.
+
+Cursors are the ordering values of a boundary row, base64-encoded; a
+malformed cursor just falls back to the first page.
+"""
+import base64
+import binascii
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def _field(key):
+    return key.lstrip("-")
+
+
+def encode_cursor(obj, keys):
+    raw = "|".join(str(getattr(obj, _field(key))) for key in keys)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, model, keys):
+    """Returns the key values stored in `cursor`, or None if it's not valid."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        parts = raw.split("|")
+        if len(parts) != len(keys):
+            return None
+        return [
+            model._meta.get_field(_field(key)).to_python(part)
+            for key, part in zip(keys, parts)
+        ]
+    except (binascii.Error, UnicodeDecodeError, ValidationError, ValueError):
+        return None
+
+
+def _beyond(keys, values, forward):
+    # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), built for any number
+    # of keys; a "-key" compares the other way round.
+    condition = Q()
+    for index, key in enumerate(keys):
+        lookup = "gt" if forward != key.startswith("-") else "lt"
+        step = Q(**{f"{_field(key)}__{lookup}": values[index]})
+        for previous_key, previous_value in zip(keys[:index], values[:index]):
+            step &= Q(**{_field(previous_key): previous_value})
+        condition |= step
+    return condition
+
+
+def _reversed(key):
+    return _field(key) if key.startswith("-") else f"-{key}"
+
+
+def keyset_paginate(queryset, keys, page_size, after=None, before=None):
+    """
+    One page of `queryset` ordered by `keys` ("-key" for descending; the
+    last key must be unique, e.g. "id"). Pass the previous page's `next_cursor` as
+    `after`, or `previous_cursor` as `before` to go back.
+    """
+    keys = tuple(keys)
+    model = queryset.model
+
+    before_values = decode_cursor(before, model, keys) if before else None
+    after_values = decode_cursor(after, model, keys) if after and before_values is None else None
+
+    if before_values is not None:
+        rows = list(
+            queryset.filter(_beyond(keys, before_values, forward=False))
+            .order_by(*[_reversed(key) for key in keys])[:page_size + 1]
+        )
+        more_before = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1], keys) if rows else None,
+            previous_cursor=encode_cursor(rows[0], keys) if more_before else None,
+        )
+
+    if after_values is not None:
+        queryset = queryset.filter(_beyond(keys, after_values, forward=True))
+
+    rows = list(queryset.order_by(*keys)[:page_size + 1])
+    more_after = len(rows) > page_size
+    rows = rows[:page_size]
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1], keys) if more_after else None,
+        previous_cursor=encode_cursor(rows[0], keys) if after_values is not None and rows else None,
+    )
@@ -0,0 +1,86 @@
+"""
+Cache for rendered ticket QR codes (ticket_qr_image, download_ticket_pdf).
+
+A QR image depends only on what it encodes and how it's drawn, so entries
+are addressed by a hash of (data, box size, colors) and never go stale: a
+ticket's code doesn't change, and a new code is simply a new key.
+
+Two tiers: the "qr" LocMem cache in each worker (least recently used
+entries are culled past QR_CACHE_MAX_ENTRIES), then PNG files under
+QR_CACHE_DIR, shared by every worker and kept across restarts. Files are
+written to a temporary name and renamed, so a reader never sees half a
+PNG. The directory can be emptied at any time; entries are re-rendered
+on demand.
+
+The key doubles as a strong ETag: the same key always yields the same
+bytes.
+"""
+import hashlib
+import io
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import qrcode
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+# Bump when the rendering itself changes (border, error correction...).
+RENDER_VERSION = 1
+
+
+def qr_key(data, box_size, fill_color, back_color):
+    raw = "\0".join(str(part) for part in (RENDER_VERSION, data, box_size, fill_color, back_color))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _path(key):
+    return Path(settings.QR_CACHE_DIR) / key[:2] / f"{key}.png"
+
+
+def _render(data, box_size, fill_color, back_color):
+    qr = qrcode.QRCode(box_size=box_size, border=2)
+    qr.add_data(data)
+    qr.make(fit=True)
+    buffer = io.BytesIO()
+    qr.make_image(fill_color=fill_color, back_color=back_color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _write(path, png):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(png)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def get_png(data, box_size=8, fill_color="black", back_color="white"):
+    """The PNG bytes of `data`'s QR code, rendered at most once per key."""
+    cache = caches[settings.QR_CACHE_ALIAS]
+    key = qr_key(data, box_size, fill_color, back_color)
+
+    png = cache.get(key)
+    if png is not None:
+        return png
+
+    path = _path(key)
+    try:
+        png = path.read_bytes()
+    except OSError:
+        png = _render(data, box_size, fill_color, back_color)
+        try:
+            _write(path, png)
+        except OSError:
+            # A read-only or full disk only costs the second tier.
+            logger.warning("Couldn't write QR cache file %s", path, exc_info=True)
+
+    cache.set(key, png, None)
+    return png
@@ -0,0 +1,155 @@
+"""
+Maintenance of the DailySales rollup.
+
+Incremental: record_payment() when a payment completes (payment_success
+or the Stripe webhook, via _confirm_payment) and record_checkin() or
+record_checkins() when tickets are scanned (ticket_checkin, or the gate
+batches and offline scans of events/checkin.py). They run inside the
+caller's transaction, so a rolled-back confirmation or check-in leaves
+the rollup untouched, and each adds to its row with a relative UPDATE,
+so concurrent sales on the same day never overwrite each other.
+
+From scratch: rebuild() recomputes the rows of some (or all) events with
+two grouped queries; it backs `manage.py backfill_daily_sales`.
+
+A ticket counts as sold on the local day its payment completed (for
+payments from before completed_at existed, the day it was created), at
+its ticket type's price; a cart order's reservations all count on the day
+the order's payment completed. Reservations confirmed by hand in
+ticket_management weren't paid through the site and don't count as sales.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailySales, Payment, Reservation
+
+
+def _add(ticket_type, day, **deltas):
+    lookup = {"ticket_type_id": ticket_type.pk, "day": day}
+    changes = {field: F(field) + value for field, value in deltas.items()}
+    if DailySales.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            DailySales.objects.create(event_id=ticket_type.event_id, **lookup, **deltas)
+    except IntegrityError:
+        # Another transaction created the row first.
+        DailySales.objects.filter(**lookup).update(**changes)
+
+
+def record_payment(payment):
+    """Adds the tickets `payment` paid for to the day it completed."""
+    day = timezone.localdate(payment.completed_at or payment.created_at)
+    for reservation in payment.reservation.payment_items:
+        _add(
+            reservation.ticket_type,
+            day,
+            tickets=reservation.quantity,
+            revenue=reservation.ticket_type.price * reservation.quantity,
+        )
+
+
+def record_checkin(reservation):
+    _add(reservation.ticket_type, timezone.localdate(reservation.used_at), checked_in=reservation.quantity)
+
+
+def record_checkins(reservations):
+    """record_checkin() for many reservations: one UPDATE per ticket type and day."""
+    totals = defaultdict(int)
+    ticket_types = {}
+    for reservation in reservations:
+        key = (reservation.ticket_type_id, timezone.localdate(reservation.used_at))
+        totals[key] += reservation.quantity
+        ticket_types[reservation.ticket_type_id] = reservation.ticket_type
+    for (ticket_type_id, day), quantity in totals.items():
+        _add(ticket_types[ticket_type_id], day, checked_in=quantity)
+
+
+def move_checkin(reservation, previous_used_at):
+    """`reservation` was already counted at `previous_used_at`; its used_at has since changed."""
+    old_day, new_day = timezone.localdate(previous_used_at), timezone.localdate(reservation.used_at)
+    if old_day != new_day:
+        _add(reservation.ticket_type, old_day, checked_in=-reservation.quantity)
+        _add(reservation.ticket_type, new_day, checked_in=reservation.quantity)
+
+
+def _sales_rows(reservations):
+    completed = Payment.objects.filter(status=Payment.STATUS_COMPLETED)
+    paid_at = Coalesce("completed_at", "created_at")
+    # A reservation is paid through its own payment or, in a cart order,
+    # through the order's lead reservation's.
+    own = completed.filter(reservation=OuterRef("pk")).annotate(paid_at=paid_at).values("paid_at")[:1]
+    order = (
+        completed.filter(reservation__order=OuterRef("order"))
+        .annotate(paid_at=paid_at).values("paid_at")[:1]
+    )
+    return (
+        reservations.annotate(paid_at=Coalesce(Subquery(own), Subquery(order)))
+        .filter(paid_at__isnull=False)
+        .annotate(day=TruncDate("paid_at", tzinfo=timezone.get_current_timezone()))
+        .values("ticket_type", "ticket_type__event", "day")
+        .annotate(
+            tickets=Sum("quantity"),
+            revenue=Sum(ExpressionWrapper(
+                F("quantity") * F("ticket_type__price"),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )),
+        )
+        .order_by()
+    )
+
+
+def _checkin_rows(reservations):
+    return (
+        reservations.filter(is_used=True, used_at__isnull=False)
+        .annotate(day=TruncDate("used_at", tzinfo=timezone.get_current_timezone()))
+        .values("ticket_type", "ticket_type__event", "day")
+        .annotate(checked_in=Sum("quantity"))
+        .order_by()
+    )
+
+
+def rebuild(event_ids=None, batch_size=1000):
+    """
+    Recomputes DailySales for `event_ids` (default: every event). Returns
+    the number of rows written.
+    """
+    reservations = Reservation.objects.all()
+    existing = DailySales.objects.all()
+    if event_ids is not None:
+        reservations = reservations.filter(ticket_type__event_id__in=event_ids)
+        existing = existing.filter(event_id__in=event_ids)
+
+    rows = defaultdict(lambda: {"tickets": 0, "revenue": Decimal("0.00"), "checked_in": 0})
+    for row in _sales_rows(reservations):
+        entry = rows[(row["ticket_type"], row["ticket_type__event"], row["day"])]
+        entry["tickets"] = row["tickets"]
+        entry["revenue"] = row["revenue"]
+    for row in _checkin_rows(reservations):
+        rows[(row["ticket_type"], row["ticket_type__event"], row["day"])]["checked_in"] = row["checked_in"]
+
+    with transaction.atomic():
+        existing.delete()
+        DailySales.objects.bulk_create(
+            [
+                DailySales(ticket_type_id=ticket_type_id, event_id=event_id, day=day, **totals)
+                for (ticket_type_id, event_id, day), totals in rows.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(rows)
+
+
+def sales_by_day(event):
+    """The event's totals per day, oldest first (all ticket types together)."""
+    return list(
+        DailySales.objects.filter(event=event)
+        .values("day")
+        .annotate(tickets=Sum("tickets"), revenue=Sum("revenue"), checked_in=Sum("checked_in"))
+        .order_by("day")
+    )
@@ -0,0 +1,171 @@
+"""
+Full-text search over events (title, location, description).
+
+- SQLite: the events_event_fts FTS5 table, ranked with bm25() and
+  highlighted with snippet(). Kept in sync by events/signals.py.
+- PostgreSQL: the generated events_event.search_vector tsvector column
+  (GIN-indexed), ranked with ts_rank_cd() and highlighted with
+  ts_headline().
+- Anything else (or an SQLite build without the FTS table): a plain
+  icontains scan, so search still works, just slower.
+
+Every word of the query must match, as a prefix ("rock cluj" finds
+"Rockstadt ... Cluj-Napoca"). Both tables are created by migration 0016;
+`python manage.py rebuild_search_index` refills the SQLite one.
+"""
+import re
+from collections import namedtuple
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Event
+
+FTS_TABLE = "events_event_fts"
+MAX_TERMS = 8
+SNIPPET_WORDS = 16
+
+# Highlight markers the database wraps around matches. Control characters,
+# so they survive HTML escaping and can't come from the event text itself.
+_START, _STOP = "\x02", "\x03"
+_WORD = re.compile(r"\w+")
+
+SearchHit = namedtuple("SearchHit", "event_id rank snippet")
+
+_fts_tables = {}
+
+
+def backend():
+    if connection.vendor == "postgresql":
+        return "tsvector"
+    if connection.vendor == "sqlite":
+        name = connection.settings_dict["NAME"]
+        if name not in _fts_tables:
+            _fts_tables[name] = FTS_TABLE in connection.introspection.table_names()
+        if _fts_tables[name]:
+            return "fts5"
+    return None
+
+
+def search_terms(query):
+    return _WORD.findall(query.lower())[:MAX_TERMS]
+
+
+def search_events(query, queryset=None, limit=50):
+    """
+    Returns up to `limit` SearchHits for `query`, best match first,
+    restricted to the events in `queryset` (e.g. upcoming only).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    queryset = Event.objects.all() if queryset is None else queryset
+    engine = backend()
+    if engine is None:
+        return _search_icontains(terms, queryset, limit)
+
+    scope_sql, scope_params = queryset.values("pk").query.sql_with_params()
+    if engine == "fts5":
+        rows = _search_fts5(terms, scope_sql, scope_params, limit)
+    else:
+        rows = _search_tsvector(terms, scope_sql, scope_params, limit)
+
+    return [SearchHit(event_id, rank, highlight(snippet)) for event_id, rank, snippet in rows]
+
+
+def _search_fts5(terms, scope_sql, scope_params, limit):
+    # Each term quoted (so FTS5 operators in user input are just text)
+    # and prefix-matched; space-separated terms are ANDed.
+    match = " ".join(f'"{term}"*' for term in terms)
+    # bm25() is "lower is better"; column weights title 10, location 5, description 1.
+    sql = f"""
+        SELECT rowid, -bm25({FTS_TABLE}, 10.0, 5.0, 1.0) AS score,
+               snippet({FTS_TABLE}, -1, %s, %s, '…', {SNIPPET_WORDS})
+        FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH %s AND rowid IN ({scope_sql})
+        ORDER BY score DESC, rowid
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [_START, _STOP, match, *scope_params, limit])
+        return cursor.fetchall()
+
+
+def _search_tsvector(terms, scope_sql, scope_params, limit):
+    tsquery = " & ".join(f"{term}:*" for term in terms)
+    table = Event._meta.db_table
+    # ts_headline() re-parses the description, so it only runs on the
+    # `limit` rows that made the cut, not on every match.
+    sql = f"""
+        SELECT top.id, top.rank,
+               ts_headline('simple', e.description, top.query, %s)
+        FROM (
+            SELECT e.id, ts_rank_cd(e.search_vector, q) AS rank, q AS query
+            FROM {table} e, to_tsquery('simple', %s) q
+            WHERE e.search_vector @@ q AND e.id IN ({scope_sql})
+            ORDER BY rank DESC, e.id
+            LIMIT %s
+        ) top
+        JOIN {table} e ON e.id = top.id
+        ORDER BY top.rank DESC, top.id
+    """
+    options = f'StartSel="{_START}", StopSel="{_STOP}", MaxWords={SNIPPET_WORDS}, MinWords=6'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [options, tsquery, *scope_params, limit])
+        return cursor.fetchall()
+
+
+def _search_icontains(terms, queryset, limit):
+    for term in terms:
+        queryset = queryset.filter(
+            Q(title__icontains=term) | Q(location__icontains=term) | Q(description__icontains=term)
+        )
+    ids = queryset.order_by("start_date", "id").values_list("pk", flat=True)[:limit]
+    return [SearchHit(event_id, 0, None) for event_id in ids]
+
+
+def highlight(snippet):
+    """Escapes a database snippet and turns its match markers into <mark> tags."""
+    if not snippet:
+        return None
+    html = escape(snippet).replace(_START, "<mark>").replace(_STOP, "</mark>")
+    return mark_safe(html)
+
+
+# ------------------------------------
+# SQLite index maintenance
+# ------------------------------------
+# PostgreSQL needs none of this: search_vector is a generated column.
+
+def index_event(event):
+    if backend() != "fts5":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [event.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, location, description) VALUES (%s, %s, %s, %s)",
+            [event.pk, event.title, event.location, event.description],
+        )
+
+
+def unindex_event(event_id):
+    if backend() != "fts5":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [event_id])
+
+
+def rebuild_index():
+    """Refills the SQLite FTS table from events_event. Returns the number of events indexed."""
+    table = Event._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, location, description) "
+            f"SELECT id, title, location, description FROM {table}"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return Event.objects.count()
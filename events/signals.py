@@ -0,0 +1,62 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import page_cache, search
+from .models import Event, TicketType
+
+SEARCHED_FIELDS = {"title", "location", "description"}
+# Saves that only move stock (TicketType.reserve()/release(),
+# inventory.rebalance_shards(), seed_demo_data...) change no rendered
+# markup; they only need the event summary recomputed.
+STOCK_FIELDS = {"available_quantity", "shard_count"}
+
+
+@receiver(post_save, sender=Event)
+def bump_event_cache_version(sender, instance, created=False, **kwargs):
+    # A new event has nothing cached yet.
+    if not created:
+        Event.bump_cache_version(instance.pk)
+        instance.cache_version += 1
+    # Even on create: SQLite can hand a deleted event's id to a new one.
+    page_cache.invalidate(instance.pk)
+    page_cache.invalidate_listing()
+
+
+@receiver(post_save, sender=Event)
+def index_event_for_search(sender, instance, update_fields=None, **kwargs):
+    # Saves that name their fields without the searched text (customize_event,
+    # the summary and stock updates) skip the reindex. A plain save() of an
+    # existing event always reindexes: Event.save() fills update_fields with
+    # every editable column, title and description included.
+    if update_fields is not None and not SEARCHED_FIELDS & set(update_fields):
+        return
+    search.index_event(instance)
+
+
+@receiver(post_delete, sender=Event)
+def unindex_event_for_search(sender, instance, **kwargs):
+    search.unindex_event(instance.pk)
+    page_cache.invalidate(instance.pk)
+    page_cache.invalidate_listing()
+
+
+@receiver(post_save, sender=TicketType)
+def refresh_event_summary_on_save(sender, instance, update_fields=None, **kwargs):
+    # Cached fragments hold no stock counts, so stock-only saves don't
+    # need a new cache version. They may run inside a buyer's transaction,
+    # so the summary is left until commit.
+    if update_fields is not None and set(update_fields) <= STOCK_FIELDS:
+        Event.refresh_summary_on_commit([instance.event_id])
+        return
+    Event.refresh_summary([instance.event_id])
+    Event.bump_cache_version(instance.event_id)
+    page_cache.invalidate(instance.event_id)
+    page_cache.invalidate_listing()
+
+
+@receiver(post_delete, sender=TicketType)
+def refresh_event_summary_on_delete(sender, instance, **kwargs):
+    Event.refresh_summary([instance.event_id])
+    Event.bump_cache_version(instance.event_id)
+    page_cache.invalidate(instance.event_id)
+    page_cache.invalidate_listing()
@@ -0,0 +1,107 @@
+"""
+Single-flight caching with stale-while-revalidate, for values that are
+expensive to build and requested by many visitors at once (the first
+page of the events list, whole event pages).
+
+Each entry is stored with a "fresh until" time and kept in the cache for
+a further SINGLE_FLIGHT_STALE_SECONDS. When it goes stale, or is missing,
+only the caller that wins a lock key (cache.add, atomic in the shared
+cache, so it holds across gunicorn processes) recomputes it:
+
+- stale entry: everyone else keeps getting the stale value meanwhile;
+- missing entry: everyone else polls for up to SINGLE_FLIGHT_WAIT_SECONDS
+  and then gives up and computes it themselves (so a crashed winner, or a
+  `compute` that returns None, only costs a short wait).
+
+`compute` returning None means "don't cache this"; the value is returned
+to that caller only.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+POLL_SECONDS = 0.05
+
+_lock = threading.Lock()
+_stats = {"fresh": 0, "stale_served": 0, "computed": 0, "coalesced_waits": 0, "wait_timeouts": 0}
+
+
+def _cache():
+    return caches[settings.SINGLE_FLIGHT_CACHE_ALIAS]
+
+
+def _count(outcome):
+    with _lock:
+        _stats[outcome] += 1
+
+
+def _lock_key(key):
+    return f"single-flight-lock:{key}"
+
+
+def _compute_and_store(cache, key, compute, timeout):
+    _count("computed")
+    value = compute()
+    if value is not None:
+        cache.set(
+            key,
+            (value, time.time() + timeout),
+            timeout + settings.SINGLE_FLIGHT_STALE_SECONDS,
+        )
+    return value
+
+
+def _recompute(cache, key, compute, timeout):
+    try:
+        return _compute_and_store(cache, key, compute, timeout)
+    finally:
+        cache.delete(_lock_key(key))
+
+
+def get_or_compute(key, compute, timeout):
+    """Returns the cached value for `key`, computing it (once across workers) if needed."""
+    cache = _cache()
+    entry = cache.get(key)
+    lock_key = _lock_key(key)
+
+    if entry is not None:
+        value, fresh_until = entry
+        if fresh_until > time.time():
+            _count("fresh")
+            return value
+        if cache.add(lock_key, True, settings.SINGLE_FLIGHT_LOCK_SECONDS):
+            return _recompute(cache, key, compute, timeout)
+        _count("stale_served")
+        return value
+
+    if cache.add(lock_key, True, settings.SINGLE_FLIGHT_LOCK_SECONDS):
+        return _recompute(cache, key, compute, timeout)
+
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        entry = cache.get(key)
+        if entry is not None:
+            _count("coalesced_waits")
+            return entry[0]
+
+    _count("wait_timeouts")
+    return _compute_and_store(cache, key, compute, timeout)
+
+
+def invalidate(*keys):
+    _cache().delete_many(keys)
+
+
+def stats():
+    """This process's counters."""
+    with _lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _lock:
+        for outcome in _stats:
+            _stats[outcome] = 0
@@ -0,0 +1,112 @@
+"""
+Organizer dashboard numbers for one event (ticket_management).
+
+Everything comes from a single grouped query over the event's ticket
+types: reservation totals are SUM()s over a LEFT JOIN to reservations and
+sharded stock is a correlated subquery. The query count is constant (one
+query, one row per ticket type), but the database still scans every
+reservation of the event to sum them, so the work grows with sales.
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import TicketStockShard, TicketType
+
+TicketTypeStats = namedtuple(
+    "TicketTypeStats",
+    "ticket_type_id name price capacity available confirmed pending revenue checked_in",
+)
+
+
+class EventStats:
+    def __init__(self, ticket_types):
+        self.ticket_types = ticket_types
+
+    def _total(self, field):
+        return sum(getattr(row, field) for row in self.ticket_types)
+
+    @property
+    def revenue(self):
+        return self._total("revenue") or Decimal("0.00")
+
+    @property
+    def capacity(self):
+        return self._total("capacity")
+
+    @property
+    def available(self):
+        return self._total("available")
+
+    @property
+    def tickets_sold(self):
+        # Same meaning as Event.tickets_sold: everything no longer on sale,
+        # confirmed or still held by a pending reservation.
+        return self.capacity - self.available
+
+    @property
+    def confirmed(self):
+        return self._total("confirmed")
+
+    @property
+    def pending(self):
+        return self._total("pending")
+
+    @property
+    def checked_in(self):
+        return self._total("checked_in")
+
+    @classmethod
+    def for_event(cls, event):
+        shard_stock = Subquery(
+            TicketStockShard.objects.filter(ticket_type=OuterRef("pk"))
+            .order_by().values("ticket_type")
+            .annotate(total=Sum("available_quantity")).values("total")
+        )
+        confirmed = Q(reservation__confirmed=True)
+        rows = (
+            TicketType.objects.filter(event=event)
+            .order_by("price", "pk")
+            .annotate(
+                shard_available=Coalesce(shard_stock, 0),
+                confirmed_quantity=Coalesce(Sum("reservation__quantity", filter=confirmed), 0),
+                pending_quantity=Coalesce(
+                    Sum("reservation__quantity", filter=Q(reservation__confirmed=False)), 0
+                ),
+                revenue=Coalesce(
+                    Sum(
+                        ExpressionWrapper(
+                            F("reservation__quantity") * F("price"),
+                            output_field=DecimalField(max_digits=12, decimal_places=2),
+                        ),
+                        filter=confirmed,
+                    ),
+                    Decimal("0.00"),
+                    output_field=DecimalField(max_digits=12, decimal_places=2),
+                ),
+                checked_in_quantity=Coalesce(
+                    Sum("reservation__quantity", filter=confirmed & Q(reservation__is_used=True)), 0
+                ),
+            )
+            .values_list(
+                "pk", "name", "price", "total_quantity", "available_quantity", "shard_available",
+                "confirmed_quantity", "pending_quantity", "revenue", "checked_in_quantity",
+            )
+        )
+        return cls([
+            TicketTypeStats(
+                ticket_type_id=pk,
+                name=name,
+                price=price,
+                capacity=capacity,
+                available=available + shard_available,
+                confirmed=confirmed_quantity,
+                pending=pending_quantity,
+                revenue=revenue,
+                checked_in=checked_in_quantity,
+            )
+            for (pk, name, price, capacity, available, shard_available,
+                 confirmed_quantity, pending_quantity, revenue, checked_in_quantity) in rows
+        ])
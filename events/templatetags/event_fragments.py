@@ -0,0 +1,45 @@
+from django import template
+
+from events import fragment_cache
+
+register = template.Library()
+
+
+class EventFragmentNode(template.Node):
+    def __init__(self, nodelist, event, name, vary_on):
+        self.nodelist = nodelist
+        self.event = event
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        event = self.event.resolve(context)
+        name = self.name.resolve(context)
+        vary_on = [value.resolve(context) for value in self.vary_on]
+        return fragment_cache.get_or_render(
+            event, name, vary_on, lambda: self.nodelist.render(context)
+        )
+
+
+@register.tag("event_fragment")
+def do_event_fragment(parser, token):
+    """
+    {% event_fragment event "card" [vary_on ...] %} ... {% endevent_fragment %}
+
+    Caches the enclosed markup per event, fragment name and any extra
+    vary_on values, until the event's cache_version is bumped.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires an event and a fragment name."
+        )
+
+    nodelist = parser.parse(("endevent_fragment",))
+    parser.delete_first_token()
+    return EventFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
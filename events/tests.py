@@ -1,20 +1,35 @@
+import csv
+import io
 import json
+import random
+import tempfile
 import threading
+import time
 from datetime import timedelta
 from decimal import Decimal
+from pathlib import Path
 from unittest import skipUnless
 from unittest.mock import MagicMock, patch
 
 import stripe
+from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
 from django.core.management import call_command
-from django.db import connection
-from django.test import TestCase, TransactionTestCase
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
-from .models import Event, Payment, Reservation, TicketType
+from . import checkin, fragment_cache, live, qr_cache, single_flight, ticket_codes, views, waiting_room
+from .expiry import ExpiryScheduler
+from .inventory import find_stock_drift, rebalance_shards, release_stock, reserve_stock
+from .stats import EventStats
+from .models import DailySales, Event, EventChange, IdempotencyKey, Order, Payment, Reservation, TicketStockShard, TicketType
 
 
 class TicketTypeModelTests(TestCase):
@@ -48,6 +63,487 @@ class TicketTypeModelTests(TestCase):
         self.ticket.refresh_from_db()
         self.assertEqual(self.ticket.available_quantity, self.ticket.total_quantity)
 
+    def test_reserve_if_available_decrements_in_one_update(self):
+        # The event summary is only refreshed after commit.
+        with self.assertNumQueries(1):
+            self.assertTrue(self.ticket.reserve_if_available(4))
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.available_quantity, 6)
+
+    def test_stock_changes_leave_the_event_row_until_commit(self):
+        event_table = Event._meta.db_table
+        with self.captureOnCommitCallbacks() as callbacks:
+            with CaptureQueriesContext(connection) as queries:
+                self.ticket.reserve(2)
+                self.ticket.release(1)
+                self.ticket.reserve_if_available(1)
+        self.assertFalse([q for q in queries if f'UPDATE "{event_table}"' in q["sql"]])
+
+        # The three stock moves are summed up by a single refresh.
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        self.assertEqual(len([q for q in queries if f'UPDATE "{event_table}"' in q["sql"]]), 1)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_total, 8)
+
+    def test_reserve_if_available_refuses_without_touching_stock(self):
+        self.assertFalse(self.ticket.reserve_if_available(11))
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.available_quantity, 10)
+
+    def test_event_summary_follows_stock_changes(self):
+        TicketType.objects.create(
+            event=self.event, name="VIP", price=Decimal("25.00"),
+            total_quantity=4, available_quantity=4,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ticket.reserve(3)
+            self.ticket.release(5)  # clamped to total: only 3 go back
+            self.ticket.reserve_if_available(2)
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.capacity_total, 14)
+        self.assertEqual(self.event.available_total, 12)
+        self.assertEqual(self.event.starting_price, Decimal("25.00"))
+
+        self.ticket.price = Decimal("9.00")
+        self.ticket.save()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.starting_price, Decimal("9.00"))
+
+        self.ticket.delete()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.starting_price, Decimal("25.00"))
+        self.assertEqual(self.event.available_tickets, 4)
+
+    def test_stock_only_saves_refresh_the_summary_after_commit(self):
+        # e.g. seed_demo_data, which sets the stock directly.
+        self.ticket.available_quantity = 4
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ticket.save(update_fields=["available_quantity"])
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_total, 4)
+
+    def test_full_event_save_keeps_summary_columns(self):
+        stale = Event.objects.get(pk=self.event.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ticket.reserve(4)
+
+        stale.title = "Renamed"
+        stale.save()
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_total, 6)
+
+
+class ShardedStockTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            username="org", password="pass", is_organizer=True
+        )
+        self.event = Event.objects.create(
+            organizer=user,
+            title="Headliner",
+            description="Desc",
+            location="Cluj",
+            start_date=timezone.now() + timedelta(days=1),
+            end_date=timezone.now() + timedelta(days=2),
+        )
+        self.ticket = TicketType.objects.create(
+            event=self.event,
+            name="GA",
+            price="100.00",
+            total_quantity=50,
+            available_quantity=47,
+        )
+        self.ticket = rebalance_shards(self.ticket.id, 4)
+
+    def assertStockWithinTotal(self):
+        ticket = TicketType.objects.get(pk=self.ticket.pk)
+        self.assertLessEqual(ticket.available_stock, ticket.total_quantity)
+        for shard in ticket.shards.all():
+            self.assertLessEqual(shard.available_quantity, shard.capacity)
+        return ticket.available_stock
+
+    def test_sharding_moves_stock_into_shards(self):
+        self.assertEqual(self.ticket.available_quantity, 0)
+        self.assertEqual(TicketStockShard.objects.filter(ticket_type=self.ticket).count(), 4)
+        self.assertEqual(self.assertStockWithinTotal(), 47)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_tickets, 47)
+
+    def test_reservation_spanning_shards_falls_back_to_locked_take(self):
+        # 47 spread as 12/12/12/11: no single shard can cover 30.
+        reserve_stock(self.ticket, 30)
+        self.assertEqual(self.assertStockWithinTotal(), 17)
+
+    def test_reserving_more_than_recombined_stock_is_refused(self):
+        with self.assertRaises(ValidationError):
+            reserve_stock(self.ticket, 48)
+        self.assertEqual(self.assertStockWithinTotal(), 47)
+
+    def test_sum_never_exceeds_total_quantity(self):
+        rng = random.Random(7)
+        held = []
+        for _ in range(300):
+            if held and rng.random() < 0.45:
+                release_stock(self.ticket, held.pop(rng.randrange(len(held))))
+            else:
+                quantity = rng.randint(1, 6)
+                try:
+                    reserve_stock(self.ticket, quantity)
+                    held.append(quantity)
+                except ValidationError:
+                    pass
+            self.assertEqual(self.assertStockWithinTotal(), 47 - sum(held))
+
+        # Over-releasing (e.g. a double cancel) still can't go above total.
+        release_stock(self.ticket, 50)
+        self.assertEqual(self.assertStockWithinTotal(), 50)
+
+    def test_release_without_shard_rows_goes_back_to_the_base_counter(self):
+        # shard_count set without rebalancing: all stock is on the base counter.
+        unspread = TicketType.objects.create(
+            event=self.event, name="Late", price="10.00",
+            total_quantity=10, available_quantity=10, shard_count=2,
+        )
+
+        reserve_stock(unspread, 3)
+        with self.assertNoLogs("events.inventory", level="WARNING"):
+            release_stock(unspread, 3)
+
+        unspread.refresh_from_db()
+        self.assertEqual(unspread.available_stock, 10)
+
+    def test_rebalance_evens_out_and_unshards(self):
+        reserve_stock(self.ticket, 5)
+        ticket = rebalance_shards(self.ticket.id)
+        quantities = sorted(ticket.shards.values_list("available_quantity", flat=True))
+        self.assertLessEqual(quantities[-1] - quantities[0], 1)
+
+        ticket = rebalance_shards(self.ticket.id, 0)
+        self.assertEqual(ticket.available_quantity, 42)
+        self.assertFalse(TicketStockShard.objects.filter(ticket_type=ticket).exists())
+
+
+@override_settings(EVENTS_PAGE_SIZE=2)
+class EventsListTests(TestCase):
+    def setUp(self):
+        organizer = get_user_model().objects.create_user(
+            username="org_list", password="pass", is_organizer=True
+        )
+        start = timezone.now() + timedelta(days=1)
+        # Two events share a start time so the id tie-breaker matters.
+        self.upcoming = [
+            Event.objects.create(
+                organizer=organizer, title=f"Show {i}", description="Desc", location="Cluj",
+                start_date=start + timedelta(hours=i // 2), end_date=start + timedelta(days=1),
+            )
+            for i in range(5)
+        ]
+        self.past = Event.objects.create(
+            organizer=organizer, title="Last year", description="Desc", location="Cluj",
+            start_date=timezone.now() - timedelta(days=2), end_date=timezone.now() - timedelta(days=1),
+        )
+        for price in ("30.00", "12.50"):
+            TicketType.objects.create(
+                event=self.upcoming[0], name=f"T{price}", price=Decimal(price),
+                total_quantity=5, available_quantity=5,
+            )
+
+    def _page(self, **params):
+        response = self.client.get(reverse("events:events_list"), params)
+        return response.context["page"]
+
+    def test_pages_forward_and_back_without_gaps(self):
+        seen, pages, page = [], [], self._page()
+        while True:
+            pages.append(page)
+            seen.extend(event.pk for event in page)
+            if not page.has_next:
+                break
+            page = self._page(after=page.next_cursor)
+
+        self.assertEqual(seen, [event.pk for event in self.upcoming])
+        self.assertFalse(pages[0].has_previous)
+
+        back = self._page(before=pages[-1].previous_cursor)
+        self.assertEqual([e.pk for e in back], [e.pk for e in pages[-2]])
+
+    def test_past_events_only_on_request(self):
+        first = self._page()
+        self.assertNotIn(self.past.pk, [event.pk for event in first])
+
+        everything = self._page(show="all")
+        self.assertEqual(everything.object_list[0].pk, self.past.pk)
+
+    def test_cards_get_lowest_price_without_loading_ticket_types(self):
+        event = self._page().object_list[0]
+
+        self.assertEqual(event.starting_price, Decimal("12.50"))
+        self.assertNotIn("promo_message", event.__dict__)
+
+    def test_malformed_cursor_falls_back_to_first_page(self):
+        page = self._page(after="not-a-cursor")
+
+        self.assertEqual([e.pk for e in page], [e.pk for e in self.upcoming[:2]])
+
+
+class EventSearchTests(TestCase):
+    def setUp(self):
+        organizer = get_user_model().objects.create_user(
+            username="org_search", password="pass", is_organizer=True
+        )
+        start = timezone.now() + timedelta(days=3)
+
+        def make(title, location, description):
+            return Event.objects.create(
+                organizer=organizer, title=title, location=location, description=description,
+                start_date=start, end_date=start + timedelta(hours=4),
+            )
+
+        self.jazz = make("Jazz Night", "Brașov", "Smooth <b>jazz</b> quartet by the old town walls.")
+        self.rock = make("Rockstadt Extreme Fest", "Râșnov", "Three days of metal, with a jazz-free lineup.")
+        self.talk = make("Tech Talk", "Cluj-Napoca", "Speakers on databases and search engines.")
+
+    def _search(self, q):
+        response = self.client.get(reverse("events:events_list"), {"q": q})
+        return response, list(response.context["page"])
+
+    def test_ranks_title_matches_first_and_searches_description(self):
+        _, results = self._search("jazz")
+
+        self.assertEqual([e.pk for e in results], [self.jazz.pk, self.rock.pk])
+
+    def test_prefix_and_diacritic_insensitive_match(self):
+        _, results = self._search("rock rasnov")
+
+        self.assertEqual([e.pk for e in results], [self.rock.pk])
+
+    def test_snippet_highlights_matches_and_escapes_event_text(self):
+        response, results = self._search("databases")
+
+        self.assertIn("<mark>databases</mark>", results[0].search_snippet)
+        self.assertNotContains(response, "<b>jazz</b>")
+
+    def test_index_follows_edits_and_deletes(self):
+        self.talk.title = "Data Summit"
+        self.talk.save()
+        self.assertEqual([e.pk for e in self._search("summit")[1]], [self.talk.pk])
+
+        self.talk.delete()
+        self.assertEqual(self._search("summit")[1], [])
+
+    def test_customizing_an_event_skips_the_reindex(self):
+        self.client.login(username="org_search", password="pass")
+        with patch("events.search.index_event") as index_event:
+            self.client.post(
+                reverse("events:customize_event", args=[self.talk.pk]),
+                {"theme_color": "#123456", "banner_text": "Doors at 18:00"},
+            )
+
+        index_event.assert_not_called()
+        self.talk.refresh_from_db()
+        self.assertEqual(self.talk.banner_text, "Doors at 18:00")
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        # Test transactions roll back, so event ids (and versions) repeat
+        # between tests; start every test from an empty cache.
+        caches["fragments"].clear()
+        fragment_cache.reset_stats()
+        self.organizer = get_user_model().objects.create_user(
+            username="org_cache", password="pass", is_organizer=True, is_staff=True
+        )
+        start = timezone.now() + timedelta(days=2)
+        self.event = Event.objects.create(
+            organizer=self.organizer, title="Opera Gala", description="Desc", location="Iasi",
+            start_date=start, end_date=start + timedelta(hours=3),
+        )
+        self.ticket = TicketType.objects.create(
+            event=self.event, name="Stalls", price=Decimal("40.00"),
+            total_quantity=5, available_quantity=5,
+        )
+
+    def test_second_render_is_served_from_cache(self):
+        self.client.get(reverse("events:events_list"))
+        self.client.get(reverse("events:events_list"))
+
+        self.assertEqual(fragment_cache.stats()["misses"], 1)
+        self.assertEqual(fragment_cache.stats()["hits"], 1)
+
+    def test_event_and_ticket_type_writes_invalidate(self):
+        self.client.get(reverse("events:event_detail", kwargs={"pk": self.event.pk}))
+
+        self.event.title = "Opera Night"
+        self.event.save()
+        response = self.client.get(reverse("events:event_detail", kwargs={"pk": self.event.pk}))
+        self.assertContains(response, "Opera Night")
+
+        self.client.get(reverse("events:events_list"))
+        self.ticket.price = Decimal("35.00")
+        self.ticket.save()
+        response = self.client.get(reverse("events:events_list"))
+        self.assertContains(response, "From 35,00")
+
+    def test_stock_changes_do_not_churn_the_cache(self):
+        version = Event.objects.get(pk=self.event.pk).cache_version
+
+        self.ticket.reserve(2)
+        self.ticket.release(1)
+
+        self.assertEqual(Event.objects.get(pk=self.event.pk).cache_version, version)
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.client.get(reverse("events:events_list"))
+        self.assertEqual(self.client.get(reverse("events:fragment_cache_stats")).status_code, 302)
+
+        self.client.login(username="org_cache", password="pass")
+        stats = self.client.get(reverse("events:fragment_cache_stats")).json()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entries"], 1)
+
+
+class EventPageCacheTests(TestCase):
+    def setUp(self):
+        caches["pages"].clear()
+        caches["fragments"].clear()
+        self.user = get_user_model().objects.create_user(username="page_visitor", password="pass")
+        self.organizer = get_user_model().objects.create_user(
+            username="org_page", password="pass", is_organizer=True
+        )
+        start = timezone.now() + timedelta(days=2)
+        self.event = Event.objects.create(
+            organizer=self.organizer, title="Jazz Night", description="Desc", location="Sibiu",
+            start_date=start, end_date=start + timedelta(hours=3),
+        )
+        self.ticket = TicketType.objects.create(
+            event=self.event, name="Standard", price=Decimal("50.00"),
+            total_quantity=10, available_quantity=10,
+        )
+        self.url = reverse("events:event_detail", kwargs={"pk": self.event.pk})
+
+    def test_anonymous_repeat_visit_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        self.assertNotIn("X-Page-Cache", first)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+
+        self.assertEqual(second["X-Page-Cache"], "hit")
+        self.assertEqual(second.content, first.content)
+        self.assertIn("Cookie", second["Vary"])
+
+    def test_logged_in_visits_are_not_cached(self):
+        self.client.get(self.url)
+        self.client.login(username="page_visitor", password="pass")
+
+        response = self.client.get(self.url)
+
+        self.assertNotIn("X-Page-Cache", response)
+        self.assertContains(response, "Reserve now")
+
+    def test_event_and_ticket_type_writes_invalidate(self):
+        self.client.get(self.url)
+
+        self.event.title = "Jazz Night II"
+        self.event.save()
+        self.assertContains(self.client.get(self.url), "Jazz Night II")
+
+        self.ticket.name = "Balcony"
+        self.ticket.save()
+        self.assertContains(self.client.get(self.url), "Balcony")
+
+    def test_availability_endpoint_reports_live_stock(self):
+        self.client.get(self.url)
+        self.ticket.reserve(3)
+
+        data = self.client.get(
+            reverse("events:event_availability", kwargs={"pk": self.event.pk})
+        ).json()
+
+        self.assertEqual(data["tickets"], {str(self.ticket.pk): 7})
+        self.assertEqual(data["confirmed_attendees"], 0)
+
+    def test_availability_endpoint_404s_for_missing_event(self):
+        response = self.client.get(reverse("events:event_availability", kwargs={"pk": 999999}))
+        self.assertEqual(response.status_code, 404)
+
+
+class SingleFlightTests(TestCase):
+    key = "single-flight-test"
+
+    def setUp(self):
+        single_flight.reset_stats()
+        self.cache = caches["default"]
+        self.compute = MagicMock(return_value="new")
+
+    def _hold_lock(self):
+        self.cache.add(f"single-flight-lock:{self.key}", True, 60)
+
+    def test_stale_entry_is_served_while_another_caller_recomputes(self):
+        self.cache.set(self.key, ("old", time.time() - 1), 60)
+        self._hold_lock()
+
+        value = single_flight.get_or_compute(self.key, self.compute, 10)
+
+        self.assertEqual(value, "old")
+        self.compute.assert_not_called()
+        self.assertEqual(single_flight.stats()["stale_served"], 1)
+
+    def test_stale_entry_is_recomputed_by_the_lock_winner(self):
+        self.cache.set(self.key, ("old", time.time() - 1), 60)
+
+        self.assertEqual(single_flight.get_or_compute(self.key, self.compute, 10), "new")
+        self.assertEqual(single_flight.get_or_compute(self.key, self.compute, 10), "new")
+
+        self.compute.assert_called_once()
+        self.assertIsNone(self.cache.get(f"single-flight-lock:{self.key}"))
+
+    def test_missing_entry_waits_for_the_lock_winner(self):
+        self._hold_lock()
+
+        def other_worker_finishes(seconds):
+            self.cache.set(self.key, ("theirs", time.time() + 10), 60)
+
+        with patch("events.single_flight.time.sleep", side_effect=other_worker_finishes):
+            value = single_flight.get_or_compute(self.key, self.compute, 10)
+
+        self.assertEqual(value, "theirs")
+        self.compute.assert_not_called()
+        self.assertEqual(single_flight.stats()["coalesced_waits"], 1)
+
+    @override_settings(SINGLE_FLIGHT_WAIT_SECONDS=0)
+    def test_gives_up_waiting_and_computes(self):
+        self._hold_lock()
+
+        self.assertEqual(single_flight.get_or_compute(self.key, self.compute, 10), "new")
+        self.assertEqual(single_flight.stats()["wait_timeouts"], 1)
+
+    def test_events_list_landing_page_is_shared_until_a_write(self):
+        caches["fragments"].clear()
+        organizer = get_user_model().objects.create_user(
+            username="org_flight", password="pass", is_organizer=True
+        )
+        start = timezone.now() + timedelta(days=1)
+        event = Event.objects.create(
+            organizer=organizer, title="Folk Fest", description="Desc", location="Brasov",
+            start_date=start, end_date=start + timedelta(hours=4),
+        )
+        self.client.get(reverse("events:events_list"))
+
+        # No signals, so the cached page (and its card) stays as it was.
+        Event.objects.filter(pk=event.pk).update(title="Folk Fest 2", cache_version=F("cache_version") + 1)
+        self.assertContains(self.client.get(reverse("events:events_list")), "Folk Fest<")
+
+        event.refresh_from_db()
+        event.save()
+        self.assertContains(self.client.get(reverse("events:events_list")), "Folk Fest 2")
+        self.assertEqual(single_flight.stats()["fresh"], 1)
+
 
 class EventDetailReservationTests(TestCase):
     def setUp(self):
@@ -87,6 +583,285 @@ class EventDetailReservationTests(TestCase):
         reservation = Reservation.objects.get(user=self.participant, ticket_type=self.ticket)
         self.assertEqual(reservation.quantity, 1)
 
+    def _expired_hold(self, quantity):
+        other = get_user_model().objects.create_user(username="slow", password="pass")
+        self.ticket.reserve(quantity)
+        return Reservation.objects.create(
+            user=other, ticket_type=self.ticket, quantity=quantity,
+            expires_at=timezone.now() - timedelta(minutes=1),
+        )
+
+    @override_settings(RESERVATION_LAZY_EXPIRY=True, RESERVATION_ENGINE="conditional")
+    def test_lazy_expiry_reclaims_lapsed_holds_before_refusing(self):
+        stale = self._expired_hold(5)
+        self.client.login(username="part", password="pass")
+
+        self.client.post(
+            reverse("events:event_detail", kwargs={"pk": self.event.id}),
+            {"ticket_id": self.ticket.id, "quantity": 3},
+        )
+
+        self.assertFalse(Reservation.objects.filter(pk=stale.pk).exists())
+        self.assertTrue(Reservation.objects.filter(user=self.participant, quantity=3).exists())
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.available_quantity, 2)
+
+    def test_without_lazy_expiry_lapsed_holds_block_the_sale(self):
+        self._expired_hold(5)
+        self.client.login(username="part", password="pass")
+
+        self.client.post(
+            reverse("events:event_detail", kwargs={"pk": self.event.id}),
+            {"ticket_id": self.ticket.id, "quantity": 1},
+        )
+
+        self.assertFalse(Reservation.objects.filter(user=self.participant).exists())
+
+    @override_settings(RESERVATION_SHOW_EXPIRED_HOLDS_AS_AVAILABLE=True)
+    def test_event_page_can_count_lapsed_holds_as_available(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._expired_hold(4)
+
+        response = self.client.get(reverse("events:event_detail", kwargs={"pk": self.event.id}))
+
+        ticket = response.context["event"].ticket_types.all()[0]
+        self.assertEqual(ticket.available_stock, 5)
+        self.assertContains(response, "5 left")
+        self.assertEqual(response.context["event"].available_tickets, 5)
+        self.assertEqual(response.context["event"].tickets_sold, 0)
+
+    def test_event_counts_lapsed_holds_only_when_annotated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._expired_hold(4)
+
+        self.assertEqual(Event.objects.get(pk=self.event.pk).available_tickets, 1)
+        event = Event.objects.with_expired_holds().get(pk=self.event.pk)
+        self.assertEqual((event.available_tickets, event.tickets_sold), (5, 0))
+
+    @override_settings(RESERVATION_ENGINE="conditional")
+    def test_conditional_engine_reserves_and_refuses_oversell(self):
+        self.client.login(username="part", password="pass")
+        url = reverse("events:event_detail", kwargs={"pk": self.event.id})
+
+        self.client.post(url, {"ticket_id": self.ticket.id, "quantity": 4})
+        self.client.post(url, {"ticket_id": self.ticket.id, "quantity": 2})
+
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.available_quantity, 1)
+        self.assertEqual(Reservation.objects.filter(ticket_type=self.ticket).count(), 1)
+
+
+class WaitingRoomTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        organizer = User.objects.create_user(username="org", password="pass", is_organizer=True)
+        for name in ("first", "second"):
+            User.objects.create_user(username=name, password="pass", is_participant=True)
+        self.event = Event.objects.create(
+            organizer=organizer,
+            title="Hot On-sale",
+            description="Desc",
+            location="Cluj",
+            start_date=timezone.now() + timedelta(days=1),
+            end_date=timezone.now() + timedelta(days=2),
+            waiting_room_enabled=True,
+        )
+        self.ticket = TicketType.objects.create(
+            event=self.event,
+            name="GA",
+            price="10.00",
+            total_quantity=100,
+            available_quantity=100,
+            admission_rate=1,
+        )
+        self.url = reverse("events:event_detail", kwargs={"pk": self.event.id})
+
+    def test_buyer_is_queued_then_admitted_once(self):
+        self.client.login(username="first", password="pass")
+
+        response = self.client.post(self.url, {"ticket_id": self.ticket.id, "quantity": 2})
+        self.assertRedirects(
+            response,
+            f"{reverse('events:waiting_room', args=[self.ticket.id])}?quantity=2",
+            fetch_redirect_response=False,
+        )
+        self.assertFalse(Reservation.objects.exists())
+
+        # Idle queue: the first buyer is admitted straight away.
+        self.client.post(self.url, {"ticket_id": self.ticket.id, "quantity": 2})
+        self.assertEqual(Reservation.objects.filter(user__username="first").count(), 1)
+
+        # The admission is single-use; a resubmit goes back to the queue.
+        response = self.client.post(self.url, {"ticket_id": self.ticket.id, "quantity": 2})
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertIn(reverse("events:waiting_room", args=[self.ticket.id]), response["Location"])
+
+    def test_later_buyer_waits_one_interval_and_sees_position(self):
+        self.client.login(username="first", password="pass")
+        self.client.get(reverse("events:waiting_room", args=[self.ticket.id]))
+        self.client.logout()
+
+        self.client.login(username="second", password="pass")
+        self.client.post(self.url, {"ticket_id": self.ticket.id, "quantity": 1})
+        self.client.post(self.url, {"ticket_id": self.ticket.id, "quantity": 1})
+        self.assertFalse(Reservation.objects.exists())
+
+        token = self.client.session[waiting_room.SESSION_KEY][str(self.ticket.id)]
+        status = self.client.get(reverse("events:waiting_room_status", args=[token])).json()
+        self.assertFalse(status["admitted"])
+        self.assertGreater(status["wait_seconds"], 50)
+
+    def test_local_store_positions_follow_admission_schedule(self):
+        store = waiting_room.LocalQueueStore()
+        now = timezone.now()
+        entries = [store.join(self.ticket, user_id, now) for user_id in range(4)]
+
+        self.assertEqual([e.admit_at - now for e in entries],
+                         [timedelta(minutes=m) for m in range(4)])
+        self.assertEqual(store.position(entries[3], now), 2)
+        self.assertEqual(store.position(entries[3], now + timedelta(seconds=150)), 0)
+
+        self.assertTrue(store.mark_used(entries[0], now))
+        self.assertFalse(store.mark_used(entries[0], now))
+        self.assertEqual(store.purge(now + timedelta(seconds=90)), 2)
+
+
+class CartReservationTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        organizer = User.objects.create_user(username="org", password="pass", is_organizer=True)
+        self.buyer = User.objects.create_user(username="buyer", password="pass", is_participant=True)
+        events = [
+            Event.objects.create(
+                organizer=organizer,
+                title=title,
+                description="Desc",
+                location="Cluj",
+                start_date=timezone.now() + timedelta(days=1),
+                end_date=timezone.now() + timedelta(days=2),
+            )
+            for title in ("Festival", "Afterparty")
+        ]
+        self.general = TicketType.objects.create(
+            event=events[0], name="General", price=Decimal("20.00"),
+            total_quantity=10, available_quantity=10,
+        )
+        self.vip = TicketType.objects.create(
+            event=events[0], name="VIP", price=Decimal("50.00"),
+            total_quantity=1, available_quantity=1,
+        )
+        self.party = TicketType.objects.create(
+            event=events[1], name="Entry", price=Decimal("15.00"),
+            total_quantity=5, available_quantity=5,
+        )
+        self.client.login(username="buyer", password="pass")
+
+    def post_cart(self, items):
+        return self.client.post(
+            reverse("events:cart_reserve"),
+            data=json.dumps({"items": items}),
+            content_type="application/json",
+        )
+
+    def test_cart_reserves_across_events_with_one_payment(self):
+        response = self.post_cart([
+            {"ticket_id": self.general.id, "quantity": 2},
+            {"ticket_id": self.vip.id, "quantity": 1},
+            {"ticket_id": self.party.id, "quantity": 1},
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body["amount"], "105.00")
+
+        order = Order.objects.get(pk=body["order_id"])
+        self.assertEqual(order.reservations.count(), 3)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(Payment.objects.get().reservation, order.lead_reservation)
+
+        for ticket_type, left in ((self.general, 8), (self.vip, 0), (self.party, 4)):
+            ticket_type.refresh_from_db()
+            self.assertEqual(ticket_type.available_quantity, left)
+
+    def test_cart_is_all_or_nothing(self):
+        response = self.post_cart([
+            {"ticket_id": self.general.id, "quantity": 2},
+            {"ticket_id": self.vip.id, "quantity": 2},
+        ])
+
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("VIP", response.json()["error"])
+        self.assertFalse(Reservation.objects.exists())
+        self.general.refresh_from_db()
+        self.assertEqual(self.general.available_quantity, 10)
+
+    @patch("events.views.stripe.PaymentIntent.retrieve")
+    def test_paying_the_order_confirms_every_reservation(self, mock_retrieve):
+        mock_retrieve.return_value = MagicMock(status="succeeded")
+        body = self.post_cart([
+            {"ticket_id": self.general.id, "quantity": 1},
+            {"ticket_id": self.party.id, "quantity": 1},
+        ]).json()
+        Payment.objects.update(stripe_payment_intent="pi_cart")
+
+        self.client.get(reverse("events:payment_success"), {"payment_intent": "pi_cart"})
+
+        self.assertFalse(Reservation.objects.filter(order_id=body["order_id"], confirmed=False).exists())
+
+    def test_cancelling_one_cart_reservation_cancels_the_order(self):
+        body = self.post_cart([
+            {"ticket_id": self.general.id, "quantity": 1},
+            {"ticket_id": self.party.id, "quantity": 1},
+        ]).json()
+
+        self.client.post(
+            reverse("events:my_reservations"),
+            {"reservation_id": body["reservations"][1]["id"]},
+        )
+
+        self.assertFalse(Reservation.objects.exists())
+        self.party.refresh_from_db()
+        self.assertEqual(self.party.available_quantity, 5)
+
+
+    def test_organizer_deleting_a_cart_line_cancels_the_order(self):
+        body = self.post_cart([
+            {"ticket_id": self.general.id, "quantity": 1},
+            {"ticket_id": self.party.id, "quantity": 1},
+        ]).json()
+        self.client.login(username="org", password="pass")
+
+        self.client.post(
+            reverse("events:ticket_management", kwargs={"event_id": self.party.event_id}),
+            {"action": "delete", "reservation_id": body["reservations"][1]["id"]},
+        )
+
+        self.assertFalse(Reservation.objects.exists())
+        self.assertFalse(Payment.objects.exists())
+        self.general.refresh_from_db()
+        self.assertEqual(self.general.available_quantity, 10)
+
+    @patch("events.views.stripe.PaymentIntent.modify")
+    @patch("events.views.stripe.PaymentIntent.retrieve")
+    def test_payment_intent_charges_what_the_order_still_holds(self, mock_retrieve, mock_modify):
+        body = self.post_cart([
+            {"ticket_id": self.general.id, "quantity": 1},
+            {"ticket_id": self.party.id, "quantity": 1},
+        ]).json()
+        # A line that went away without the payment being updated.
+        Reservation.objects.filter(pk=body["reservations"][1]["id"]).delete()
+        Payment.objects.update(stripe_payment_intent="pi_cart")
+        mock_retrieve.return_value = MagicMock(id="pi_cart", amount=3500)
+        mock_modify.return_value = MagicMock(client_secret="secret_cart")
+
+        response = self.client.post(
+            reverse("events:create_payment_intent", kwargs={"reservation_id": body["reservations"][0]["id"]})
+        )
+
+        self.assertEqual(response.json()["clientSecret"], "secret_cart")
+        mock_modify.assert_called_once_with("pi_cart", amount=2000)
+        self.assertEqual(Payment.objects.get().amount, Decimal("20.00"))
+
 
 class PaymentFlowTestsBase(TestCase):
     def setUp(self):
@@ -152,6 +927,65 @@ class CreatePaymentIntentTests(PaymentFlowTestsBase):
         mock_create.assert_not_called()
 
 
+class IdempotencyKeyTests(PaymentFlowTestsBase):
+    def setUp(self):
+        super().setUp()
+        self.client.login(username="buyer", password="pass")
+        self.reserve_url = reverse("events:event_detail", kwargs={"pk": self.event.id})
+
+    def test_retried_reservation_replays_first_response(self):
+        data = {"ticket_id": self.ticket.id, "quantity": 3}
+
+        first = self.client.post(self.reserve_url, data, HTTP_IDEMPOTENCY_KEY="k-1")
+        retry = self.client.post(self.reserve_url, data, HTTP_IDEMPOTENCY_KEY="k-1")
+
+        self.assertEqual(retry.status_code, first.status_code)
+        self.assertEqual(retry["Location"], first["Location"])
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Reservation.objects.filter(user=self.buyer, quantity=3).count(), 1)
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.available_quantity, 7)
+
+    def test_key_reused_for_a_different_request_is_rejected(self):
+        self.client.post(
+            self.reserve_url, {"ticket_id": self.ticket.id, "quantity": 1}, HTTP_IDEMPOTENCY_KEY="k-2"
+        )
+
+        response = self.client.post(
+            self.reserve_url, {"ticket_id": self.ticket.id, "quantity": 2}, HTTP_IDEMPOTENCY_KEY="k-2"
+        )
+
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(Reservation.objects.filter(user=self.buyer, quantity=2).exclude(
+            pk=self.reservation.pk
+        ).exists())
+
+    @patch("events.views.stripe.PaymentIntent.create")
+    def test_retried_payment_intent_does_not_call_stripe_again(self, mock_create):
+        mock_create.return_value = MagicMock(id="pi_123", client_secret="secret_123")
+        url = reverse("events:create_payment_intent", kwargs={"reservation_id": self.reservation.id})
+
+        self.client.post(url, HTTP_IDEMPOTENCY_KEY="k-3")
+        with patch("events.views.stripe.PaymentIntent.retrieve") as mock_retrieve:
+            response = self.client.post(url, HTTP_IDEMPOTENCY_KEY="k-3")
+
+        self.assertEqual(response.json()["clientSecret"], "secret_123")
+        mock_create.assert_called_once()
+        mock_retrieve.assert_not_called()
+
+    def test_purge_removes_expired_keys(self):
+        self.client.post(
+            self.reserve_url, {"ticket_id": self.ticket.id, "quantity": 1}, HTTP_IDEMPOTENCY_KEY="k-4"
+        )
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        out = io.StringIO()
+        call_command("purge_stale_records", stdout=out)
+
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertIn("1 idempotency key(s)", out.getvalue())
+
+
 class PaymentSuccessTests(PaymentFlowTestsBase):
     def setUp(self):
         super().setUp()
@@ -201,6 +1035,199 @@ class PaymentSuccessTests(PaymentFlowTestsBase):
         self.assertFalse(self.reservation.confirmed)
 
 
+@override_settings(EVENTS_PAGE_SIZE=2)
+class MyEventsTests(PaymentFlowTestsBase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ticket.reserve(2)
+            Reservation.objects.create(
+                user=self.buyer, ticket_type=self.ticket, quantity=3, confirmed=True, is_used=True,
+            )
+            self.ticket.reserve(3)
+        now = timezone.now()
+        self.later = [
+            Event.objects.create(
+                organizer=self.organizer, title=f"Later {i}", description="Desc", location="Iasi",
+                start_date=now + timedelta(days=5 + i), end_date=now + timedelta(days=6 + i),
+            )
+            for i in range(2)
+        ]
+        self.started = Event.objects.create(
+            organizer=self.organizer, title="Running", description="Desc", location="Iasi",
+            start_date=now - timedelta(hours=1), end_date=now + timedelta(hours=1),
+        )
+        self.client.login(username="org_pay", password="pass")
+
+    def test_with_stats_annotates_in_one_query(self):
+        with self.assertNumQueries(1):
+            event = Event.objects.with_stats().get(pk=self.event.pk)
+
+        self.assertEqual((event.sold, event.capacity), (5, 10))
+        self.assertEqual(event.revenue, Decimal("60.00"))
+        self.assertEqual(event.checked_in, 3)
+
+    def test_upcoming_and_past_pages(self):
+        first = self.client.get(reverse("events:my_events"))
+        self.assertEqual([e.title for e in first.context["events"]], ["Festival", "Later 0"])
+        self.assertContains(first, "5 / 10")
+
+        second = self.client.get(reverse("events:my_events"), {"after": first.context["page"].next_cursor})
+        self.assertEqual([e.title for e in second.context["events"]], ["Later 1"])
+
+        past = self.client.get(reverse("events:my_events"), {"show": "past"})
+        self.assertEqual([e.title for e in past.context["events"]], ["Running"])
+        self.assertContains(past, "Live now")
+
+    def test_query_count_does_not_grow_with_events(self):
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(reverse("events:my_events"), {"show": "past"})
+        now = timezone.now()
+        Event.objects.create(
+            organizer=self.organizer, title="Earlier", description="Desc", location="Iasi",
+            start_date=now - timedelta(days=3), end_date=now - timedelta(days=2),
+        )
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(reverse("events:my_events"), {"show": "past"})
+
+        self.assertEqual(len(response.context["events"]), 2)
+        self.assertEqual(len(after.captured_queries), len(before.captured_queries))
+
+
+class DailySalesTests(PaymentFlowTestsBase):
+    def setUp(self):
+        super().setUp()
+        # A cart order across two ticket types, paid through its lead reservation.
+        self.vip = TicketType.objects.create(
+            event=self.event, name="VIP", price=Decimal("50.00"), total_quantity=5, available_quantity=5,
+        )
+        order = Order.objects.create(user=self.buyer)
+        self.reservation.order = order
+        self.reservation.save()
+        Reservation.objects.create(user=self.buyer, ticket_type=self.vip, quantity=1, order=order)
+        self.payment = Payment.objects.create(
+            reservation=self.reservation, amount=Decimal("90.00"), stripe_payment_intent="pi_789",
+        )
+
+    def _rollup(self):
+        return {
+            (row.ticket_type.name, row.tickets, row.revenue, row.checked_in)
+            for row in DailySales.objects.select_related("ticket_type")
+        }
+
+    @patch("events.views.stripe.PaymentIntent.retrieve")
+    def test_completed_payment_and_checkin_update_the_rollup(self, mock_retrieve):
+        mock_retrieve.return_value = MagicMock(status="succeeded")
+        self.client.login(username="buyer", password="pass")
+        for _ in range(2):
+            self.client.get(reverse("events:payment_success"), {"payment_intent": "pi_789"})
+
+        self.assertEqual(self._rollup(), {
+            ("GA", 2, Decimal("40.00"), 0),
+            ("VIP", 1, Decimal("50.00"), 0),
+        })
+
+        self.client.login(username="org_pay", password="pass")
+        self.client.post(reverse("events:ticket_checkin", args=[self.reservation.ticket_code]))
+
+        self.assertIn(("GA", 2, Decimal("40.00"), 2), self._rollup())
+        self.assertEqual(DailySales.objects.get(ticket_type=self.ticket).day, timezone.localdate())
+
+    @patch("events.views.stripe.PaymentIntent.retrieve")
+    def test_backfill_rebuilds_the_same_rows(self, mock_retrieve):
+        mock_retrieve.return_value = MagicMock(status="succeeded")
+        self.client.login(username="buyer", password="pass")
+        self.client.get(reverse("events:payment_success"), {"payment_intent": "pi_789"})
+        incremental = self._rollup()
+
+        DailySales.objects.all().delete()
+        out = io.StringIO()
+        call_command("backfill_daily_sales", "--event", str(self.event.pk), stdout=out)
+
+        self.assertEqual(self._rollup(), incremental)
+        self.assertIn("Wrote 2 daily sales row(s).", out.getvalue())
+
+    def test_unpaid_reservations_are_not_sales(self):
+        call_command("backfill_daily_sales", stdout=io.StringIO())
+        self.assertFalse(DailySales.objects.exists())
+
+
+@override_settings(LIVE_FEED_MAX_SECONDS=0)
+class LiveFeedTests(PaymentFlowTestsBase):
+    def setUp(self):
+        super().setUp()
+        self.confirmed = Reservation.objects.create(
+            user=self.buyer, ticket_type=self.ticket, quantity=3, confirmed=True,
+        )
+        self.url = reverse("events:ticket_live_feed", kwargs={"event_id": self.event.pk})
+
+    async def _messages(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        messages = []
+        for block in body.split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+            if "event" in lines:
+                messages.append((lines["event"], json.loads(lines["data"])))
+        return messages
+
+    async def test_stream_starts_with_a_snapshot(self):
+        await self.async_client.aforce_login(self.organizer)
+
+        messages = await self._messages()
+
+        self.assertEqual(messages[0][0], "snapshot")
+        self.assertEqual(messages[0][1]["confirmed"], 3)
+        self.assertEqual(Decimal(messages[0][1]["revenue"]), Decimal("60.00"))
+
+    async def test_changes_after_connecting_are_pushed(self):
+        await self.async_client.aforce_login(self.organizer)
+
+        real_snapshot = live.snapshot
+
+        def snapshot_then_checkin(event):
+            data = real_snapshot(event)
+            # A ticket scanned at the door right after the page connected.
+            self.confirmed.ticket_type = self.ticket
+            live.publish_checkin(self.confirmed)
+            return data
+
+        with patch("events.live.snapshot", side_effect=snapshot_then_checkin):
+            messages = await self._messages()
+
+        self.assertEqual(messages[1], ("change", {
+            "kind": "checkin", "ticket_type_id": self.ticket.pk, "quantity": 3, "amount": "0.00",
+        }))
+
+    def test_only_the_organizer_can_listen(self):
+        self.client.login(username="buyer", password="pass")
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_checkin_and_payment_write_the_change_feed(self):
+        self.client.login(username="org_pay", password="pass")
+        self.client.post(reverse("events:ticket_checkin", args=[self.confirmed.ticket_code]))
+
+        payment = Payment.objects.create(reservation=self.reservation, amount=Decimal("40.00"))
+        with transaction.atomic():
+            views._confirm_payment(payment)
+
+        self.assertEqual(
+            list(EventChange.objects.order_by("id").values_list("kind", "quantity", "amount")),
+            [("checkin", 3, Decimal("0.00")), ("sale", 2, Decimal("40.00"))],
+        )
+
+    def test_purge_stale_records_drops_old_changes(self):
+        live.publish_checkin(self.confirmed)
+        EventChange.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        out = io.StringIO()
+        call_command("purge_stale_records", stdout=out)
+
+        self.assertFalse(EventChange.objects.exists())
+        self.assertIn("1 live-feed change(s)", out.getvalue())
+
+
 class StripeWebhookTests(PaymentFlowTestsBase):
     def setUp(self):
         super().setUp()
@@ -265,6 +1292,548 @@ class ExpireReservationsCommandTests(PaymentFlowTestsBase):
 
         self.assertTrue(Reservation.objects.filter(id=self.reservation.id).exists())
 
+    def test_bulk_mode_releases_in_chunks_per_ticket_type(self):
+        other = TicketType.objects.create(
+            event=self.event, name="VIP", price=Decimal("80.00"),
+            total_quantity=10, available_quantity=10,
+        )
+        past = timezone.now() - timedelta(minutes=1)
+        self.ticket.reserve(self.reservation.quantity)
+        Reservation.objects.filter(pk=self.reservation.pk).update(expires_at=past)
+        for ticket_type, quantity in ((self.ticket, 3), (other, 4), (other, 1)):
+            ticket_type.reserve(quantity)
+            Reservation.objects.create(
+                user=self.buyer, ticket_type=ticket_type, quantity=quantity, expires_at=past
+            )
+        still_held = Reservation.objects.create(user=self.buyer, ticket_type=other, quantity=2)
+        other.reserve(2)
+
+        call_command("expire_reservations", "--bulk", "--chunk-size", "2", stdout=io.StringIO())
+
+        self.ticket.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.ticket.available_quantity, 10)
+        self.assertEqual(other.available_quantity, 8)
+        self.assertEqual(list(Reservation.objects.all()), [still_held])
+
+
+class ExpirySchedulerTests(TestCase):
+    def test_pops_only_due_holds_in_expiry_order(self):
+        now = timezone.now()
+        scheduler = ExpiryScheduler()
+        scheduler.reset([
+            (now + timedelta(seconds=5), 3),
+            (now - timedelta(seconds=1), 2),
+            (now - timedelta(seconds=5), 1),
+        ])
+
+        self.assertEqual(len(scheduler), 3)
+        self.assertEqual(scheduler.pop_due(now, limit=10), [1, 2])
+        self.assertEqual(scheduler.next_due(), now + timedelta(seconds=5))
+        self.assertEqual(scheduler.pop_due(now + timedelta(seconds=6), limit=10), [3])
+
+
+class ExpireReservationsDaemonTests(PaymentFlowTestsBase):
+    def test_daemon_releases_hold_when_it_lapses(self):
+        self.ticket.reserve(self.reservation.quantity)
+        Reservation.objects.filter(pk=self.reservation.pk).update(
+            expires_at=timezone.now() + timedelta(seconds=0.3)
+        )
+
+        out = io.StringIO()
+        call_command("expire_reservations", "--daemon", "--run-for", "1", stdout=out)
+
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.available_quantity, self.ticket.total_quantity)
+        self.assertFalse(Reservation.objects.filter(id=self.reservation.id).exists())
+        self.assertIn("Released 1", out.getvalue())
+
+
+class EventStatsTests(PaymentFlowTestsBase):
+    def setUp(self):
+        super().setUp()
+        # GA: the pending hold from setUp (2) plus 3 confirmed, 1 of them checked in.
+        self.ticket.reserve(2 + 3)
+        Reservation.objects.create(user=self.buyer, ticket_type=self.ticket, quantity=3, confirmed=True)
+        Reservation.objects.create(
+            user=self.buyer, ticket_type=self.ticket, quantity=1, confirmed=True, is_used=True,
+        )
+        self.vip = TicketType.objects.create(
+            event=self.event, name="VIP", price=Decimal("75.00"), total_quantity=4, available_quantity=4,
+        )
+
+    def test_one_query_for_totals_and_breakdown(self):
+        with self.assertNumQueries(1):
+            stats = EventStats.for_event(self.event)
+
+        self.assertEqual(stats.revenue, Decimal("80.00"))
+        self.assertEqual((stats.capacity, stats.available, stats.tickets_sold), (14, 9, 5))
+        self.assertEqual((stats.confirmed, stats.pending, stats.checked_in), (4, 2, 1))
+        ga, vip = stats.ticket_types
+        self.assertEqual((ga.name, ga.confirmed, ga.revenue), ("GA", 4, Decimal("80.00")))
+        self.assertEqual((vip.name, vip.confirmed, vip.revenue, vip.available), ("VIP", 0, Decimal("0.00"), 4))
+
+    def test_counts_sharded_stock(self):
+        rebalance_shards(self.vip.id, 2)
+
+        stats = EventStats.for_event(self.event)
+
+        self.assertEqual(stats.ticket_types[1].available, 4)
+
+    def test_dashboard_query_count_does_not_grow_with_reservations(self):
+        self.client.login(username="org_pay", password="pass")
+        url = reverse("events:ticket_management", kwargs={"event_id": self.event.pk})
+
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        for _ in range(5):
+            Reservation.objects.create(user=self.buyer, ticket_type=self.vip, quantity=1, confirmed=True)
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url)
+
+        self.assertEqual(len(after.captured_queries), len(before.captured_queries))
+        self.assertEqual(response.context["stats"].revenue, Decimal("455.00"))
+
+
+@override_settings(RESERVATIONS_PAGE_SIZE=2)
+class TicketManagementTableTests(PaymentFlowTestsBase):
+    def setUp(self):
+        super().setUp()
+        self.other = get_user_model().objects.create_user(
+            username="alice", password="pass", is_participant=True
+        )
+        self.confirmed = Reservation.objects.create(
+            user=self.other, ticket_type=self.ticket, quantity=1, confirmed=True, is_used=True,
+        )
+        self.latest = Reservation.objects.create(user=self.buyer, ticket_type=self.ticket, quantity=1)
+        self.client.login(username="org_pay", password="pass")
+        self.url = reverse("events:ticket_management", kwargs={"event_id": self.event.pk})
+
+    def _ids(self, response):
+        return [r.pk for r in response.context["reservations"]]
+
+    def test_pages_newest_first(self):
+        first = self.client.get(self.url)
+        self.assertEqual(self._ids(first), [self.latest.pk, self.confirmed.pk])
+
+        page = first.context["page"]
+        second = self.client.get(self.url, {"after": page.next_cursor})
+        self.assertEqual(self._ids(second), [self.reservation.pk])
+        self.assertFalse(second.context["page"].has_next)
+
+        back = self.client.get(self.url, {"before": second.context["page"].previous_cursor})
+        self.assertEqual(self._ids(back), [self.latest.pk, self.confirmed.pk])
+
+    def test_filters(self):
+        cases = [
+            ({"status": "confirmed"}, [self.confirmed.pk]),
+            ({"status": "pending"}, [self.latest.pk, self.reservation.pk]),
+            ({"checked_in": "yes"}, [self.confirmed.pk]),
+            ({"q": "ali"}, [self.confirmed.pk]),
+            ({"q": self.latest.ticket_code[:8].lower()}, [self.latest.pk]),
+            ({"ticket_type": "999999"}, [self.latest.pk, self.confirmed.pk]),
+        ]
+        for params, expected in cases:
+            with self.subTest(params=params):
+                self.assertEqual(self._ids(self.client.get(self.url, params)), expected)
+
+    def test_confirm_keeps_the_current_filters(self):
+        response = self.client.post(
+            f"{self.url}?status=pending&q=buyer",
+            {"action": "confirm", "reservation_id": self.latest.pk},
+        )
+
+        self.assertRedirects(response, f"{self.url}?status=pending&q=buyer")
+        self.latest.refresh_from_db()
+        self.assertTrue(self.latest.confirmed)
+
+
+class AttendeeExportTests(PaymentFlowTestsBase):
+    def setUp(self):
+        super().setUp()
+        self.attendee = get_user_model().objects.create_user(
+            username="=cmd", password="pass", email="a@example.com", is_participant=True
+        )
+        self.checked_in = Reservation.objects.create(
+            user=self.attendee, ticket_type=self.ticket, quantity=2, confirmed=True, is_used=True,
+            used_at=timezone.now(),
+        )
+        self.url = reverse("events:export_attendees", kwargs={"event_id": self.event.pk})
+
+    def _rows(self, response):
+        self.assertTrue(response.streaming)
+        # Async, so ASGI streams it instead of buffering the whole export.
+        self.assertTrue(response.is_async)
+
+        async def content():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        return list(csv.reader(io.StringIO(async_to_sync(content)().decode())))
+
+    def test_streams_one_row_per_reservation(self):
+        self.client.login(username="org_pay", password="pass")
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        # One reservation per chunk, so the rows span several chunks.
+        with patch("events.views.ATTENDEE_EXPORT_CHUNK_SIZE", 1):
+            header, *rows = self._rows(response)
+        self.assertEqual(header[:2], ["Ticket code", "Username"])
+        self.assertEqual([row[0] for row in rows], [self.reservation.ticket_code, self.checked_in.ticket_code])
+        # Formula-looking text is defused for spreadsheet apps.
+        self.assertEqual(rows[1][1:5], ["'=cmd", "", "", "a@example.com"])
+        self.assertEqual(rows[1][6:9], ["2", "yes", "yes"])
+
+    def test_filters_match_ticket_management(self):
+        self.client.login(username="org_pay", password="pass")
+
+        _, *rows = self._rows(self.client.get(self.url, {"status": "confirmed", "checked_in": "yes"}))
+
+        self.assertEqual([row[0] for row in rows], [self.checked_in.ticket_code])
+
+    def test_other_users_cannot_export(self):
+        self.client.login(username="buyer", password="pass")
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class OfflineCheckinTests(PaymentFlowTestsBase):
+    def setUp(self):
+        super().setUp()
+        self.first = Reservation.objects.create(
+            user=self.buyer, ticket_type=self.ticket, quantity=2, confirmed=True,
+        )
+        self.second = Reservation.objects.create(
+            user=self.buyer, ticket_type=self.ticket, quantity=1, confirmed=True,
+        )
+        self.sync_url = reverse("events:checkin_sync", kwargs={"event_id": self.event.pk})
+
+    def _sync(self, scans):
+        return self.client.post(self.sync_url, json.dumps({"scans": scans}), content_type="application/json")
+
+    def test_manifest_lists_confirmed_tickets_and_is_signed(self):
+        self.client.login(username="org_pay", password="pass")
+
+        response = self.client.get(reverse("events:checkin_manifest", kwargs={"event_id": self.event.pk}))
+        token = response.content.decode()
+        manifest = checkin.read_manifest(token)
+
+        self.assertEqual(manifest["event"], self.event.pk)
+        self.assertEqual(
+            [ticket[:2] for ticket in manifest["tickets"]],
+            [[self.first.ticket_code, 2], [self.second.ticket_code, 1]],
+        )
+        bloom = checkin.BloomFilter.from_dict(manifest["bloom"])
+        self.assertIn(self.first.ticket_code, bloom)
+        # The unpaid reservation isn't admitted.
+        self.assertNotIn(self.reservation.ticket_code, bloom)
+        with self.assertRaises(signing.BadSignature):
+            checkin.read_manifest(token[:-1] + ("A" if token[-1] != "A" else "B"))
+
+    def test_sync_merges_scans_earliest_first(self):
+        self.client.login(username="org_pay", password="pass")
+        now = timezone.now()
+        self.second.is_used, self.second.used_at = True, now - timedelta(hours=1)
+        self.second.save()
+
+        result = self._sync([
+            {"code": self.first.ticket_code, "used_at": (now - timedelta(minutes=5)).isoformat()},
+            {"code": self.first.ticket_code, "used_at": (now - timedelta(minutes=20)).isoformat()},
+            {"code": self.second.ticket_code, "used_at": (now - timedelta(hours=2)).isoformat()},
+            {"code": self.reservation.ticket_code, "used_at": now.isoformat()},
+            {"code": "NOPE", "used_at": now.isoformat()},
+        ]).json()
+
+        self.assertEqual(result["checked_in"], 1)
+        self.assertEqual(result["moved_earlier"], 1)
+        self.assertEqual(sorted(result["unknown"]), sorted(["NOPE", self.reservation.ticket_code]))
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual(self.first.used_at, now - timedelta(minutes=20))
+        self.assertEqual(self.second.used_at, now - timedelta(hours=2))
+        self.assertEqual(list(EventChange.objects.values_list("kind", "quantity")), [("checkin", 2)])
+        self.assertEqual(sum(DailySales.objects.values_list("checked_in", flat=True)), 2)
+
+        # Uploading the same scans again changes nothing.
+        again = self._sync([{"code": self.first.ticket_code, "used_at": now.isoformat()}]).json()
+        self.assertEqual(again["already_checked_in"], 1)
+
+    def test_sync_rejects_malformed_bodies(self):
+        self.client.login(username="org_pay", password="pass")
+
+        self.assertEqual(self.client.post(self.sync_url, "nope", content_type="application/json").status_code, 400)
+        with patch("events.views.CHECKIN_SYNC_MAX_SCANS", 1):
+            self.assertEqual(self._sync([{}, {}]).status_code, 400)
+
+    def test_other_users_get_404(self):
+        self.client.login(username="buyer", password="pass")
+
+        self.assertEqual(
+            self.client.get(reverse("events:checkin_manifest", kwargs={"event_id": self.event.pk})).status_code,
+            404,
+        )
+        self.assertEqual(self._sync([]).status_code, 404)
+
+
+class BatchCheckinTests(PaymentFlowTestsBase):
+    def setUp(self):
+        super().setUp()
+        self.valid = Reservation.objects.create(
+            user=self.buyer, ticket_type=self.ticket, quantity=2, confirmed=True,
+        )
+        self.used = Reservation.objects.create(
+            user=self.buyer, ticket_type=self.ticket, quantity=1, confirmed=True,
+            is_used=True, used_at=timezone.now() - timedelta(minutes=10),
+        )
+        self.url = reverse("events:checkin_batch", kwargs={"event_id": self.event.pk})
+
+    def _post(self, codes):
+        return self.client.post(self.url, json.dumps({"codes": codes}), content_type="application/json")
+
+    def test_reports_a_result_per_code(self):
+        self.client.login(username="org_pay", password="pass")
+        codes = [self.valid.ticket_code, self.used.ticket_code, self.reservation.ticket_code, "NOPE"]
+
+        data = self._post(codes + [self.valid.ticket_code]).json()
+
+        self.assertEqual(data["checked_in"], 1)
+        self.assertEqual(
+            [(result["code"], result["status"]) for result in data["results"]],
+            list(zip(codes, ["ok", "already_used", "unpaid", "unknown"])),
+        )
+        self.assertIn("used_at", data["results"][1])
+        self.valid.refresh_from_db()
+        self.assertTrue(self.valid.is_used)
+        self.assertEqual(list(EventChange.objects.values_list("kind", "quantity")), [("checkin", 2)])
+        self.assertEqual(DailySales.objects.get().checked_in, 2)
+
+        # A second gate scanning the same ticket is turned away.
+        again = self._post([self.valid.ticket_code]).json()
+        self.assertEqual(again["results"][0]["status"], "already_used")
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        self.client.login(username="org_pay", password="pass")
+        more = [
+            Reservation.objects.create(user=self.buyer, ticket_type=self.ticket, quantity=1, confirmed=True)
+            for _ in range(5)
+        ]
+
+        # The first check-in of the day also creates the DailySales row.
+        self._post([self.valid.ticket_code])
+
+        with CaptureQueriesContext(connection) as small:
+            self._post([more[0].ticket_code])
+        with CaptureQueriesContext(connection) as large:
+            self._post([reservation.ticket_code for reservation in more[1:]])
+
+        self.assertEqual(len(small), len(large))
+
+    def test_rejects_malformed_bodies_and_other_users(self):
+        self.client.login(username="org_pay", password="pass")
+        self.assertEqual(self._post("nope").status_code, 400)
+        with patch("events.views.CHECKIN_BATCH_MAX_CODES", 1):
+            self.assertEqual(self._post(["a", "b"]).status_code, 400)
+
+        self.client.login(username="buyer", password="pass")
+        self.assertEqual(self._post([self.valid.ticket_code]).status_code, 404)
+
+
+class TicketCodeTests(PaymentFlowTestsBase):
+    def test_new_codes_are_signed_with_event_and_reservation(self):
+        code = self.reservation.ticket_code
+
+        self.assertEqual(ticket_codes.verify(code), (self.event.pk, self.reservation.pk))
+        self.assertEqual(ticket_codes.verify(code.lower()), (self.event.pk, self.reservation.pk))
+        self.assertEqual(Reservation.objects.get(pk=self.reservation.pk).ticket_code, code)
+
+    def test_forged_codes_are_rejected_without_a_lookup(self):
+        code = self.reservation.ticket_code
+        forged = code[:-1] + ("A" if code[-1] != "A" else "B")
+        event36, _, mac = code[3:].split("-")
+        # A genuine MAC moved onto another reservation id.
+        other_reservation = f"ET-{event36}-ZZZ-{mac}"
+        self.client.login(username="org_pay", password="pass")
+
+        for bad in (forged, other_reservation, "ET-1-1", "nonsense"):
+            self.assertIsNone(ticket_codes.verify(bad))
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse("events:ticket_checkin", args=[bad]))
+            self.assertEqual(response.status_code, 404)
+            self.assertFalse([q for q in queries if "events_reservation" in q["sql"]])
+
+    def test_legacy_codes_work_until_turned_off(self):
+        Reservation.objects.filter(pk=self.reservation.pk).update(ticket_code="ET-0A1B2C3D4E")
+        self.client.login(username="org_pay", password="pass")
+        url = reverse("events:ticket_checkin", args=["ET-0A1B2C3D4E"])
+
+        self.assertEqual(self.client.get(url).status_code, 200)
+        out = io.StringIO()
+        call_command("legacy_ticket_codes", stdout=out)
+        self.assertIn("No upcoming event", out.getvalue())
+
+        Reservation.objects.filter(pk=self.reservation.pk).update(confirmed=True)
+        out = io.StringIO()
+        call_command("legacy_ticket_codes", stdout=out)
+        self.assertIn(f"Event {self.event.pk} (Festival): 1 legacy ticket code(s)", out.getvalue())
+
+        with override_settings(TICKET_CODE_ACCEPT_LEGACY=False):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_batch_checkin_answers_forged_codes_as_unknown(self):
+        Reservation.objects.filter(pk=self.reservation.pk).update(confirmed=True)
+        forged = ticket_codes.make_code(self.event.pk, 999)[:-1] + "2"
+        self.client.login(username="org_pay", password="pass")
+
+        data = self.client.post(
+            reverse("events:checkin_batch", kwargs={"event_id": self.event.pk}),
+            json.dumps({"codes": [self.reservation.ticket_code.lower(), forged]}),
+            content_type="application/json",
+        ).json()
+
+        self.assertEqual(
+            [result["status"] for result in data["results"]], ["ok", "unknown"]
+        )
+
+
+class TicketQrCacheTests(PaymentFlowTestsBase):
+    def setUp(self):
+        super().setUp()
+        Reservation.objects.filter(pk=self.reservation.pk).update(confirmed=True)
+        caches["qr"].clear()
+        self.cache_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(QR_CACHE_DIR=self.cache_dir))
+        self.url = reverse("events:ticket_qr_image", args=[self.reservation.pk])
+        self.client.login(username="buyer", password="pass")
+
+    def test_image_is_rendered_once_then_served_from_either_tier(self):
+        with patch("events.qr_cache._render", wraps=qr_cache._render) as render:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+            # A fresh worker (empty memory tier) reads the PNG from disk.
+            caches["qr"].clear()
+            third = self.client.get(self.url)
+
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first.content, third.content)
+        self.assertTrue(first.content.startswith(b"\x89PNG"))
+        self.assertEqual(first["ETag"], third["ETag"])
+        self.assertIn("immutable", first["Cache-Control"])
+        self.assertIn("private", first["Cache-Control"])
+        self.assertEqual(len(list(Path(self.cache_dir).rglob("*.png"))), 1)
+
+    def test_matching_etag_gets_304_without_rendering(self):
+        etag = self.client.get(self.url)["ETag"]
+        caches["qr"].clear()
+
+        with patch("events.qr_cache.get_png") as get_png:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        get_png.assert_not_called()
+
+    def test_pdf_uses_the_cache(self):
+        url = reverse("events:download_ticket_pdf", args=[self.reservation.pk])
+        with patch("events.qr_cache._render", wraps=qr_cache._render) as render:
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.assertEqual(render.call_count, 1)
+
+    def test_key_covers_data_size_and_colors(self):
+        key = qr_cache.qr_key("https://x/1", 8, "black", "white")
+
+        self.assertNotEqual(key, qr_cache.qr_key("https://x/2", 8, "black", "white"))
+        self.assertNotEqual(key, qr_cache.qr_key("https://x/1", 10, "black", "white"))
+        self.assertNotEqual(key, qr_cache.qr_key("https://x/1", 8, "#1e1b4b", "white"))
+
+
+class ReconcileInventoryCommandTests(PaymentFlowTestsBase):
+    # setUp's reservation holds 2 tickets without having taken them out
+    # of stock, so GA starts out drifted: 10 available, 8 expected.
+
+    def test_reports_drift_without_touching_stock(self):
+        out = io.StringIO()
+        call_command("reconcile_inventory", stdout=out)
+
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.available_quantity, 10)
+        self.assertIn("10 available, expected 8", out.getvalue())
+
+    def test_dry_run_rolls_back_the_repair(self):
+        out = io.StringIO()
+        call_command("reconcile_inventory", "--repair", "--dry-run", stdout=out)
+
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.available_quantity, 10)
+        self.assertIn("would repair 1", out.getvalue())
+
+    def test_repair_resets_plain_and_sharded_ticket_types(self):
+        vip = TicketType.objects.create(
+            event=self.event, name="VIP", price=Decimal("80.00"),
+            total_quantity=6, available_quantity=6,
+        )
+        rebalance_shards(vip.pk, 2)
+        Reservation.objects.create(user=self.buyer, ticket_type=vip, quantity=8)
+
+        out = io.StringIO()
+        call_command("reconcile_inventory", "--repair", "--batch-size", "1", stdout=out)
+
+        self.ticket.refresh_from_db()
+        vip.refresh_from_db()
+        self.assertEqual(self.ticket.available_quantity, 8)
+        self.assertEqual(vip.available_stock, 0)
+        self.assertIn("oversold by 2", out.getvalue())
+        self.assertIn("Repaired 2 of 2", out.getvalue())
+
+        out = io.StringIO()
+        call_command("reconcile_inventory", stdout=out)
+        self.assertIn("All ticket types are consistent.", out.getvalue())
+
+    def test_held_rows_of_a_deleted_ticket_type_are_skipped(self):
+        gone = TicketType.objects.create(
+            event=self.event, name="Gone", price=Decimal("5.00"),
+            total_quantity=3, available_quantity=3,
+        )
+        vip = TicketType.objects.create(
+            event=self.event, name="VIP", price=Decimal("80.00"),
+            total_quantity=6, available_quantity=6,
+        )
+        # As if Gone was deleted after the reservations were read.
+        held_rows = [(self.ticket.pk, 2), (gone.pk, 3), (vip.pk, 1)]
+        gone.delete()
+
+        with patch("events.inventory._held_by_ticket_type") as held:
+            held.return_value.iterator.return_value = iter(held_rows)
+            drift = {row.ticket_type_id: row for row in find_stock_drift()}
+
+        self.assertEqual(set(drift), {self.ticket.pk, vip.pk})
+        self.assertEqual(drift[vip.pk].expected, 5)
+
+
+class CheckEventSummariesCommandTests(PaymentFlowTestsBase):
+    def test_reports_and_repairs_stale_summaries(self):
+        # Available below capacity, so a column mix-up can't go unnoticed.
+        TicketType.objects.filter(pk=self.ticket.pk).update(available_quantity=7)
+        Event.objects.filter(pk=self.event.pk).update(available_total=3, min_price=None)
+
+        out = io.StringIO()
+        call_command("check_event_summaries", stdout=out)
+        self.assertIn("available_total 3 → 7", out.getvalue())
+        self.assertNotIn("capacity_total", out.getvalue())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_total, 3)
+
+        call_command("check_event_summaries", "--repair", stdout=io.StringIO())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_total, 7)
+        self.assertEqual(self.event.capacity_total, 10)
+        self.assertEqual(self.event.min_price, Decimal("20.00"))
+
+        out = io.StringIO()
+        call_command("check_event_summaries", stdout=out)
+        self.assertIn("All event summaries are up to date.", out.getvalue())
+
 
 @skipUnless(
     connection.vendor == "postgresql",
@@ -348,3 +1917,11 @@ class ConcurrentReservationTests(TransactionTestCase):
         self.ticket.refresh_from_db()
         self.assertEqual(self.ticket.available_quantity, 0)
         self.assertGreaterEqual(self.ticket.available_quantity, 0)
+
+
+class ConcurrentConditionalReservationTests(ConcurrentReservationTests):
+    """Same race, run through the lock-free guarded-UPDATE engine."""
+
+    @override_settings(RESERVATION_ENGINE="conditional")
+    def test_two_simultaneous_buyers_cannot_both_get_the_last_ticket(self):
+        super().test_two_simultaneous_buyers_cannot_both_get_the_last_ticket()
@@ -0,0 +1,100 @@
+"""
+Signed ticket codes.
+
+A code carries its event id and reservation id (base 36) and a truncated
+HMAC of the two: ET-<event>-<reservation>-<mac>, e.g. ET-2S-1A7F-K3QZ7MXP2D.
+A forged or mistyped code fails the HMAC check without touching the
+database, and a genuine one is found by primary key.
+
+The MAC is keyed with TICKET_CODE_SECRET (SECRET_KEY when unset), so
+rotating that key voids every printed ticket: set TICKET_CODE_SECRET to
+the old value first.
+
+Reservations from before signed codes have ET- plus 10 random hex digits.
+Those are still looked up by the ticket_code index while
+TICKET_CODE_ACCEPT_LEGACY is on; `manage.py legacy_ticket_codes` reports
+when no upcoming event still depends on one.
+"""
+import base64
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+MAC_LENGTH = 10  # base32 characters: 50 bits
+
+_SIGNED = re.compile(rf"ET-([0-9A-Z]{{1,10}})-([0-9A-Z]{{1,12}})-([A-Z2-7]{{{MAC_LENGTH}}})")
+# Also used as a database regex by `manage.py legacy_ticket_codes`.
+LEGACY_PATTERN = r"^ET-[0-9A-F]{10}$"
+_LEGACY = re.compile(LEGACY_PATTERN)
+_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def _base36(number):
+    digits = ""
+    while True:
+        number, digit = divmod(number, 36)
+        digits = _DIGITS[digit] + digits
+        if not number:
+            return digits
+
+
+def _mac(event36, reservation36):
+    digest = salted_hmac(
+        "events.ticket-code",
+        f"{event36}-{reservation36}",
+        secret=settings.TICKET_CODE_SECRET or settings.SECRET_KEY,
+        algorithm="sha256",
+    ).digest()
+    return base64.b32encode(digest).decode()[:MAC_LENGTH]
+
+
+def make_code(event_id, reservation_id):
+    event36, reservation36 = _base36(event_id), _base36(reservation_id)
+    return f"ET-{event36}-{reservation36}-{_mac(event36, reservation36)}"
+
+
+def normalize(code):
+    return code.strip().upper()
+
+
+def is_legacy(code):
+    return bool(_LEGACY.match(code))
+
+
+def verify(code):
+    """(event_id, reservation_id) for a genuine signed code, else None."""
+    match = _SIGNED.fullmatch(normalize(code))
+    if match is None:
+        return None
+    event36, reservation36, mac = match.groups()
+    if not constant_time_compare(mac, _mac(event36, reservation36)):
+        return None
+    return int(event36, 36), int(reservation36, 36)
+
+
+def lookup(codes):
+    """
+    A Q matching the reservations behind `codes` (signed ones by primary
+    key, legacy ones by ticket_code), or None when none of them can be
+    genuine.
+    """
+    by_event = defaultdict(list)
+    legacy = []
+    for code in codes:
+        code = normalize(code)
+        signed = verify(code)
+        if signed is not None:
+            event_id, reservation_id = signed
+            by_event[event_id].append(reservation_id)
+        elif settings.TICKET_CODE_ACCEPT_LEGACY and is_legacy(code):
+            legacy.append(code)
+
+    query = Q()
+    for event_id, reservation_ids in by_event.items():
+        query |= Q(ticket_type__event_id=event_id, pk__in=reservation_ids)
+    if legacy:
+        query |= Q(ticket_code__in=legacy)
+    return query or None
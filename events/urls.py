@@ -14,17 +14,28 @@ urlpatterns = [
     path('create/', views.create_event, name='create_event'),
     path('edit/<int:event_id>/', views.edit_event, name='edit_event'),
     path('<int:event_id>/tickets/', views.ticket_management, name='ticket_management'),
+    path('<int:event_id>/tickets/export/', views.export_attendees, name='export_attendees'),
+    path('<int:event_id>/tickets/live/', views.ticket_live_feed, name='ticket_live_feed'),
+    path('<int:event_id>/checkin/manifest/', views.checkin_manifest, name='checkin_manifest'),
+    path('<int:event_id>/checkin/sync/', views.checkin_sync, name='checkin_sync'),
+    path('<int:event_id>/checkin/batch/', views.checkin_batch, name='checkin_batch'),
     path('checkin/<str:ticket_code>/', views.ticket_checkin, name='ticket_checkin'),
     path('<int:event_id>/customize/', views.customize_event, name='customize_event'),
     path('my-events/', views.my_events, name='my_events'),
 
+    path('cart/reserve/', views.cart_reserve, name='cart_reserve'),
     path('payment/<int:reservation_id>/', views.payment_page, name='payment_page'),
     path('payment/create-intent/<int:reservation_id>/', views.create_payment_intent, name='create_payment_intent'),
     path('payment/success/', views.payment_success, name='payment_success'),
     path('payment/cancel/', views.payment_cancel, name='payment_cancel'),
     path('payment/webhook/', views.stripe_webhook, name='stripe_webhook'),
 
+    path('waiting-room/<int:ticket_id>/', views.waiting_room_page, name='waiting_room'),
+    path('waiting-room/status/<uuid:token>/', views.waiting_room_status, name='waiting_room_status'),
+    path('cache/stats/', views.fragment_cache_stats, name='fragment_cache_stats'),
+
     path('<int:pk>/', views.event_detail, name='event_detail'),
+    path('<int:pk>/availability/', views.event_availability, name='event_availability'),
 ]
 
 
@@ -1,10 +1,14 @@
+import csv
 import io
+import json
 import logging
+import os
+from datetime import datetime
 from decimal import Decimal, InvalidOperation
 from urllib.parse import quote
 
-import qrcode
 import stripe
+from asgiref.sync import sync_to_async
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
@@ -12,44 +16,116 @@ from reportlab.pdfgen import canvas
 from django.core.exceptions import ValidationError
 from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
-from django.db.models import Q
-from django.http import JsonResponse, HttpResponse
+from django.db.models import Prefetch, Q, Sum
+from django.db.models.functions import Substr
+from django.core.cache import caches
+from django.http import Http404, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
-
+from django.views.decorators.http import require_POST
+
+from . import checkin, fragment_cache, live, page_cache, qr_cache, sales, single_flight, ticket_codes, waiting_room
+from .idempotency import idempotent
+from .inventory import release_stock, reserve_cart, reserve_stock
+from .page_cache import cache_anonymous_page
+from .pagination import KeysetPage, keyset_paginate
+from .search import search_events
+from .stats import EventStats
 from .models import Event, TicketType, Reservation, Payment
 
 logger = logging.getLogger(__name__)
 
 
+# Enough characters for the card's 20-word teaser.
+EVENT_CARD_EXCERPT_CHARS = 300
+
+
 def events_list(request):
     query = request.GET.get("q", "")
     date = request.GET.get("date", "")
+    # Ended events are hidden unless asked for (?show=all).
+    show_all = request.GET.get("show") == "all"
+
+    # Only what the event cards render: no full description/promo text and
+    # no ticket types (the price comes from the event's summary columns),
+    # so a page costs the same however big the table.
+    events = Event.objects.only(
+        "id", "title", "location", "start_date", "end_date", "image", "theme_color",
+        "min_price", "cache_version",
+    ).annotate(
+        description_excerpt=Substr("description", 1, EVENT_CARD_EXCERPT_CHARS),
+    )
 
-    events = Event.objects.prefetch_related("ticket_types").order_by("start_date")
-
-    if query:
-        events = events.filter(
-            Q(title__icontains=query) | Q(location__icontains=query)
-        )
+    if not show_all:
+        events = events.filter(end_date__gte=timezone.now())
 
     if date:
         events = events.filter(start_date__date=date)
 
+    if query:
+        # Ranked full-text matches (best first, top SEARCH_RESULTS_LIMIT)
+        # instead of date-ordered pages; see events/search.py.
+        hits = search_events(query, events, limit=settings.SEARCH_RESULTS_LIMIT)
+        found = events.in_bulk([hit.event_id for hit in hits])
+        results = []
+        for hit in hits:
+            if hit.event_id in found:
+                event = found[hit.event_id]
+                event.search_snippet = hit.snippet
+                results.append(event)
+        page = KeysetPage(results)
+    else:
+        after, before = request.GET.get("after"), request.GET.get("before")
+
+        def paginate():
+            return keyset_paginate(
+                events,
+                keys=("start_date", "id"),
+                page_size=settings.EVENTS_PAGE_SIZE,
+                after=after,
+                before=before,
+            )
+
+        if date or after or before:
+            page = paginate()
+        else:
+            # The landing page: shared between workers, rebuilt by one
+            # request at a time when it expires (events/single_flight.py).
+            page = single_flight.get_or_compute(
+                page_cache.listing_key(show_all), paginate, settings.EVENTS_LIST_CACHE_SECONDS
+            )
+
     return render(request, "events/events_list.html", {
-        "events": events,
+        "events": page,
+        "page": page,
         "query": query,
         "date": date,
+        "show_all": show_all,
     })
 
 
+@cache_anonymous_page
+@idempotent("reservation")
 def event_detail(request, pk):
-    event = get_object_or_404(Event.objects.prefetch_related("ticket_types"), pk=pk)
+    events = Event.objects.all()
+    ticket_types = TicketType.objects.all()
+    if settings.RESERVATION_SHOW_EXPIRED_HOLDS_AS_AVAILABLE:
+        events = events.with_expired_holds()
+        ticket_types = ticket_types.with_expired_holds()
+
+    event = get_object_or_404(
+        events.prefetch_related(
+            Prefetch("ticket_types", queryset=ticket_types), "ticket_types__shards"
+        ),
+        pk=pk,
+    )
 
     if request.method == "POST":
         if not request.user.is_authenticated:
@@ -74,25 +150,36 @@ def event_detail(request, pk):
             messages.error(request, "Please enter a valid number of tickets.")
             return redirect("events:event_detail", pk=pk)
 
+        ticket_type = get_object_or_404(TicketType, id=ticket_id, event=event)
+
+        admission = None
+        if event.waiting_room_enabled:
+            admission = waiting_room.session_entry(request, ticket_type)
+            if admission is None or not waiting_room.is_admitted(admission, timezone.now()):
+                waiting_room.join(request, ticket_type)
+                return redirect(
+                    f"{reverse('events:waiting_room', args=[ticket_type.id])}?quantity={quantity}"
+                )
+
         try:
             with transaction.atomic():
-                # select_for_update() locks this row for the duration of the
-                # transaction, so two concurrent requests for the same last
-                # ticket can't both pass the stock check before either commits.
-                ticket_type = get_object_or_404(
-                    TicketType.objects.select_for_update(), id=ticket_id, event=event
-                )
-                if not ticket_type.has_stock(quantity):
-                    messages.error(request, "Not enough tickets available.")
+                # One reservation per admission: a double submit (or a second
+                # tab) can't reuse the same checkout slot.
+                if admission and not waiting_room.get_store().mark_used(admission, timezone.now()):
+                    messages.error(request, "Your checkout slot was already used. Please queue again.")
                     return redirect("events:event_detail", pk=pk)
 
+                # The stock check and decrement happen inside reserve_stock(),
+                # either under a row lock or as one guarded UPDATE depending
+                # on settings.RESERVATION_ENGINE (see events/inventory.py).
+                reserve_stock(ticket_type, quantity)
+
                 reservation = Reservation.objects.create(
                     user=request.user,
                     ticket_type=ticket_type,
                     quantity=quantity,
                     confirmed=False,
                 )
-                ticket_type.reserve(quantity)
 
         except ValidationError:
             messages.error(request, "Not enough tickets available.")
@@ -104,6 +191,166 @@ def event_detail(request, pk):
     return render(request, "events/event_detail.html", {"event": event})
 
 
+def event_availability(request, pk):
+    # The live numbers event_detail leaves to JavaScript. Micro-cached per
+    # process, so a hot event costs at most one pair of queries per
+    # EVENT_AVAILABILITY_CACHE_SECONDS per worker however many visitors poll.
+    def load():
+        if not Event.objects.filter(pk=pk).exists():
+            return None
+        ticket_types = TicketType.objects.filter(event_id=pk).prefetch_related("shards")
+        if settings.RESERVATION_SHOW_EXPIRED_HOLDS_AS_AVAILABLE:
+            ticket_types = ticket_types.with_expired_holds()
+        return {
+            "tickets": {str(ticket.pk): ticket.available_stock for ticket in ticket_types},
+            "confirmed_attendees": Reservation.objects.filter(
+                ticket_type__event_id=pk, confirmed=True
+            ).aggregate(total=Sum("quantity"))["total"] or 0,
+        }
+
+    data = caches[settings.PAGE_CACHE_ALIAS].get_or_set(
+        f"event-availability:{pk}", load, settings.EVENT_AVAILABILITY_CACHE_SECONDS
+    )
+    if data is None:
+        raise Http404("Event not found.")
+
+    response = JsonResponse(data)
+    patch_cache_control(response, public=True, max_age=settings.EVENT_AVAILABILITY_CACHE_SECONDS)
+    return response
+
+
+CART_MAX_ITEMS = 20
+
+
+@login_required
+@require_POST
+@idempotent("cart")
+def cart_reserve(request):
+    # JSON API: {"items": [{"ticket_id": 3, "quantity": 2}, {"ticket_id": 7, "quantity": 1}]}
+    # Reserves every line in one transaction (all or nothing) and creates a
+    # single Payment for the whole order.
+    if not getattr(request.user, "is_participant", False):
+        return JsonResponse({"error": "Only participants can reserve tickets."}, status=403)
+
+    try:
+        payload = json.loads(request.body or b"{}")
+        items = [
+            (int(item["ticket_id"]), int(item.get("quantity", 1)))
+            for item in payload["items"]
+        ]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({"error": "Send a JSON body with a list of items."}, status=400)
+
+    if not items or len(items) > CART_MAX_ITEMS:
+        return JsonResponse({"error": f"A cart holds between 1 and {CART_MAX_ITEMS} items."}, status=400)
+    if any(quantity <= 0 for _, quantity in items):
+        return JsonResponse({"error": "Please enter a valid number of tickets."}, status=400)
+
+    ticket_types = {
+        tt.pk: tt
+        for tt in TicketType.objects.select_related("event").filter(pk__in={pk for pk, _ in items})
+    }
+    missing = sorted({pk for pk, _ in items} - set(ticket_types))
+    if missing:
+        return JsonResponse({"error": f"Unknown ticket type(s): {missing}."}, status=404)
+
+    admissions = []
+    for ticket_type in ticket_types.values():
+        if ticket_type.event.is_past:
+            return JsonResponse({"error": f"{ticket_type.event.title} has already ended."}, status=400)
+        if ticket_type.event.waiting_room_enabled:
+            entry = waiting_room.session_entry(request, ticket_type)
+            if entry is None or not waiting_room.is_admitted(entry, timezone.now()):
+                return JsonResponse({
+                    "error": "This event has a waiting room. Queue for it first.",
+                    "waiting_room": reverse("events:waiting_room", args=[ticket_type.pk]),
+                }, status=409)
+            admissions.append(entry)
+
+    try:
+        with transaction.atomic():
+            for entry in admissions:
+                if not waiting_room.get_store().mark_used(entry, timezone.now()):
+                    raise ValidationError("Your checkout slot was already used. Please queue again.")
+
+            order, reservations = reserve_cart(
+                request.user,
+                [(ticket_types[pk], quantity) for pk, quantity in items],
+            )
+            payment = Payment.objects.create(
+                reservation=reservations[0],
+                amount=sum(res.total_price for res in reservations),
+            )
+    except ValidationError as exc:
+        return JsonResponse({"error": exc.messages[0]}, status=409)
+
+    return JsonResponse({
+        "order_id": order.id,
+        "reservations": [
+            {"id": res.id, "ticket_id": res.ticket_type_id, "quantity": res.quantity}
+            for res in reservations
+        ],
+        "amount": str(payment.amount),
+        "expires_at": reservations[0].expires_at.isoformat(),
+        "payment_url": reverse("events:payment_page", args=[reservations[0].id]),
+    }, status=201)
+
+
+@login_required
+def waiting_room_page(request, ticket_id):
+    ticket_type = get_object_or_404(
+        TicketType.objects.select_related("event"),
+        id=ticket_id,
+        event__waiting_room_enabled=True,
+    )
+    event = ticket_type.event
+
+    if not getattr(request.user, "is_participant", False):
+        messages.error(request, "Only participants can reserve tickets.")
+        return redirect("events:event_detail", pk=event.pk)
+
+    try:
+        quantity = max(int(request.GET.get("quantity", 1)), 1)
+    except (TypeError, ValueError):
+        quantity = 1
+
+    entry = waiting_room.join(request, ticket_type)
+
+    return render(request, "events/waiting_room.html", {
+        "event": event,
+        "ticket_type": ticket_type,
+        "quantity": quantity,
+        "token": entry.token,
+        "status": waiting_room.status(entry),
+    })
+
+
+def waiting_room_status(request, token):
+    # Polled every few seconds by everyone in the queue, so it stays as
+    # cheap as possible: no session or user lookup (the token itself is an
+    # unguessable capability) and at most two indexed queries.
+    entry = waiting_room.get_store().get(token)
+    if entry is None:
+        return JsonResponse({"error": "Unknown queue token."}, status=404)
+
+    status = waiting_room.status(entry)
+    response = JsonResponse(status)
+    response["Retry-After"] = str(status["retry_after"])
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+@staff_member_required
+def fragment_cache_stats(request):
+    # Per worker process: each gunicorn worker has its own fragment cache
+    # and its own single-flight counters.
+    return JsonResponse({
+        "pid": os.getpid(),
+        **fragment_cache.stats(),
+        "single_flight": single_flight.stats(),
+    })
+
+
 @login_required
 def my_tickets(request):
     if not request.user.is_participant:
@@ -118,6 +365,24 @@ def my_tickets(request):
     return render(request, "events/my_tickets.html", {"tickets": tickets})
 
 
+def _cancel_unpaid(reservation):
+    # Deletes an unpaid reservation and returns its stock. Cart
+    # reservations share one payment, whose amount covers them all, so
+    # they're cancelled together. Call inside transaction.atomic(), with
+    # `reservation` locked. Returns the reservations cancelled.
+    if reservation.order_id:
+        cancelled = list(Reservation.objects.select_for_update().filter(
+            order_id=reservation.order_id, confirmed=False
+        ).order_by("ticket_type_id").select_related("ticket_type"))
+    else:
+        cancelled = [reservation]
+
+    for res in cancelled:
+        release_stock(res.ticket_type, res.quantity)
+        res.delete()
+    return cancelled
+
+
 @login_required
 def my_reservations(request):
     if not request.user.is_participant:
@@ -143,11 +408,7 @@ def my_reservations(request):
                 if reservation.confirmed:
                     messages.error(request, "You cannot cancel a paid reservation.")
                 else:
-                    ticket_type = TicketType.objects.select_for_update().get(
-                        id=reservation.ticket_type_id
-                    )
-                    ticket_type.release(reservation.quantity)
-                    reservation.delete()
+                    _cancel_unpaid(reservation)
                     messages.success(request, "Reservation has been cancelled.")
 
         return redirect("events:my_reservations")
@@ -257,14 +518,37 @@ def edit_event(request, event_id):
 
     return render(request, "events/edit_event.html", {"event": event})
 
+def _filter_reservations(params, ticket_type_ids):
+    """
+    An event's reservations narrowed by the ticket_management filters in
+    `params`. Returns the queryset and the filter values, for the form.
+    """
+    filters = {
+        "status": params.get("status", ""),
+        "ticket_type": params.get("ticket_type", ""),
+        "checked_in": params.get("checked_in", ""),
+        "q": params.get("q", "").strip(),
+    }
+
+    # Filtering on the ticket type ids (rather than joining on the event)
+    # lets newest-first pages walk reservation_type_id_idx.
+    reservations = Reservation.objects.filter(ticket_type_id__in=ticket_type_ids)
+    if filters["status"] in ("confirmed", "pending"):
+        reservations = reservations.filter(confirmed=filters["status"] == "confirmed")
+    if filters["ticket_type"].isdigit() and int(filters["ticket_type"]) in ticket_type_ids:
+        reservations = reservations.filter(ticket_type_id=int(filters["ticket_type"]))
+    if filters["checked_in"] in ("yes", "no"):
+        reservations = reservations.filter(is_used=filters["checked_in"] == "yes")
+    if filters["q"]:
+        reservations = reservations.filter(
+            Q(user__username__icontains=filters["q"]) | Q(ticket_code__istartswith=filters["q"])
+        )
+    return reservations, filters
+
+
 @login_required
 def ticket_management(request, event_id):
-    # Fetch event and pre-fetch ticket types for performance (Analytics)
-    event = get_object_or_404(
-        Event.objects.prefetch_related("ticket_types"),
-        id=event_id,
-        organizer=request.user
-    )
+    event = get_object_or_404(Event, id=event_id, organizer=request.user)
 
     if request.method == "POST":
         action = request.POST.get("action")
@@ -281,30 +565,198 @@ def ticket_management(request, event_id):
                     reservation.save()
                     messages.success(request, "Reservation confirmed.")
                 elif action == "delete":
-                    ticket_type = TicketType.objects.select_for_update().get(
-                        id=reservation.ticket_type_id
-                    )
-                    ticket_type.release(reservation.quantity)
-                    reservation.delete()
-                    messages.success(request, "Reservation deleted.")
+                    if reservation.confirmed:
+                        release_stock(reservation.ticket_type, reservation.quantity)
+                        reservation.delete()
+                        cancelled = [reservation]
+                    else:
+                        # An unpaid cart line takes the rest of its order
+                        # with it, as when the buyer cancels it.
+                        cancelled = _cancel_unpaid(reservation)
+                    if len(cancelled) > 1:
+                        messages.success(
+                            request,
+                            f"Reservation deleted, with the other {len(cancelled) - 1} "
+                            f"reservation(s) of its unpaid cart order.",
+                        )
+                    else:
+                        messages.success(request, "Reservation deleted.")
+
+        # Back to the same filtered page (the forms post to the current URL).
+        url = reverse("events:ticket_management", kwargs={"event_id": event.id})
+        return redirect(f"{url}?{request.GET.urlencode()}" if request.GET else url)
+
+    # Revenue, occupancy, check-ins and the per-ticket-type breakdown,
+    # from one grouped query (events/stats.py).
+    stats = EventStats.for_event(event)
+
+    reservations, filters = _filter_reservations(
+        request.GET, [row.ticket_type_id for row in stats.ticket_types]
+    )
+    page = keyset_paginate(
+        reservations.select_related("user", "ticket_type"),
+        keys=("-id",),
+        page_size=settings.RESERVATIONS_PAGE_SIZE,
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+    )
 
-        return redirect("events:ticket_management", event_id=event.id)
+    return render(request, "events/ticket_management.html", {
+        "event": event,
+        "reservations": page,
+        "page": page,
+        "filters": filters,
+        "stats": stats,
+        "sales_by_day": sales.sales_by_day(event),
+    })
 
-    # Fetch all reservations and user data in a single query
-    reservations = Reservation.objects.filter(
-        ticket_type__event=event
-    ).select_related("user", "ticket_type")
 
-    # Here we use properties created in the Event model:
-    # event.total_revenue -> comes directly from model calculation
-    # event.tickets_sold -> comes from model aggregate
-    # event.total_capacity -> comes from the sum of total_quantity
+@login_required
+async def ticket_live_feed(request, event_id):
+    # Server-Sent Events stream of sales / check-ins for ticket_management's
+    # counters (events/live.py). Async, so under ASGI an open stream costs
+    # no worker thread.
+    user = await request.auser()
+    event = await Event.objects.filter(id=event_id, organizer=user).afirst()
+    if event is None:
+        raise Http404("Event not found.")
+
+    response = StreamingHttpResponse(live.stream(event), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Keep nginx-style proxies from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+ATTENDEE_EXPORT_COLUMNS = (
+    ("Ticket code", "ticket_code"),
+    ("Username", "user__username"),
+    ("First name", "user__first_name"),
+    ("Last name", "user__last_name"),
+    ("Email", "user__email"),
+    ("Ticket type", "ticket_type__name"),
+    ("Quantity", "quantity"),
+    ("Confirmed", "confirmed"),
+    ("Checked in", "is_used"),
+    ("Checked in at", "used_at"),
+    ("Reserved at", "created_at"),
+)
+ATTENDEE_EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    # csv.writer wants a file; this one hands each line straight back.
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime("%Y-%m-%d %H:%M")
+    value = str(value)
+    # Keep spreadsheet apps from running user-entered text as a formula.
+    if value[:1] in ("=", "+", "-", "@"):
+        return f"'{value}"
+    return value
 
-    return render(request, "events/ticket_management.html", {
-        "event": event,
-        "reservations": reservations,
-        # No need to calculate anything here,
-        # as the template will directly call {{ event.total_revenue }}
+
+@login_required
+def export_attendees(request, event_id):
+    # Streamed in keyset chunks of just the exported columns, so memory
+    # stays flat however many attendees the event has. Takes the same
+    # filters as ticket_management.
+    event = get_object_or_404(Event, id=event_id, organizer=request.user)
+    ticket_type_ids = list(TicketType.objects.filter(event=event).values_list("pk", flat=True))
+    reservations, _ = _filter_reservations(request.GET, ticket_type_ids)
+    rows = reservations.order_by("pk").values_list(
+        "pk", *[field for _, field in ATTENDEE_EXPORT_COLUMNS]
+    )
+
+    writer = csv.writer(_Echo())
+
+    # An async iterator: the app is served over ASGI, where Django reads a
+    # sync streaming iterator into a list before sending any of it.
+    async def lines():
+        yield writer.writerow([header for header, _ in ATTENDEE_EXPORT_COLUMNS])
+        last_pk = 0
+        while True:
+            chunk = await sync_to_async(list)(rows.filter(pk__gt=last_pk)[:ATTENDEE_EXPORT_CHUNK_SIZE])
+            for _, *row in chunk:
+                yield writer.writerow([_csv_cell(value) for value in row])
+            if len(chunk) < ATTENDEE_EXPORT_CHUNK_SIZE:
+                return
+            last_pk = chunk[-1][0]
+
+    response = StreamingHttpResponse(lines(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="attendees-event-{event.id}.csv"'
+    return response
+
+
+# Scans accepted per sync request; a device with more uploads in batches.
+CHECKIN_SYNC_MAX_SCANS = 5000
+
+
+@login_required
+def checkin_manifest(request, event_id):
+    # Downloaded by door devices before doors open, for scanning offline
+    # (events/checkin.py).
+    event = get_object_or_404(Event, id=event_id, organizer=request.user)
+    response = HttpResponse(checkin.build_manifest(event), content_type="text/plain; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="checkin-manifest-event-{event.id}.txt"'
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+@login_required
+@require_POST
+def checkin_sync(request, event_id):
+    # A device uploading the scans it made offline: {"scans": [{"code",
+    # "used_at"}, ...]}. Merged in bulk; the earliest scan of a ticket wins.
+    event = get_object_or_404(Event, id=event_id, organizer=request.user)
+    try:
+        scans = json.loads(request.body or b"{}")["scans"]
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({"error": "Send a JSON body with a list of scans."}, status=400)
+    if not isinstance(scans, list):
+        return JsonResponse({"error": "Send a JSON body with a list of scans."}, status=400)
+    if len(scans) > CHECKIN_SYNC_MAX_SCANS:
+        return JsonResponse(
+            {"error": f"Upload at most {CHECKIN_SYNC_MAX_SCANS} scans per request."}, status=400
+        )
+
+    return JsonResponse(checkin.merge_scans(event, scans))
+
+
+# Codes accepted per gate batch.
+CHECKIN_BATCH_MAX_CODES = 500
+
+
+@login_required
+@require_POST
+def checkin_batch(request, event_id):
+    # Gate scanners posting buffered scans: {"codes": [...]}. All of them
+    # are admitted with one guarded UPDATE; the response has a result per
+    # code (ok / already_used / unpaid / unknown).
+    event = get_object_or_404(Event, id=event_id, organizer=request.user)
+    try:
+        codes = json.loads(request.body or b"{}")["codes"]
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({"error": "Send a JSON body with a list of ticket codes."}, status=400)
+    if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+        return JsonResponse({"error": "Send a JSON body with a list of ticket codes."}, status=400)
+    if len(codes) > CHECKIN_BATCH_MAX_CODES:
+        return JsonResponse(
+            {"error": f"Send at most {CHECKIN_BATCH_MAX_CODES} codes per batch."}, status=400
+        )
+
+    results = checkin.check_in_codes(event, codes)
+    return JsonResponse({
+        "checked_in": sum(result["status"] == checkin.CHECKIN_OK for result in results),
+        "results": results,
     })
 
 
@@ -314,9 +766,12 @@ def ticket_checkin(request, ticket_code):
     # a ticket at the door (or type the code in manually) and mark it used.
     # Locked to the event's organizer so one organizer can't check in
     # tickets for someone else's event just by knowing/guessing a code.
+    # Guesses fail the code's HMAC check before reaching the database.
+    query = ticket_codes.lookup([ticket_code])
+    if query is None:
+        raise Http404("No such ticket.")
     reservation = get_object_or_404(
-        Reservation.objects.select_related("user", "ticket_type", "ticket_type__event"),
-        ticket_code=ticket_code,
+        Reservation.objects.select_related("user", "ticket_type", "ticket_type__event").filter(query)
     )
     event = reservation.ticket_type.event
 
@@ -340,6 +795,8 @@ def ticket_checkin(request, ticket_code):
                 reservation.is_used = True
                 reservation.used_at = timezone.now()
                 reservation.save()
+                sales.record_checkin(reservation)
+                live.publish_checkin(reservation)
                 messages.success(request, "Checked in — enjoy the event!")
 
         return redirect("events:ticket_checkin", ticket_code=ticket_code)
@@ -358,11 +815,15 @@ def customize_event(request, event_id):
         event.theme_color = request.POST.get("theme_color") or event.theme_color
         event.banner_text = request.POST.get("banner_text")
         event.promo_message = request.POST.get("promo_message")
+        event.waiting_room_enabled = request.POST.get("waiting_room_enabled") == "on"
 
+        update_fields = ["theme_color", "banner_text", "promo_message", "waiting_room_enabled"]
         if request.FILES.get("image"):
             event.image = request.FILES.get("image")
+            update_fields.append("image")
 
-        event.save()
+        # Only the customization is written, so the search index is left alone.
+        event.save(update_fields=update_fields)
         messages.success(request, "Customization saved!")
         return redirect("events:event_detail", pk=event.id)
 
@@ -370,25 +831,56 @@ def customize_event(request, event_id):
 
 @login_required
 def my_events(request):
-    events = Event.objects.filter(organizer=request.user)
-    return render(request, "events/my_events.html", {"events": events})
+    # Upcoming: not started yet, soonest first. Past: already started
+    # (including ones still running), most recent first. Both walk
+    # event_organizer_start_idx; the stats come with the page in one
+    # query (Event.objects.with_stats()).
+    show = "past" if request.GET.get("show") == "past" else "upcoming"
+    now = timezone.now()
+    events = Event.objects.filter(organizer=request.user).with_stats()
+    if show == "past":
+        events, keys = events.filter(start_date__lt=now), ("-start_date", "-id")
+    else:
+        events, keys = events.filter(start_date__gte=now), ("start_date", "id")
+
+    page = keyset_paginate(
+        events,
+        keys=keys,
+        page_size=settings.EVENTS_PAGE_SIZE,
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+    )
+
+    return render(request, "events/my_events.html", {
+        "events": page,
+        "page": page,
+        "show": show,
+        "has_events": bool(page) or Event.objects.filter(organizer=request.user).exists(),
+    })
 
 @login_required
 def payment_page(request, reservation_id):
     reservation = get_object_or_404(Reservation, id=reservation_id, user=request.user)
 
+    if reservation.order_id:
+        lead = reservation.order.lead_reservation
+        if lead.pk != reservation.pk:
+            return redirect("events:payment_page", reservation_id=lead.pk)
+
     payment, _ = Payment.objects.get_or_create(
         reservation=reservation,
-        defaults={"amount": reservation.total_price}
+        defaults={"amount": reservation.amount_due}
     )
 
     return render(request, "events/payment_page.html", {
         "reservation": reservation,
+        "items": reservation.payment_items,
         "payment": payment,
         "STRIPE_PUBLIC_KEY": settings.STRIPE_PUBLIC_KEY,
     })
 
 @login_required
+@idempotent("payment_intent")
 def create_payment_intent(request, reservation_id):
     # select_for_update() necesita un bloc atomic activ, altfel Django
     # ridica TransactionManagementError la fiecare apel.
@@ -402,23 +894,34 @@ def create_payment_intent(request, reservation_id):
         if reservation.confirmed:
             return JsonResponse({"error": "Already paid"}, status=400)
 
+        if reservation.order_id and reservation.order.lead_reservation.pk != reservation.pk:
+            return JsonResponse({"error": "Pay for this order from its first reservation."}, status=400)
+
         stripe.api_key = settings.STRIPE_SECRET_KEY
 
         # Creează sau recuperează plata
-        payment, _ = Payment.objects.get_or_create(
+        amount_due = reservation.amount_due
+        payment, created = Payment.objects.get_or_create(
             reservation=reservation,
-            defaults={"amount": reservation.total_price}
+            defaults={"amount": amount_due}
         )
+        # The stored amount was right when the payment was created; a cart
+        # may have lost lines since, so charge what is held now.
+        if not created and payment.amount != amount_due:
+            payment.amount = amount_due
+            payment.save(update_fields=["amount"])
+        amount_cents = int(payment.amount * Decimal("100"))
 
         # Dacă deja există un PaymentIntent, îl reutilizăm
         if payment.stripe_payment_intent:
             try:
                 intent = stripe.PaymentIntent.retrieve(payment.stripe_payment_intent)
+                if intent.amount != amount_cents:
+                    intent = stripe.PaymentIntent.modify(intent.id, amount=amount_cents)
             except stripe.error.StripeError:
                 logger.exception("Stripe retrieve failed for payment %s", payment.id)
                 return JsonResponse({"error": "Payment provider error."}, status=502)
         else:
-            amount_cents = int(reservation.total_price * Decimal("100"))
 
             try:
                 intent = stripe.PaymentIntent.create(
@@ -439,6 +942,28 @@ def create_payment_intent(request, reservation_id):
 
     return JsonResponse({"clientSecret": intent.client_secret})
 
+def _confirm_payment(payment):
+    # Called with the Payment row locked (select_for_update) by both
+    # payment_success and the Stripe webhook, whichever arrives first.
+    payment.status = Payment.STATUS_COMPLETED
+    payment.completed_at = timezone.now()
+    payment.save()
+
+    reservation = payment.reservation
+    reservation.confirmed = True
+    reservation.save()
+
+    # A cart order is paid through its lead reservation; confirm the rest.
+    if reservation.order_id:
+        Reservation.objects.filter(
+            order_id=reservation.order_id, confirmed=False
+        ).update(confirmed=True)
+
+    sales.record_payment(payment)
+    live.publish_sale(payment.reservation.payment_items)
+    return reservation
+
+
 @login_required
 def payment_success(request):
     payment_intent_id = request.GET.get("payment_intent")
@@ -493,12 +1018,7 @@ def payment_success(request):
             return redirect("events:my_reservations")
 
         if payment.status != Payment.STATUS_COMPLETED:
-            payment.status = Payment.STATUS_COMPLETED
-            payment.save()
-
-            reservation = payment.reservation
-            reservation.confirmed = True
-            reservation.save()
+            reservation = _confirm_payment(payment)
         else:
             reservation = payment.reservation
 
@@ -543,27 +1063,25 @@ def stripe_webhook(request):
             if not payment:
                 logger.warning("Webhook: no local Payment found for intent %s", pi_id)
             elif payment.status != Payment.STATUS_COMPLETED:
-                payment.status = Payment.STATUS_COMPLETED
-                payment.save()
-
-                reservation = payment.reservation
-                reservation.confirmed = True
-                reservation.save()
+                _confirm_payment(payment)
 
     return HttpResponse(status=200)
 
 
-def _build_checkin_qr_image(request, reservation, box_size=8):
-    # Encodes the check-in URL (not just the bare code) so an organizer can
-    # scan it with a regular phone camera and land directly on the
-    # check-in page, no separate scanner app needed.
+QR_FILL_COLOR = "#1e1b4b"
+QR_BACK_COLOR = "white"
+QR_IMAGE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def _checkin_qr(request, reservation, box_size=8):
+    # What a ticket's QR code encodes, and how it's drawn, as arguments for
+    # events/qr_cache.py. It encodes the check-in URL (not just the bare
+    # code) so an organizer can scan it with a regular phone camera and
+    # land directly on the check-in page, no separate scanner app needed.
     checkin_url = request.build_absolute_uri(
         reverse("events:ticket_checkin", args=[reservation.ticket_code])
     )
-    qr = qrcode.QRCode(box_size=box_size, border=2)
-    qr.add_data(checkin_url)
-    qr.make(fit=True)
-    return qr.make_image(fill_color="#1e1b4b", back_color="white")
+    return checkin_url, {"box_size": box_size, "fill_color": QR_FILL_COLOR, "back_color": QR_BACK_COLOR}
 
 
 @login_required
@@ -575,11 +1093,16 @@ def ticket_qr_image(request, reservation_id):
         confirmed=True
     )
 
-    qr_img = _build_checkin_qr_image(request, reservation, box_size=10)
-
-    buffer = io.BytesIO()
-    qr_img.save(buffer, format="PNG")
-    return HttpResponse(buffer.getvalue(), content_type="image/png")
+    checkin_url, style = _checkin_qr(request, reservation, box_size=10)
+    # The image for a given URL and style never changes, so the browser
+    # may keep it for good and only revalidate by ETag.
+    etag = f'"{qr_cache.qr_key(checkin_url, **style)}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(qr_cache.get_png(checkin_url, **style), content_type="image/png")
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, max_age=QR_IMAGE_MAX_AGE, immutable=True)
+    return response
 
 
 @login_required
@@ -604,7 +1127,8 @@ def download_ticket_pdf(request, reservation_id):
     bg_rgb = (248 / 255, 250 / 255, 252 / 255)          # slate-50
     white_rgb = (1, 1, 1)
 
-    qr_img = _build_checkin_qr_image(request, reservation)
+    checkin_url, style = _checkin_qr(request, reservation)
+    qr_png = qr_cache.get_png(checkin_url, **style)
 
     # PDF
     buffer = io.BytesIO()
@@ -683,12 +1207,8 @@ def download_ticket_pdf(request, reservation_id):
     pdf.setStrokeColorRGB(*border_rgb)
     pdf.roundRect(qr_x - 12, qr_y - 12, qr_size + 24, qr_size + 24, 16, fill=1, stroke=1)
 
-    qr_buffer = io.BytesIO()
-    qr_img.save(qr_buffer, format="PNG")
-    qr_buffer.seek(0)
-
     pdf.drawImage(
-        ImageReader(qr_buffer),
+        ImageReader(io.BytesIO(qr_png)),
         qr_x,
         qr_y,
         width=qr_size,
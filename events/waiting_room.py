@@ -0,0 +1,204 @@
+"""
+Virtual waiting room in front of the event_detail reservation POST.
+
+Every buyer of a ticket type gets a queue token with an admission time
+(`admit_at`). Admission times are handed out on a virtual schedule: each
+new token is admitted one interval (60 / admission_rate seconds) after the
+previous one, or immediately if the queue is idle. A buyer may reserve
+only once their token is admitted and only within the admission window.
+
+Two stores are available (settings.WAITING_ROOM_STORE):
+
+- "database": tokens live in QueueToken, shared by every gunicorn worker.
+- "local": an in-process stand-in for a single worker / single box with
+  no shared database writes at all (and for tests).
+"""
+import bisect
+import threading
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AdmissionQueue, QueueToken
+
+SESSION_KEY = "waiting_room_tokens"
+
+QueueEntry = namedtuple("QueueEntry", "token ticket_type_id user_id admit_at used_at")
+
+
+def admission_interval(ticket_type):
+    rate = ticket_type.admission_rate or settings.WAITING_ROOM_ADMISSION_RATE
+    return timedelta(seconds=60 / rate)
+
+
+def admission_window():
+    return timedelta(seconds=settings.WAITING_ROOM_ADMISSION_WINDOW_SECONDS)
+
+
+class DatabaseQueueStore:
+    def join(self, ticket_type, user_id, now):
+        interval = admission_interval(ticket_type)
+        with transaction.atomic():
+            queue, created = AdmissionQueue.objects.select_for_update().get_or_create(
+                ticket_type=ticket_type,
+                defaults={"tail_at": now},
+            )
+            admit_at = now if created else max(now, queue.tail_at + interval)
+            queue.tail_at = admit_at
+            queue.save(update_fields=["tail_at"])
+
+            token = QueueToken.objects.create(
+                ticket_type=ticket_type, user_id=user_id, admit_at=admit_at
+            )
+        return self._entry(token)
+
+    def get(self, token):
+        token = QueueToken.objects.filter(token=token).first()
+        return self._entry(token) if token else None
+
+    def position(self, entry, now):
+        return QueueToken.objects.filter(
+            ticket_type_id=entry.ticket_type_id,
+            admit_at__gt=now,
+            admit_at__lt=entry.admit_at,
+        ).count()
+
+    def mark_used(self, entry, now):
+        return bool(
+            QueueToken.objects.filter(token=entry.token, used_at__isnull=True).update(used_at=now)
+        )
+
+    def purge(self, before):
+        deleted, _ = QueueToken.objects.filter(admit_at__lt=before).delete()
+        # Idle queues restart at "now" anyway; no need to keep them around.
+        AdmissionQueue.objects.filter(tail_at__lt=before).delete()
+        return deleted
+
+    @staticmethod
+    def _entry(token):
+        return QueueEntry(
+            token=str(token.token),
+            ticket_type_id=token.ticket_type_id,
+            user_id=token.user_id,
+            admit_at=token.admit_at,
+            used_at=token.used_at,
+        )
+
+
+class LocalQueueStore:
+    """
+    In-process store. Admission times per ticket type only ever grow, so
+    they're kept in a sorted list and a position is two bisects. Only
+    correct when a single process serves the event (e.g. one gunicorn
+    worker); with several, each worker would admit at the full rate.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._schedule = {}
+
+    def join(self, ticket_type, user_id, now):
+        interval = admission_interval(ticket_type)
+        with self._lock:
+            self._purge_locked(now - admission_window())
+            schedule = self._schedule.setdefault(ticket_type.pk, [])
+            admit_at = max(now, schedule[-1] + interval) if schedule else now
+            schedule.append(admit_at)
+            entry = QueueEntry(str(uuid.uuid4()), ticket_type.pk, user_id, admit_at, None)
+            self._entries[entry.token] = entry
+        return entry
+
+    def get(self, token):
+        return self._entries.get(str(token))
+
+    def position(self, entry, now):
+        schedule = self._schedule.get(entry.ticket_type_id, [])
+        ahead = bisect.bisect_left(schedule, entry.admit_at) - bisect.bisect_right(schedule, now)
+        return max(ahead, 0)
+
+    def mark_used(self, entry, now):
+        with self._lock:
+            current = self._entries.get(entry.token)
+            if current is None or current.used_at is not None:
+                return False
+            self._entries[entry.token] = current._replace(used_at=now)
+            return True
+
+    def purge(self, before):
+        with self._lock:
+            return self._purge_locked(before)
+
+    def _purge_locked(self, before):
+        stale = [token for token, entry in self._entries.items() if entry.admit_at < before]
+        for token in stale:
+            del self._entries[token]
+        for ticket_type_id, schedule in list(self._schedule.items()):
+            del schedule[:bisect.bisect_left(schedule, before)]
+            if not schedule:
+                del self._schedule[ticket_type_id]
+        return len(stale)
+
+
+_local_store = LocalQueueStore()
+
+
+def get_store():
+    if settings.WAITING_ROOM_STORE == "local":
+        return _local_store
+    return DatabaseQueueStore()
+
+
+# ------------------------------------
+# Helpers used by the views
+# ------------------------------------
+
+def is_admitted(entry, now):
+    return (
+        entry.used_at is None
+        and entry.admit_at <= now < entry.admit_at + admission_window()
+    )
+
+
+def is_lapsed(entry, now):
+    return entry.used_at is not None or now >= entry.admit_at + admission_window()
+
+
+def session_entry(request, ticket_type):
+    token = request.session.get(SESSION_KEY, {}).get(str(ticket_type.pk))
+    if not token:
+        return None
+    entry = get_store().get(token)
+    if entry is None or entry.user_id != request.user.id:
+        return None
+    return entry
+
+
+def join(request, ticket_type):
+    """Returns the buyer's live token for this ticket type, queueing them if needed."""
+    now = timezone.now()
+    entry = session_entry(request, ticket_type)
+    if entry is None or is_lapsed(entry, now):
+        entry = get_store().join(ticket_type, request.user.id, now)
+        tokens = request.session.get(SESSION_KEY, {})
+        tokens[str(ticket_type.pk)] = entry.token
+        request.session[SESSION_KEY] = tokens
+    return entry
+
+
+def status(entry, now=None):
+    now = now or timezone.now()
+    admitted = is_admitted(entry, now)
+    lapsed = is_lapsed(entry, now)
+    wait = max((entry.admit_at - now).total_seconds(), 0)
+    return {
+        "admitted": admitted,
+        "expired": lapsed,
+        "position": 0 if admitted or lapsed else get_store().position(entry, now),
+        "wait_seconds": round(wait),
+        "retry_after": min(settings.WAITING_ROOM_POLL_SECONDS, max(round(wait), 1)),
+    }
@@ -73,7 +73,6 @@ def home(request):
         Event.objects
         .filter(end_date__gte=now)
         .select_related("organizer")
-        .prefetch_related("ticket_types")
         .order_by("start_date")[:6]
     )
 
@@ -108,7 +108,12 @@ if DATABASE_URL:
     DATABASES = {
         "default": dj_database_url.parse(
             DATABASE_URL,
-            conn_max_age=600,
+            # Production is served through ASGI (see Dockerfile), where sync
+            # ORM calls run in per-request threads: persistent connections
+            # would pile up one per thread instead of being reused, so each
+            # request closes its own. Pool in front of the database
+            # (pgbouncer) if connection setup shows up.
+            conn_max_age=0,
             ssl_require=True,
         )
     }
@@ -131,9 +136,114 @@ CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.db.DatabaseCache",
         "LOCATION": "django_cache_table",
-    }
+    },
+    # Rendered event markup ({% event_fragment %}). Per process on purpose:
+    # entries are keyed by Event.cache_version, so workers never serve a
+    # stale fragment, and a hit costs no database round trip.
+    "fragments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "event-fragments",
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "5000"))},
+    },
+    # Whole event pages for logged-out visitors, plus the availability
+    # micro-cache (events/page_cache.py). Short-lived, per process.
+    "pages": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "event-pages",
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "2000"))},
+    },
+    # Rendered ticket QR codes (events/qr_cache.py), in front of the PNG
+    # files under QR_CACHE_DIR. Entries never go stale, only get culled.
+    "qr": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "ticket-qr",
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("QR_CACHE_MAX_ENTRIES", "2000"))},
+    },
 }
 
+FRAGMENT_CACHE_ALIAS = "fragments"
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+PAGE_CACHE_ALIAS = "pages"
+QR_CACHE_ALIAS = "qr"
+EVENT_PAGE_CACHE_SECONDS = int(os.getenv("EVENT_PAGE_CACHE_SECONDS", "30"))
+EVENT_AVAILABILITY_CACHE_SECONDS = int(os.getenv("EVENT_AVAILABILITY_CACHE_SECONDS", "2"))
+
+# Single-flight recomputation of hot cache entries (events/single_flight.py).
+# Lives in the shared cache so the lock holds across worker processes.
+SINGLE_FLIGHT_CACHE_ALIAS = "default"
+# How long an expired entry is still served while one request rebuilds it.
+SINGLE_FLIGHT_STALE_SECONDS = int(os.getenv("SINGLE_FLIGHT_STALE_SECONDS", "30"))
+# How long other requests wait for a missing entry before computing it themselves.
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "2"))
+SINGLE_FLIGHT_LOCK_SECONDS = 10
+EVENTS_LIST_CACHE_SECONDS = int(os.getenv("EVENTS_LIST_CACHE_SECONDS", "15"))
+
+# =====================================================
+# RESERVATIONS
+# =====================================================
+# "locking" serializes buyers of a ticket type behind SELECT ... FOR UPDATE;
+# "conditional" does the stock check and decrement as one guarded UPDATE
+# (no row lock held across Python code). See events/inventory.py and
+# `python manage.py benchmark_reservations` to compare the two.
+
+RESERVATION_ENGINE = os.getenv("RESERVATION_ENGINE", "locking")
+
+# Lazy expiry: when a buyer would be refused for lack of stock, reclaim that
+# ticket type's lapsed-but-unswept holds inline and retry, instead of
+# waiting for the next expire_reservations run.
+RESERVATION_LAZY_EXPIRY = os.getenv("RESERVATION_LAZY_EXPIRY", "False") == "True"
+# Count those lapsed holds as available on the event page. Only makes sense
+# together with lazy expiry (otherwise buyers would be shown stock they
+# can't actually reserve yet).
+RESERVATION_SHOW_EXPIRED_HOLDS_AS_AVAILABLE = (
+    RESERVATION_LAZY_EXPIRY
+    and os.getenv("RESERVATION_SHOW_EXPIRED_HOLDS_AS_AVAILABLE", "True") == "True"
+)
+
+# Virtual waiting room (per event, switched on from "Customize event").
+# "database" shares the queue between all workers; "local" keeps it in
+# process memory — only for a single worker / single box.
+WAITING_ROOM_STORE = os.getenv("WAITING_ROOM_STORE", "database")
+# Default buyers admitted per minute, per ticket type (TicketType.admission_rate overrides it).
+WAITING_ROOM_ADMISSION_RATE = int(os.getenv("WAITING_ROOM_ADMISSION_RATE", "60"))
+# How long an admitted buyer has to submit the reservation before re-queueing.
+WAITING_ROOM_ADMISSION_WINDOW_SECONDS = 180
+WAITING_ROOM_POLL_SECONDS = 5
+
+# Responses to requests sent with an Idempotency-Key header (reservations,
+# cart checkout, payment intents) are replayed to retries for this long.
+# Expired keys are deleted by `python manage.py purge_stale_records`.
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 60 * 60)))
+
+# =====================================================
+# LIVE FEED
+# =====================================================
+# Live sales / check-in counters on ticket_management (Server-Sent Events,
+# events/live.py). Needs the ASGI entry point so open streams don't each
+# hold a worker thread.
+
+# How often an open stream checks for new sales / check-ins (one indexed query).
+LIVE_FEED_POLL_SECONDS = float(os.getenv("LIVE_FEED_POLL_SECONDS", "1"))
+# Streams close after this long; the browser reconnects and gets a fresh snapshot.
+LIVE_FEED_MAX_SECONDS = int(os.getenv("LIVE_FEED_MAX_SECONDS", "300"))
+LIVE_FEED_HEARTBEAT_SECONDS = 15
+LIVE_FEED_RETRY_MS = 3000
+LIVE_FEED_BATCH_SIZE = 500
+# Change rows are deleted by `python manage.py purge_stale_records` after this long.
+LIVE_FEED_RETENTION_HOURS = 24
+
+# =====================================================
+# EVENT LISTING
+# =====================================================
+
+# Events per page on /events/ and My events (keyset-paginated by start date).
+EVENTS_PAGE_SIZE = int(os.getenv("EVENTS_PAGE_SIZE", "24"))
+# Searches show the best-ranked matches only (full-text index, see events/search.py).
+SEARCH_RESULTS_LIMIT = int(os.getenv("SEARCH_RESULTS_LIMIT", "50"))
+# Reservations per page on an event's ticket management page (newest first).
+RESERVATIONS_PAGE_SIZE = int(os.getenv("RESERVATIONS_PAGE_SIZE", "50"))
+
 # =====================================================
 # AUTH VALIDATORS
 # =====================================================
@@ -172,6 +282,8 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Second tier of the QR cache; safe to empty at any time.
+QR_CACHE_DIR = Path(os.getenv("QR_CACHE_DIR") or MEDIA_ROOT / "qr")
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -184,6 +296,18 @@ STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
 STRIPE_CURRENCY = os.getenv("STRIPE_CURRENCY", "ron")
 
+# =====================================================
+# TICKET CODES
+# =====================================================
+
+# Key for the HMAC in ticket codes (events/ticket_codes.py). Defaults to
+# SECRET_KEY; pin it to the old key before rotating SECRET_KEY, or every
+# issued ticket stops scanning.
+TICKET_CODE_SECRET = os.getenv("TICKET_CODE_SECRET", "")
+# Unsigned codes from before signed ones are looked up by the ticket_code
+# index. Turn off once `manage.py legacy_ticket_codes` reports none left.
+TICKET_CODE_ACCEPT_LEGACY = os.getenv("TICKET_CODE_ACCEPT_LEGACY", "True") == "True"
+
 # =====================================================
 # RECAPTCHA
 # =====================================================